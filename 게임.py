@@ -1,8 +1,37 @@
+import os
 import pygame
+import numpy as np
 import random
 import math
 import sys
+import time
+import json
+import struct
+import zlib
+import concurrent.futures
+import contextlib
+import gc
+import heapq
+import itertools
+import multiprocessing
+import tracemalloc
+from collections import OrderedDict, deque
 from enum import Enum
+from types import MappingProxyType
+
+# ===========================
+# 헤드리스 모드
+#  - 창/SDL 비디오 없이 시뮬레이션만 돌릴 때 사용 (밸런스 테스트, CI)
+#  - 환경변수 CCC_HEADLESS=1 또는 실행 인자 --headless 로 켬
+#    (--replay, --batch, --validate, --pack-level, --generate 도 헤드리스)
+# ===========================
+HEADLESS = (os.environ.get("CCC_HEADLESS") == "1"
+            or any(flag in sys.argv for flag in ("--headless", "--replay", "--batch", "--validate",
+                                                 "--pack-level", "--generate")))
+# 벤치마크는 창 없이 dummy 드라이버의 실제 화면 Surface 로 측정
+if HEADLESS or "--bench" in sys.argv:
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
 
 # ===========================
 # 기본 초기화 및 설정
@@ -11,11 +40,19 @@ pygame.init()
 
 SCREEN_WIDTH = 800
 SCREEN_HEIGHT = 600
-screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
-pygame.display.set_caption("Crystal Cavern Chronicles")
+if HEADLESS:
+    # 화면 대신 메모리 Surface (그리기 함수는 그대로 호출 가능)
+    screen = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT))
+else:
+    screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+    pygame.display.set_caption("Crystal Cavern Chronicles")
 
 clock = pygame.time.Clock()
-FPS = 60  # 프레임 제한
+FPS = 60  # 시뮬레이션 틱 속도 (고정 타임스텝)
+SIM_DT = 1.0 / FPS
+MAX_RENDER_FPS = 240  # 렌더링 프레임 제한 (0이면 제한 없음)
+MAX_SUBSTEPS = 5  # 한 렌더 프레임에서 따라잡을 수 있는 최대 틱 수
+TELEPORT_DISTANCE = 100  # 이보다 멀리 움직이면 보간하지 않음 (리스폰 등)
 
 # ===========================
 # 게임 상태
@@ -57,773 +94,2639 @@ class LevelTheme(Enum):
     SPACE = 4
 
 # ===========================
-# 레벨 데이터
-#  - 플랫폼, 적, 스폰 위치, 포털, 보스(마지막 레벨)
-#  - 레벨별 파워업도 랜덤 생성
-# ===========================
-level_designs = [
-    # -----------------------------------------
-    # Level 1: Forest Theme
-    # -----------------------------------------
-    {
-        "theme": LevelTheme.FOREST,
-        "platforms": [
-            {"x": 0, "y": 550, "width": 800, "height": 50},  # Ground
-            {"x": 100, "y": 450, "width": 200, "height": 20},
-            {"x": 400, "y": 400, "width": 150, "height": 20},
-            {"x": 600, "y": 350, "width": 100, "height": 20},
-            {"x": 200, "y": 300, "width": 150, "height": 20},
-            {"x": 350, "y": 250, "width": 100, "height": 20},
-            {"x": 500, "y": 200, "width": 150, "height": 20},
-        ],
-        "spawn_point": {"x": 50, "y": 450},
-        "exit_portal": {"x": 700, "y": 150},
-        "enemies": [
-            {"type": "walker", "x": 300, "y": 430, "width": 30, "height": 30, "speed": 2},
-            {"type": "walker", "x": 500, "y": 380, "width": 30, "height": 30, "speed": 2},
-            {"type": "jumper", "x": 250, "y": 280, "width": 30, "height": 30, "jump_force": 10},
-        ],
-        "collectibles": [
-            {"x": 150, "y": 430, "collected": False},
-            {"x": 450, "y": 380, "collected": False},
-            {"x": 650, "y": 330, "collected": False},
-            {"x": 250, "y": 280, "collected": False},
-            {"x": 400, "y": 230, "collected": False},
-            {"x": 550, "y": 180, "collected": False},
-        ]
-    },
-    # -----------------------------------------
-    # Level 2: Cave Theme
-    # -----------------------------------------
-    {
-        "theme": LevelTheme.CAVE,
-        "platforms": [
-            {"x": 0, "y": 550, "width": 300, "height": 50},   # Ground left
-            {"x": 500, "y": 550, "width": 300, "height": 50}, # Ground right
-            {"x": 150, "y": 450, "width": 100, "height": 20},
-            {"x": 350, "y": 400, "width": 100, "height": 20},
-            {"x": 550, "y": 350, "width": 100, "height": 20},
-            {"x": 250, "y": 300, "width": 100, "height": 20},
-            {"x": 450, "y": 250, "width": 100, "height": 20},
-            {"x": 650, "y": 200, "width": 100, "height": 20},
-        ],
-        "spawn_point": {"x": 150, "y": 450},
-        "exit_portal": {"x": 650, "y": 150},
-        "enemies": [
-            {"type": "walker", "x": 200, "y": 430, "width": 30, "height": 30, "speed": 2},
-            {"type": "flyer", "x": 400, "y": 300, "width": 30, "height": 30, "speed": 3},
-            {"type": "jumper", "x": 500, "y": 330, "width": 30, "height": 30, "jump_force": 10},
-            {"type": "walker", "x": 600, "y": 180, "width": 30, "height": 30, "speed": 3},
-        ],
-        "collectibles": [
-            {"x": 200, "y": 430, "collected": False},
-            {"x": 400, "y": 380, "collected": False},
-            {"x": 600, "y": 330, "collected": False},
-            {"x": 300, "y": 280, "collected": False},
-            {"x": 500, "y": 230, "collected": False},
-            {"x": 700, "y": 180, "collected": False},
-        ]
-    },
-    # -----------------------------------------
-    # Level 3: Lava Theme
-    # -----------------------------------------
-    {
-        "theme": LevelTheme.LAVA,
-        "platforms": [
-            {"x": 0, "y": 550, "width": 800, "height": 50},  # Lava floor
-            {"x": 50, "y": 450, "width": 150, "height": 20},
-            {"x": 300, "y": 400, "width": 150, "height": 20},
-            {"x": 550, "y": 350, "width": 150, "height": 20},
-            {"x": 100, "y": 300, "width": 150, "height": 20},
-            {"x": 350, "y": 250, "width": 150, "height": 20},
-            {"x": 600, "y": 200, "width": 150, "height": 20},
-            # Moving platforms
-            {"x": 200, "y": 350, "width": 80, "height": 20,
-             "moving": True, "direction": 1, "speed": 2, "range": 100},
-            {"x": 450, "y": 300, "width": 80, "height": 20,
-             "moving": True, "direction": 1, "speed": 2, "range": 100},
-        ],
-        "spawn_point": {"x": 80, "y": 400},
-        "exit_portal": {"x": 650, "y": 150},
-        "enemies": [
-            {"type": "flyer", "x": 250, "y": 350, "width": 30, "height": 30, "speed": 3},
-            {"type": "flyer", "x": 500, "y": 300, "width": 30, "height": 30, "speed": 3},
-            {"type": "walker", "x": 400, "y": 380, "width": 30, "height": 30, "speed": 3},
-            {"type": "walker", "x": 650, "y": 330, "width": 30, "height": 30, "speed": 3},
-            {"type": "jumper", "x": 200, "y": 280, "width": 30, "height": 30, "jump_force": 12},
-        ],
-        "collectibles": [
-            {"x": 100, "y": 430, "collected": False},
-            {"x": 350, "y": 380, "collected": False},
-            {"x": 600, "y": 330, "collected": False},
-            {"x": 150, "y": 280, "collected": False},
-            {"x": 400, "y": 230, "collected": False},
-            {"x": 650, "y": 180, "collected": False},
-        ]
-    },
-    # -----------------------------------------
-    # Level 4: Ice Theme
-    # -----------------------------------------
-    {
-        "theme": LevelTheme.ICE,
-        "platforms": [
-            {"x": 0, "y": 550, "width": 800, "height": 50},  # Ice floor
-            {"x": 100, "y": 450, "width": 100, "height": 20},
-            {"x": 300, "y": 450, "width": 100, "height": 20},
-            {"x": 500, "y": 450, "width": 100, "height": 20},
-            {"x": 700, "y": 450, "width": 100, "height": 20},
-            {"x": 200, "y": 350, "width": 100, "height": 20},
-            {"x": 400, "y": 350, "width": 100, "height": 20},
-            {"x": 600, "y": 350, "width": 100, "height": 20},
-            {"x": 100, "y": 250, "width": 100, "height": 20},
-            {"x": 300, "y": 250, "width": 100, "height": 20},
-            {"x": 500, "y": 250, "width": 100, "height": 20},
-            {"x": 700, "y": 250, "width": 100, "height": 20},
-        ],
-        "spawn_point": {"x": 50, "y": 500},
-        "exit_portal": {"x": 700, "y": 200},
-        "enemies": [
-            {"type": "walker", "x": 150, "y": 430, "width": 30, "height": 30, "speed": 4},
-            {"type": "walker", "x": 350, "y": 430, "width": 30, "height": 30, "speed": 4},
-            {"type": "walker", "x": 550, "y": 430, "width": 30, "height": 30, "speed": 4},
-            {"type": "flyer", "x": 250, "y": 330, "width": 30, "height": 30, "speed": 3},
-            {"type": "flyer", "x": 450, "y": 330, "width": 30, "height": 30, "speed": 3},
-            {"type": "jumper", "x": 650, "y": 330, "width": 30, "height": 30, "jump_force": 12},
-        ],
-        "collectibles": [
-            {"x": 150, "y": 430, "collected": False},
-            {"x": 350, "y": 430, "collected": False},
-            {"x": 550, "y": 430, "collected": False},
-            {"x": 250, "y": 330, "collected": False},
-            {"x": 450, "y": 330, "collected": False},
-            {"x": 650, "y": 330, "collected": False},
-            {"x": 150, "y": 230, "collected": False},
-            {"x": 350, "y": 230, "collected": False},
-            {"x": 550, "y": 230, "collected": False},
-        ]
-    },
-    # -----------------------------------------
-    # Level 5: Space Theme (Boss Level)
-    # -----------------------------------------
-    {
-        "theme": LevelTheme.SPACE,
-        "platforms": [
-            {"x": 0, "y": 550, "width": 800, "height": 50},  # Ground
-            {"x": 100, "y": 450, "width": 200, "height": 20},
-            {"x": 500, "y": 450, "width": 200, "height": 20},
-            {"x": 300, "y": 350, "width": 200, "height": 20},
-            {"x": 100, "y": 250, "width": 200, "height": 20},
-            {"x": 500, "y": 250, "width": 200, "height": 20},
-        ],
-        "spawn_point": {"x": 150, "y": 400},
-        "exit_portal": None,  # 보스 레벨이므로 포털 없음
-        "boss": {
-            "x": 400, "y": 150, "width": 80, "height": 80,
-            "health": 100, "speed": 3, "attack_cooldown": 60,
-            "attack_pattern": "spiral", "bullet_speed": 5
-        },
-        "enemies": [
-            {"type": "flyer", "x": 200, "y": 350, "width": 30, "height": 30, "speed": 3},
-            {"type": "flyer", "x": 600, "y": 350, "width": 30, "height": 30, "speed": 3},
-        ],
-        "collectibles": [
-            {"x": 150, "y": 430, "collected": False},
-            {"x": 250, "y": 430, "collected": False},
-            {"x": 550, "y": 430, "collected": False},
-            {"x": 650, "y": 430, "collected": False},
-            {"x": 350, "y": 330, "collected": False},
-            {"x": 450, "y": 330, "collected": False},
-            {"x": 150, "y": 230, "collected": False},
-            {"x": 250, "y": 230, "collected": False},
-            {"x": 550, "y": 230, "collected": False},
-            {"x": 650, "y": 230, "collected": False},
-        ]
-    },
-]
-
-# ===========================
-# 전역 변수들
+# 난수 스트림
+#  - 하위 시스템마다 따로 시드한 난수 생성기를 씀 (한 곳의 호출 횟수가 다른 곳에 영향 없음)
+#  - 레벨(파워업 배치): 레벨 인덱스별로 시드, 적 AI: enemy_rng, 배경 파티클: particle_rng
+#  - 같은 시드면 같은 입력에 대해 같은 결과 (리플레이 재생의 전제)
+#  - 시작 시드는 임의, --seed 또는 seed_rng() 로 지정
 # ===========================
-current_level = 0
-game_state = GameState.TITLE
-score = 0
-lives = 3
-collected_gems = 0
-total_gems = sum(len(level["collectibles"]) for level in level_designs)
+rng_seed = random.SystemRandom().randrange(2 ** 32)
+enemy_rng = random.Random(f"{rng_seed}:enemies")
 
-# 플레이어 정보
-player = {
-    "x": level_designs[current_level]["spawn_point"]["x"],
-    "y": level_designs[current_level]["spawn_point"]["y"],
-    "width": 30,
-    "height": 50,
-    "velocity_x": 0,
-    "velocity_y": 0,
-    "gravity": 0.5,
-    "speed": 5,
-    "jump_force": 12,
-    "on_ground": False,
-    "double_jump": False,
-    "double_jump_used": False,
-    "on_ice": False,
-    "direction": 1,  # 1: 오른쪽, -1: 왼쪽
-    "animation_frame": 0,
-    "animation_cooldown": 5,
-    "animation_timer": 0,
-    "invincible": False,
-    "invincible_timer": 0,
-    "dash_ability": True,
-    "dash_cooldown": 0,
-    "health": 100,
-    "max_health": 100,
-    "shooting_cooldown": 0,
-    "bullets": []
-}
 
-# 보스(마지막 레벨)
-boss = None
-boss_bullets = []
+def stream_rng(name, seed=None):
+    """
+    현재 시드(seed 를 주면 그 시드)에서 이름별로 갈라진 난수 생성기
+    """
+    return random.Random(f"{rng_seed if seed is None else seed}:{name}")
 
-if current_level == 4:  # 레벨 5(인덱스4)일 때 보스 복사
-    boss = level_designs[current_level]["boss"].copy()
-    boss["active"] = True
 
 # ===========================
-# 동적 배경 파티클
+# 스크립트 이동 경로 (닫힌 형태)
+#  - 움직이는 플랫폼, 보스 순찰, flyer 부유는 레벨 시작부터 지난 틱 수의 함수
+#    -> 어느 틱의 위치든 바로 계산 (되감기/리플레이 탐색/헤드리스 건너뛰기가 이동체마다 O(1))
+#  - 플랫폼/보스: range 구간 왕복 (range 가 없으면 월드 너비 전체), flyer: sin 누적 합
 # ===========================
-timer = 0
+FLYER_BOB_DIVISOR = 30
 
-# 별 (Space/Title 화면 등에 사용)
-stars = []
-for _ in range(100):
-    stars.append({
-        "x": random.randint(0, SCREEN_WIDTH),
-        "y": random.randint(0, SCREEN_HEIGHT),
-        "size": random.randint(1, 3),
-        "speed": random.uniform(0.1, 0.5)
-    })
-
-# 구름 (Forest 레벨 등에 사용)
-clouds = []
-for _ in range(10):
-    clouds.append({
-        "x": random.randint(-200, SCREEN_WIDTH),
-        "y": random.randint(50, 150),
-        "speed": random.uniform(0.3, 0.7),
-        "size": random.uniform(0.5, 1.5)
-    })
-
-# 물방울 (Cave 테마 연출용)
-bubbles = []
-for _ in range(20):
-    bubbles.append({
-        "x": random.randint(0, SCREEN_WIDTH),
-        "y": random.randint(SCREEN_HEIGHT, SCREEN_HEIGHT + 200),
-        "size": random.randint(2, 10),
-        "speed": random.uniform(1, 3)
-    })
-
-# 용암 파티클
-lava_particles = []
-for _ in range(30):
-    lava_particles.append({
-        "x": random.randint(0, SCREEN_WIDTH),
-        "y": random.randint(550, 600),
-        "height": random.randint(5, 15),
-        "speed": random.uniform(2, 5),
-        "lifetime": random.randint(30, 60)
-    })
-
-# 눈 파티클 (Ice 레벨)
-snowflakes = []
-for _ in range(100):
-    snowflakes.append({
-        "x": random.randint(0, SCREEN_WIDTH),
-        "y": random.randint(-50, SCREEN_HEIGHT),
-        "size": random.randint(1, 4),
-        "speed": random.uniform(1, 3),
-        "wobble": random.uniform(-0.5, 0.5)
-    })
-
-# 우주 잔해 (Space 레벨)
-space_debris = []
-for _ in range(20):
-    space_debris.append({
-        "x": random.randint(0, SCREEN_WIDTH),
-        "y": random.randint(0, SCREEN_HEIGHT),
-        "size": random.randint(2, 8),
-        "speed_x": random.uniform(-1, 1),
-        "speed_y": random.uniform(-1, 1),
-        "rotation": random.uniform(0, 360),
-        "rotation_speed": random.uniform(-2, 2)
-    })
 
-# ===========================
-# 폰트
-# ===========================
-title_font = pygame.font.SysFont("Arial", 64)
-subtitle_font = pygame.font.SysFont("Arial", 32)
-hud_font = pygame.font.SysFont("Arial", 24)
-small_font = pygame.font.SysFont("Arial", 18)
+class PingPongPath:
+    """
+    lo ~ hi 구간을 틱마다 speed 씩 왕복하는 1차원 경로 (start 에서 direction 쪽으로 출발)
+    - at(t): t 틱 뒤 위치, heading(t): t 틱 뒤 진행 방향 (1 / -1)
+    - period: 한 번 왕복하는 틱 수 (움직이지 않으면 0)
+    """
+    __slots__ = ("lo", "span", "speed", "phase", "period")
+
+    def __init__(self, lo, hi, start, direction, speed):
+        self.lo = lo
+        self.span = span = max(hi - lo, 0)
+        self.speed = speed = abs(speed)
+        offset = min(max(start - lo, 0), span)
+        # 한 주기를 펼친 좌표 [0, 2·span): 앞 절반은 hi 쪽으로, 뒤 절반은 lo 쪽으로
+        self.phase = offset if direction > 0 or not span else 2 * span - offset
+        self.period = 2 * span / speed if span and speed else 0
+
+    def unfolded(self, t):
+        return (self.phase + self.speed * t) % (2 * self.span)
+
+    def at(self, t):
+        span = self.span
+        if not span:
+            return self.lo
+        u = self.unfolded(t)
+        return self.lo + (u if u <= span else 2 * span - u)
+
+    def heading(self, t):
+        if not self.span:
+            return 1
+        return 1 if self.unfolded(t) < self.span else -1
+
+
+def patrol_path(record, world_width):
+    """
+    x/width/speed/direction/range 를 가진 기록(움직이는 플랫폼, 보스)의 왕복 경로
+    - direction 이 없으면 speed 부호가 방향
+    - range: 출발점에서 출발 방향으로 왕복하는 거리 (없으면 월드 너비 안에서 왕복)
+    """
+    x = record["x"]
+    direction = record.get("direction", 1 if record["speed"] >= 0 else -1)
+    span = record.get("range")
+    if span is None:
+        lo, hi = 0, world_width - record["width"]
+    elif direction > 0:
+        lo, hi = x, x + span
+    else:
+        lo, hi = x - span, x
+    return PingPongPath(lo, hi, x, direction, record["speed"])
+
+
+def flyer_bob(t):
+    """
+    flyer 의 부유 변위: sum(sin(k / FLYER_BOB_DIVISOR) for k in 1..t) 의 닫힌 형태 (speed 를 곱해 씀)
+    """
+    half = 0.5 / FLYER_BOB_DIVISOR
+    return math.sin(t * half) * math.sin((t + 1) * half) / math.sin(half)
 
-# ===========================
-# 특수 효과 & 파워업
-# ===========================
-effects = []
-power_ups = []
-for level in level_designs:
-    if "power_ups" not in level:
-        level["power_ups"] = []
-        # 각 레벨마다 2개씩 랜덤 파워업 배치
-        for _ in range(2):
-            level["power_ups"].append({
-                "x": random.randint(100, 700),
-                "y": random.randint(100, 400),
-                "type": random.choice(["health", "speed", "jump", "shield"]),
-                "collected": False,
-                "animation_frame": 0,
-                "animation_timer": 0
-            })
 
 # ===========================
-# 함수들
+# 레벨 데이터
+#  - 레벨 파일(levels/*.json): 플랫폼, 적, 스폰 위치, 포털, 보스(마지막 레벨)
+#  - 파일 이름 순서가 레벨 순서, 필요한 레벨만 처음 접근할 때 읽어서 컴파일
+#  - 컴파일된 레벨은 읽기 전용, 플레이 중 바뀌는 상태는 레벨 시작 때 만드는 LevelInstance 에만 있음
+#  - 파일에 파워업이 없으면 컴파일 시 레벨별 난수 스트림으로 생성
+#  - 환경변수 CCC_LEVEL_DIR 로 다른 레벨 폴더를 지정 가능
+#  - "world": {"width", "height", "chunk_size": [w, h]} 로 화면보다 큰 레벨 (없으면 화면 한 장)
+#  - 청크 파일 레벨(format 2, --pack-level 로 변환): 정적 플랫폼은 옆 파일(.chunks)에 청크별로 한 줄씩,
+#    헤더에는 움직이는 플랫폼과 chunk_index(청크 -> 파일 위치)만 두고 필요한 청크만 읽음
+#    플랫폼마다 "id" 가 원래 레벨 파일에서의 순서 (충돌 판정 순서 유지)
 # ===========================
+LEVEL_FORMAT = 1
+CHUNKED_LEVEL_FORMAT = 2
+CHUNK_PARSE_CACHE = 64  # 파싱해 둔 청크 최대 수 (카메라가 청크 경계를 오갈 때 다시 읽지 않도록)
+LEVEL_DIR = os.environ.get("CCC_LEVEL_DIR") or os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "levels")
+POWERUP_TYPES = ("health", "speed", "jump", "shield")
 
-def reset_level():
+
+def freeze(record):
     """
-    현재 레벨을 다시 시작할 때(플레이어 사망 등) 상태 초기화
+    dict 를 읽기 전용 매핑으로 (컴파일된 레벨 공유 데이터용)
     """
-    global player, boss, boss_bullets
+    return MappingProxyType(dict(record))
 
-    # 플레이어 재배치
-    player["x"] = level_designs[current_level]["spawn_point"]["x"]
-    player["y"] = level_designs[current_level]["spawn_point"]["y"]
-    player["velocity_x"] = 0
-    player["velocity_y"] = 0
-    player["on_ground"] = False
-    player["double_jump_used"] = False
-    player["invincible"] = True
-    player["invincible_timer"] = 60
-    player["bullets"] = []
-
-    # 보스 레벨이면 보스 재설정
-    if current_level == 4:
-        boss = level_designs[current_level]["boss"].copy()
-        boss["active"] = True
-        boss_bullets = []
-
-    # 이 레벨의 보석/수집품, 파워업 다시 초기화
-    for collectible in level_designs[current_level]["collectibles"]:
-        collectible["collected"] = False
-    for power_up in level_designs[current_level]["power_ups"]:
-        power_up["collected"] = False
 
+def split_platform_id(record):
+    """
+    청크 파일 레벨의 플랫폼 기록 -> (인덱스, 읽기 전용 플랫폼)
+    """
+    platform = dict(record)
+    return platform.pop("id"), MappingProxyType(platform)
 
-def draw_title_screen():
-    screen.fill(BLACK)
 
-    # 별 그리기 (배경)
-    for star in stars:
-        pygame.draw.circle(screen, WHITE, (int(star["x"]), int(star["y"])), star["size"])
+class ChunkStore:
+    """
+    청크 파일(.chunks) 읽기
+    - index: 청크 키 (cx, cy) -> (파일 위치, 길이)
+    - read(key) 는 그 청크의 (플랫폼 인덱스, 플랫폼) 튜플 (최근 CHUNK_PARSE_CACHE 개는 파싱 결과를 캐시)
+    """
+    def __init__(self, path, index, cache_size=CHUNK_PARSE_CACHE):
+        self.path = path
+        self.index = {(cx, cy): (offset, length) for cx, cy, offset, length in index}
+        self.cache_size = cache_size
+        self.cache = OrderedDict()
+        self.reads = 0
+
+    def read(self, key):
+        records = self.cache.get(key)
+        if records is not None:
+            self.cache.move_to_end(key)
+            return records
+        offset, length = self.index[key]
+        with open(self.path, "rb") as f:
+            f.seek(offset)
+            chunk = json.loads(f.read(length))
+        records = tuple(split_platform_id(p) for p in chunk["platforms"])
+        self.reads += 1
+        self.cache[key] = records
+        if len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+        return records
+
+
+def pack_level(src, dst, chunk_size=None):
+    """
+    레벨 파일(format 1)을 청크 파일 레벨로 변환: dst(헤더) + 같은 이름의 .chunks
+    - 정적 플랫폼은 걸치는 청크마다 기록 (어느 청크로 올라와도 빠지지 않도록)
+    반환값: 청크 수
+    """
+    with open(src, encoding="utf-8") as f:
+        data = json.load(f)
+    if data.get("format", LEVEL_FORMAT) != LEVEL_FORMAT:
+        raise ValueError(f"{src}: format {LEVEL_FORMAT} 레벨만 변환할 수 있음")
+    world = dict(data.get("world", {}))
+    world.setdefault("width", SCREEN_WIDTH)
+    world.setdefault("height", SCREEN_HEIGHT)
+    if chunk_size:
+        world["chunk_size"] = list(chunk_size)
+    cw, ch = world.setdefault("chunk_size", [SCREEN_WIDTH, SCREEN_HEIGHT])
+
+    header_platforms = []
+    chunks = {}
+    for i, p in enumerate(data["platforms"]):
+        record = dict(p, id=i)
+        if p.get("moving"):
+            header_platforms.append(record)
+            continue
+        for cx in range(int(p["x"] // cw), int((p["x"] + p["width"]) // cw) + 1):
+            for cy in range(int(p["y"] // ch), int((p["y"] + p["height"]) // ch) + 1):
+                chunks.setdefault((cx, cy), []).append(record)
+
+    chunk_path = os.path.splitext(dst)[0] + ".chunks"
+    index = []
+    with open(chunk_path, "wb") as f:
+        for key in sorted(chunks):
+            line = (json.dumps({"platforms": chunks[key]}, separators=(",", ":")) + "\n").encode("utf-8")
+            index.append([key[0], key[1], f.tell(), len(line)])
+            f.write(line)
+
+    header = {k: v for k, v in data.items() if k != "platforms"}
+    header.update(format=CHUNKED_LEVEL_FORMAT, world=world, platforms=header_platforms,
+                  platform_count=len(data["platforms"]), chunk_file=os.path.basename(chunk_path),
+                  chunk_index=index)
+    with open(dst, "w", encoding="utf-8") as f:
+        json.dump(header, f, ensure_ascii=False, indent=2)
+    return len(index)
+
+
+class CompiledLevel:
+    """
+    컴파일된 레벨 (읽기 전용)
+    - platforms/enemies/... 는 읽기 전용 매핑의 튜플
+      (청크 파일 레벨이면 platforms 의 정적 플랫폼 자리는 None, chunk_store 에서 청크 단위로 읽음)
+    - platform_paths: 움직이는 플랫폼 인덱스 -> PingPongPath, boss_path: 보스 순찰 경로
+    - instantiate() 로 플레이용 LevelInstance 를 만듦
+    """
+    __slots__ = ("name", "theme", "platforms", "spawn_point", "exit_portal",
+                 "enemies", "collectibles", "power_ups", "boss",
+                 "width", "height", "chunk_size", "chunk_store", "platform_paths", "boss_path")
+
+    def __init__(self, data, source="<level>", rng=random, directory=None):
+        level_format = data.get("format", LEVEL_FORMAT)
+        if level_format not in (LEVEL_FORMAT, CHUNKED_LEVEL_FORMAT):
+            raise ValueError(f"{source}: 지원하지 않는 레벨 형식 {data.get('format')}")
+        try:
+            self.name = data.get("name", source)
+            self.theme = LevelTheme[data["theme"]]
+            world = data.get("world", {})
+            self.width = world.get("width", SCREEN_WIDTH)
+            self.height = world.get("height", SCREEN_HEIGHT)
+            self.chunk_size = tuple(world.get("chunk_size", (SCREEN_WIDTH, SCREEN_HEIGHT)))
+            self.chunk_store = None
+            if level_format == CHUNKED_LEVEL_FORMAT:
+                if directory is None:
+                    raise ValueError(f"{source}: 청크 파일 레벨은 폴더에서 읽어야 함")
+                platforms = [None] * data["platform_count"]
+                for record in data["platforms"]:
+                    i, p = split_platform_id(record)
+                    platforms[i] = p
+                self.platforms = tuple(platforms)
+                self.chunk_store = ChunkStore(os.path.join(directory, data["chunk_file"]),
+                                              data["chunk_index"])
+            else:
+                self.platforms = tuple(freeze(p) for p in data["platforms"])
+            self.spawn_point = freeze(data["spawn_point"])
+            portal = data.get("exit_portal")
+            self.exit_portal = freeze(portal) if portal else None
+            self.enemies = tuple(freeze(e) for e in data.get("enemies", ()))
+            self.collectibles = tuple((c["x"], c["y"]) for c in data.get("collectibles", ()))
+            if "power_ups" in data:
+                power_ups = data["power_ups"]
+            else:
+                # 각 레벨마다 2개씩 랜덤 파워업 배치
+                power_ups = [{
+                    "x": rng.randint(100, self.width - 100),
+                    "y": rng.randint(100, self.height - 200),
+                    "type": rng.choice(POWERUP_TYPES),
+                } for _ in range(2)]
+            self.power_ups = tuple((p["x"], p["y"], p["type"]) for p in power_ups)
+            boss = data.get("boss")
+            self.boss = freeze(boss) if boss else None
+            self.platform_paths = {i: patrol_path(p, self.width) for i, p in enumerate(self.platforms)
+                                   if p is not None and p.get("moving")}
+            self.boss_path = patrol_path(boss, self.width) if boss else None
+        except (KeyError, TypeError) as exc:
+            raise ValueError(f"{source}: 잘못된 레벨 데이터 ({exc!r})") from exc
+
+    def instantiate(self):
+        return LevelInstance(self)
+
+    def all_platforms(self):
+        """
+        정적 플랫폼까지 모두 채운 플랫폼 튜플 (청크 파일 레벨이면 청크를 전부 읽음, 검증기 등 오프라인용)
+        """
+        if self.chunk_store is None:
+            return self.platforms
+        platforms = list(self.platforms)
+        for key in self.chunk_store.index:
+            for i, p in self.chunk_store.read(key):
+                platforms[i] = p
+        return tuple(platforms)
+
+
+class LevelInstance:
+    """
+    플레이 중인 레벨 상태 (레벨 시작/재시작마다 새로 만듦)
+    - 움직이지 않는 플랫폼, 스폰/포털 정보는 컴파일된 레벨과 공유
+    - 움직이는 플랫폼, 적, 수집품, 파워업, 보스만 새로 복사
+    """
+    __slots__ = ("design", "theme", "platforms", "spawn_point", "exit_portal",
+                 "enemies", "collectibles", "power_ups", "boss", "width", "height")
+
+    def __init__(self, design):
+        self.design = design
+        self.theme = design.theme
+        self.width = design.width
+        self.height = design.height
+        # 청크 파일 레벨의 정적 플랫폼 자리(None)는 상주 청크가 정해질 때 채움 (update_residency)
+        self.platforms = [dict(p) if p is not None and p.get("moving") else p for p in design.platforms]
+        self.spawn_point = design.spawn_point
+        self.exit_portal = design.exit_portal
+        self.enemies = [Enemy(**e) for e in design.enemies]
+        self.collectibles = [Collectible(x, y) for x, y in design.collectibles]
+        self.power_ups = [PowerUp(x, y, type) for x, y, type in design.power_ups]
+        self.boss = None
+        if design.boss:
+            self.boss = dict(design.boss)
+            self.boss["active"] = True
+
+
+class LevelLibrary:
+    """
+    레벨 폴더의 레벨 목록 (인덱스로 접근하면 그때 읽고 컴파일해서 캐시)
+    - seed: 랜덤 배치용 시드 (없으면 컴파일할 때의 rng_seed, 검증기처럼 프로세스마다 같은 배치가 필요할 때)
+    """
+    def __init__(self, directory, seed=None):
+        self.directory = directory
+        self.seed = seed
+        self.paths = sorted(os.path.join(directory, name) for name in os.listdir(directory)
+                            if name.endswith(".json"))
+        self.compiled = {}
+        self._total_gems = None
+
+    def __len__(self):
+        return len(self.paths)
+
+    def __getitem__(self, index):
+        level = self.compiled.get(index)
+        if level is None:
+            path = self.paths[index]
+            with open(path, encoding="utf-8") as f:
+                level = CompiledLevel(json.load(f), os.path.basename(path),
+                                      stream_rng(f"level:{index}", self.seed), self.directory)
+            self.compiled[index] = level
+        return level
+
+    def discard_compiled(self):
+        """
+        컴파일 캐시 비우기 (시드가 바뀌어 랜덤 배치를 다시 뽑아야 할 때)
+        """
+        self.compiled.clear()
+
+    def total_gems(self):
+        """
+        전체 레벨의 크리스탈 수 (처음 필요할 때 계산)
+        """
+        if self._total_gems is None:
+            self._total_gems = sum(len(self[i].collectibles) for i in range(len(self)))
+        return self._total_gems
+
+
+level_designs = LevelLibrary(LEVEL_DIR)
 
-    # 타이틀 텍스트
-    title_text = title_font.render("Crystal Cavern Chronicles", True, CYAN)
-    title_rect = title_text.get_rect(center=(SCREEN_WIDTH // 2, 150))
-    screen.blit(title_text, title_rect)
+# ===========================
+# 투사체 풀 (NumPy 구조체-배열)
+#  - 총알 하나하나를 dict 로 두지 않고 x, y, vx, vy, radius 배열에 모아 둠
+#  - 이동/화면 밖 제거/충돌 판정을 배열 단위로 한 번에 처리
+#  - 살아있는 총알은 항상 [0, count) 구간에 모여 있음 (swap-remove 압축)
+# ===========================
+class ProjectilePool:
+    """
+    원형 투사체 풀
+    - spawn/spawn_many 로 추가, integrate 로 이동
+    - 맞았거나 화면 밖으로 나간 총알은 alive 를 끄고 compact 로 정리
+    """
+    def __init__(self, color, capacity=64):
+        self.color = color
+        self.count = 0
+        self._allocate(capacity)
+
+    def _allocate(self, capacity):
+        n = self.count
+        old = getattr(self, "x", None)
+        fields = {}
+        for name, dtype in (("x", np.float64), ("y", np.float64), ("vx", np.float64),
+                            ("vy", np.float64), ("radius", np.float64), ("alive", np.bool_)):
+            arr = np.zeros(capacity, dtype=dtype)
+            if old is not None:
+                arr[:n] = getattr(self, name)[:n]
+            fields[name] = arr
+        self.__dict__.update(fields)
+        self.capacity = capacity
+
+    def __len__(self):
+        return self.count
+
+    def clear(self):
+        self.count = 0
+
+    def spawn(self, x, y, vx, vy, radius):
+        if self.count == self.capacity:
+            self._allocate(self.capacity * 2)
+        i = self.count
+        self.x[i] = x
+        self.y[i] = y
+        self.vx[i] = vx
+        self.vy[i] = vy
+        self.radius[i] = radius
+        self.alive[i] = True
+        self.count = i + 1
+
+    def spawn_many(self, x, y, vx, vy, radius):
+        """
+        여러 발을 한 번에 추가 (x, y, radius 는 스칼라 또는 배열)
+        """
+        k = len(vx)
+        n = self.count
+        if n + k > self.capacity:
+            capacity = self.capacity
+            while n + k > capacity:
+                capacity *= 2
+            self._allocate(capacity)
+        self.x[n:n + k] = x
+        self.y[n:n + k] = y
+        self.vx[n:n + k] = vx
+        self.vy[n:n + k] = vy
+        self.radius[n:n + k] = radius
+        self.alive[n:n + k] = True
+        self.count = n + k
+
+    def integrate(self):
+        n = self.count
+        self.x[:n] += self.vx[:n]
+        self.y[:n] += self.vy[:n]
+
+    def cull_outside(self, left, top, right, bottom):
+        """
+        영역 밖으로 나간 투사체 표시 (compact 전까지는 alive 만 꺼짐)
+        """
+        n = self.count
+        x = self.x[:n]
+        y = self.y[:n]
+        outside = (x < left) | (x > right) | (y < top) | (y > bottom)
+        self.alive[:n] &= ~outside
+
+    def hit_mask(self, rect):
+        """
+        원 vs AABB 충돌 여부 (살아있는 투사체만, 길이 count 의 bool 배열)
+        """
+        n = self.count
+        x = self.x[:n]
+        y = self.y[:n]
+        r = self.radius[:n]
+        dx = x - np.clip(x, rect.left, rect.right)
+        dy = y - np.clip(y, rect.top, rect.bottom)
+        return (dx * dx + dy * dy < r * r) & self.alive[:n]
+
+    @staticmethod
+    def _slab(p, v, lo, hi):
+        """
+        한 축에서 p 가 v 속도로 [lo, hi] 구간에 들어가고 나오는 시각 (v == 0 이면 안에 있을 때 항상)
+        """
+        with np.errstate(divide="ignore", invalid="ignore"):
+            t0 = (lo - p) / v
+            t1 = (hi - p) / v
+        still = v == 0
+        inside = (p > lo) & (p < hi)
+        entry = np.where(still, np.where(inside, -np.inf, np.inf), np.minimum(t0, t1))
+        exit = np.where(still, np.inf, np.maximum(t0, t1))
+        return entry, exit
+
+    def sweep_cull(self, solids):
+        """
+        이번 틱 이동(integrate 전) 중에 고체에 닿는 투사체 표시 (compact 전까지는 alive 만 꺼짐)
+        - solids(x, y, w, h): 사각형과 겹칠 수 있는 고체의 (left, top, right, bottom) 목록
+        - 원을 한 변 2r 상자로 보고 이동 경로 전체를 검사 (swept AABB, 처음부터 겹쳐 있어도 닿음)
+        - 이동 범위 사각형이 겹치는 (투사체, 고체) 쌍만 골라 정밀 검사
+        """
+        n = self.count
+        if n == 0:
+            return
+        x, y, r = self.x[:n], self.y[:n], self.radius[:n]
+        vx, vy = self.vx[:n], self.vy[:n]
+        x0 = x - r + np.minimum(vx, 0.0)
+        x1 = x + r + np.maximum(vx, 0.0)
+        y0 = y - r + np.minimum(vy, 0.0)
+        y1 = y + r + np.maximum(vy, 0.0)
+        left, top = x0.min(), y0.min()
+        boxes = solids(left, top, x1.max() - left, y1.max() - top)
+        if not boxes:
+            return
+        left, top, right, bottom = np.array(boxes, dtype=np.float64).T
+        near = ((x1[:, None] > left) & (x0[:, None] < right)
+                & (y1[:, None] > top) & (y0[:, None] < bottom))
+        i, k = np.nonzero(near)
+        if not len(i):
+            return
+        r = r[i]
+        x_entry, x_exit = self._slab(x[i], vx[i], left[k] - r, right[k] + r)
+        y_entry, y_exit = self._slab(y[i], vy[i], top[k] - r, bottom[k] + r)
+        entry = np.maximum(x_entry, y_entry)
+        exit = np.minimum(x_exit, y_exit)
+        self.alive[i[(entry < exit) & (entry <= 1) & (exit > 0)]] = False
+
+    def hit_matrix(self, left, top, right, bottom):
+        """
+        투사체 × 사각형 여러 개 충돌 행렬 (count × K)
+        left/top/right/bottom 은 길이 K 배열
+        """
+        n = self.count
+        x = self.x[:n, None]
+        y = self.y[:n, None]
+        r = self.radius[:n, None]
+        dx = x - np.clip(x, left[None, :], right[None, :])
+        dy = y - np.clip(y, top[None, :], bottom[None, :])
+        return (dx * dx + dy * dy < r * r) & self.alive[:n, None]
+
+    def compact(self):
+        """
+        죽은 투사체를 뒤쪽의 살아있는 투사체로 채워 넣어 제거 (swap-remove)
+        """
+        n = self.count
+        alive = self.alive[:n]
+        dead = np.flatnonzero(~alive)
+        if len(dead) == 0:
+            return
+        k = n - len(dead)
+        holes = dead[dead < k]
+        movers = np.flatnonzero(alive[k:]) + k
+        for arr in (self.x, self.y, self.vx, self.vy, self.radius):
+            arr[holes] = arr[movers]
+        self.alive[:k] = True
+        self.count = k
+
+    def positions(self):
+        """
+        그리기용 (x, y, radius) 목록
+        """
+        n = self.count
+        return zip(self.x[:n].tolist(), self.y[:n].tolist(), self.radius[:n].tolist())
 
-    # 깜박이는 서브타이틀
-    pulse = (math.sin(timer / 10) + 1) / 2  # 0 ~ 1
-    subtitle_color = (
-        int(255 * pulse),
-        int(255 * pulse),
-        int(255 * (1 - pulse))
-    )
-    subtitle_text = subtitle_font.render("Press SPACE to Start", True, subtitle_color)
-    subtitle_rect = subtitle_text.get_rect(center=(SCREEN_WIDTH // 2, 350))
-    screen.blit(subtitle_text, subtitle_rect)
 
-    # 컨트롤 안내
-    controls_text1 = small_font.render("Controls: Arrow Keys to Move, UP to Jump, SPACE to Shoot", True, WHITE)
-    controls_text2 = small_font.render("Press SHIFT to Dash, Collect Crystals and Defeat Enemies", True, WHITE)
-    controls_rect1 = controls_text1.get_rect(center=(SCREEN_WIDTH // 2, 450))
-    controls_rect2 = controls_text2.get_rect(center=(SCREEN_WIDTH // 2, 480))
-    screen.blit(controls_text1, controls_rect1)
-    screen.blit(controls_text2, controls_rect2)
+# ===========================
+# 엔티티 (플레이어/적/수집품/파워업)
+#  - dict 대신 __slots__ 클래스로 두어 속성 접근이 빠르고 메모리도 작음
+#  - 충돌 판정용 Rect 를 엔티티마다 하나씩 두고 위치가 바뀔 때 sync_rect 로 맞춤
+#    (충돌 검사마다 Rect 를 새로 만들지 않음)
+#  - 총알은 ProjectilePool 배열에 들어 있으므로 따로 클래스를 두지 않음
+# ===========================
+class Player:
+    """
+    플레이어 상태
+    """
+    __slots__ = (
+        "x", "y", "width", "height", "velocity_x", "velocity_y", "gravity",
+        "speed", "jump_force", "on_ground", "double_jump", "double_jump_used",
+        "on_ice", "direction", "animation_frame", "animation_cooldown",
+        "animation_timer", "invincible", "invincible_timer", "dash_ability",
+        "dash_cooldown", "health", "max_health", "shooting_cooldown", "bullets",
+        "rect",
+    )
 
-    # 간단한 플레이어 그림
-    player_x = SCREEN_WIDTH // 2
-    player_y = 250
-    pygame.draw.rect(screen, BLUE, (player_x - 15, player_y - 25, 30, 50))  # 몸통
-    pygame.draw.circle(screen, LIGHT_BLUE, (player_x, player_y - 35), 15)   # 머리
-    pygame.draw.circle(screen, WHITE, (player_x - 5, player_y - 38), 4)     # 왼눈
-    pygame.draw.circle(screen, WHITE, (player_x + 5, player_y - 38), 4)     # 오른눈
-    pygame.draw.circle(screen, BLACK, (player_x - 5, player_y - 38), 2)
-    pygame.draw.circle(screen, BLACK, (player_x + 5, player_y - 38), 2)
+    def __init__(self, x, y):
+        self.x = x
+        self.y = y
+        self.width = 30
+        self.height = 50
+        self.velocity_x = 0
+        self.velocity_y = 0
+        self.gravity = 0.5
+        self.speed = 5
+        self.jump_force = 12
+        self.on_ground = False
+        self.double_jump = False
+        self.double_jump_used = False
+        self.on_ice = False
+        self.direction = 1  # 1: 오른쪽, -1: 왼쪽
+        self.animation_frame = 0
+        self.animation_cooldown = 5
+        self.animation_timer = 0
+        self.invincible = False
+        self.invincible_timer = 0
+        self.dash_ability = True
+        self.dash_cooldown = 0
+        self.health = 100
+        self.max_health = 100
+        self.shooting_cooldown = 0
+        self.bullets = ProjectilePool(YELLOW)
+        self.rect = pygame.Rect(int(x), int(y), self.width, self.height)
+
+    def sync_rect(self):
+        rect = self.rect
+        rect.x = int(self.x)
+        rect.y = int(self.y)
+
+
+class Enemy:
+    """
+    적 (type: walker / flyer / jumper)
+    """
+    __slots__ = ("type", "x", "y", "width", "height", "speed", "jump_force", "velocity_y", "node", "home_y",
+                 "rect")
 
-    # 옆에 결정 로고
-    crystal_points = [
-        (player_x + 50, player_y - 10),
-        (player_x + 65, player_y - 30),
-        (player_x + 80, player_y - 10),
-        (player_x + 65, player_y + 20)
-    ]
-    pygame.draw.polygon(screen, CYAN, crystal_points)
-    pygame.draw.polygon(screen, WHITE, crystal_points, 2)
+    def __init__(self, type, x, y, width=30, height=30, speed=0, jump_force=0, velocity_y=0, node=-1,
+                 home_y=None):
+        self.type = type
+        self.x = x
+        self.y = y
+        self.width = width
+        self.height = height
+        self.speed = speed
+        self.jump_force = jump_force
+        self.velocity_y = velocity_y
+        self.node = node  # 발밑 플랫폼 (적 길찾기 그래프의 노드)
+        self.home_y = y if home_y is None else home_y  # flyer 부유 기준 높이
+        self.rect = pygame.Rect(int(x), int(y), width, height)
 
-    # 하단부 장식 결정
-    for i in range(10):
-        x = i * 90 + 45
-        y = 550
-        height = random.randint(20, 50)
-        crystal_points = [
-            (x - 10, y),
-            (x, y - height),
-            (x + 10, y)
-        ]
-        color = (
-            int(100 + 155 * abs(math.sin(timer / 20 + i))),
-            int(100 + 155 * abs(math.sin(timer / 15 + i))),
-            int(200 + 55 * abs(math.sin(timer / 10 + i)))
-        )
-        pygame.draw.polygon(screen, color, crystal_points)
-        pygame.draw.polygon(screen, WHITE, crystal_points, 1)
+    def sync_rect(self):
+        rect = self.rect
+        rect.x = int(self.x)
+        rect.y = int(self.y)
 
 
-def draw_game_over_screen():
-    screen.fill(BLACK)
+ITEM_SIZE = 20  # 수집품/파워업 충돌 크기
 
-    # 별 배경
-    for star in stars:
-        pygame.draw.circle(screen, WHITE, (int(star["x"]), int(star["y"])), star["size"])
 
-    # 텍스트
-    title_text = title_font.render("Game Over", True, RED)
-    title_rect = title_text.get_rect(center=(SCREEN_WIDTH // 2, 200))
-    screen.blit(title_text, title_rect)
+class Collectible:
+    """
+    크리스탈 (collectibles)
+    """
+    __slots__ = ("x", "y", "collected", "rect")
 
-    score_text = subtitle_font.render(f"Final Score: {score}", True, WHITE)
-    score_rect = score_text.get_rect(center=(SCREEN_WIDTH // 2, 280))
-    screen.blit(score_text, score_rect)
+    def __init__(self, x, y, collected=False):
+        self.x = x
+        self.y = y
+        self.collected = collected
+        self.rect = pygame.Rect(x, y, ITEM_SIZE, ITEM_SIZE)
 
-    gems_text = subtitle_font.render(f"Crystals: {collected_gems}/{total_gems}", True, CYAN)
-    gems_rect = gems_text.get_rect(center=(SCREEN_WIDTH // 2, 330))
-    screen.blit(gems_text, gems_rect)
 
-    pulse = (math.sin(timer / 10) + 1) / 2
-    restart_color = (
-        int(255 * pulse),
-        int(255 * (1 - pulse)),
-        int(100 * pulse)
-    )
-    restart_text = subtitle_font.render("Press R to Restart", True, restart_color)
-    restart_rect = restart_text.get_rect(center=(SCREEN_WIDTH // 2, 400))
-    screen.blit(restart_text, restart_rect)
+class PowerUp:
+    """
+    파워업 (type: health / speed / jump / shield)
+    """
+    __slots__ = ("x", "y", "type", "collected", "animation_frame", "animation_timer", "rect")
 
-    # 깨진 결정 표현
-    crystal_pieces = [
-        [(SCREEN_WIDTH // 2 - 40, 480), (SCREEN_WIDTH // 2 - 60, 500), (SCREEN_WIDTH // 2 - 30, 510)],
-        [(SCREEN_WIDTH // 2 - 10, 470), (SCREEN_WIDTH // 2, 490), (SCREEN_WIDTH // 2 + 10, 480)],
-        [(SCREEN_WIDTH // 2 + 20, 490), (SCREEN_WIDTH // 2 + 40, 470), (SCREEN_WIDTH // 2 + 30, 510)]
-    ]
-    for piece in crystal_pieces:
-        color = (
-            int(100 + 155 * abs(math.sin(timer / 20))),
-            int(100 + 155 * abs(math.sin(timer / 15))),
-            int(200 + 55 * abs(math.sin(timer / 10)))
-        )
-        pygame.draw.polygon(screen, color, piece)
-        pygame.draw.polygon(screen, WHITE, piece, 1)
+    def __init__(self, x, y, type, collected=False, animation_frame=0, animation_timer=0):
+        self.x = x
+        self.y = y
+        self.type = type
+        self.collected = collected
+        self.animation_frame = animation_frame
+        self.animation_timer = animation_timer
+        self.rect = pygame.Rect(x, y, ITEM_SIZE, ITEM_SIZE)
 
 
-def draw_game_win_screen():
-    screen.fill(BLACK)
+# ===========================
+# 전역 변수들
+# ===========================
+current_level = 0
+level_tick = 0  # 현재 레벨을 시작(재시작)한 뒤 지난 틱 수 (스크립트 이동의 시간축)
+game_state = GameState.TITLE
+score = 0
+lives = 3
+collected_gems = 0
 
-    # 별 반짝임
-    for star in stars:
-        size = star["size"] + math.sin(timer / 10 + star["x"]) * 2
-        pygame.draw.circle(screen, WHITE, (int(star["x"]), int(star["y"])), max(1, int(size)))
+# 플레이 중인 레벨 상태
+active_level = level_designs[current_level].instantiate()
 
-    title_text = title_font.render("Victory!", True, GOLD)
-    title_rect = title_text.get_rect(center=(SCREEN_WIDTH // 2, 150))
-    screen.blit(title_text, title_rect)
+# 플레이어 정보
+player = Player(active_level.spawn_point["x"], active_level.spawn_point["y"])
 
-    subtitle_text = subtitle_font.render("You've Saved the Crystal Caverns!", True, CYAN)
-    subtitle_rect = subtitle_text.get_rect(center=(SCREEN_WIDTH // 2, 220))
-    screen.blit(subtitle_text, subtitle_rect)
+# 보스(마지막 레벨)
+boss = active_level.boss
+boss_bullets = ProjectilePool(RED, capacity=256)
 
-    score_text = subtitle_font.render(f"Final Score: {score}", True, WHITE)
-    score_rect = score_text.get_rect(center=(SCREEN_WIDTH // 2, 280))
-    screen.blit(score_text, score_rect)
+# ===========================
+# 동적 배경 파티클
+#  - 이미터마다 파티클 속성을 NumPy 배열로 두고 한 번에 이동/재생성
+#  - 모양은 미리 그려 둔 스프라이트를 Surface.blits 한 번으로 출력
+# ===========================
+timer = 0
 
-    gems_text = subtitle_font.render(f"Crystals: {collected_gems}/{total_gems}", True, CYAN)
-    gems_rect = gems_text.get_rect(center=(SCREEN_WIDTH // 2, 330))
-    screen.blit(gems_text, gems_rect)
+# 파티클 수 배율 (테마 레벨에서 파티클을 늘리고 싶을 때 조정)
+PARTICLE_DENSITY = int(os.environ.get("CCC_PARTICLE_DENSITY", "1"))
 
-    pulse = (math.sin(timer / 10) + 1) / 2
-    restart_color = (
-        int(100 * pulse),
-        int(255 * pulse),
-        int(100 * pulse)
-    )
-    restart_text = subtitle_font.render("Press R to Play Again", True, restart_color)
-    restart_rect = restart_text.get_rect(center=(SCREEN_WIDTH // 2, 400))
-    screen.blit(restart_text, restart_rect)
+particle_rng = np.random.default_rng([rng_seed, 1])
 
-    # 거대한 결정
-    crystal_center_x = SCREEN_WIDTH // 2
-    crystal_center_y = 500
-    crystal_size = 50 + math.sin(timer / 15) * 5
 
-    crystal_points = [
-        (crystal_center_x, crystal_center_y - crystal_size),
-        (crystal_center_x + crystal_size * 0.7, crystal_center_y),
-        (crystal_center_x, crystal_center_y + crystal_size * 0.7),
-        (crystal_center_x - crystal_size * 0.7, crystal_center_y)
-    ]
+def to_display_format(surface):
+    """
+    화면 픽셀 포맷으로 변환 (헤드리스는 화면이 없으므로 그대로)
+    """
+    if HEADLESS:
+        return surface
+    return surface.convert_alpha()
 
-    # 아우라/글로우
-    for i in range(5, 0, -1):
-        glow_size = i * 3
-        glow_points = [
-            (crystal_center_x, crystal_center_y - crystal_size - glow_size),
-            (crystal_center_x + crystal_size * 0.7 + glow_size, crystal_center_y),
-            (crystal_center_x, crystal_center_y + crystal_size * 0.7 + glow_size),
-            (crystal_center_x - crystal_size * 0.7 - glow_size, crystal_center_y)
-        ]
-        glow_color = (
-            int(100 + (5 - i) * 30),
-            int(100 + (5 - i) * 30),
-            int(200 + (5 - i) * 10)
-        )
-        pygame.draw.polygon(screen, glow_color, glow_points)
 
-    # 결정 본체
-    crystal_color = (
-        int(100 + 155 * abs(math.sin(timer / 20))),
-        int(100 + 155 * abs(math.sin(timer / 15))),
-        int(200 + 55 * abs(math.sin(timer / 10)))
-    )
-    pygame.draw.polygon(screen, crystal_color, crystal_points)
-    pygame.draw.polygon(screen, WHITE, crystal_points, 2)
-
-    # 반사선
-    pygame.draw.line(
-        screen, WHITE,
-        (crystal_center_x - 10, crystal_center_y - crystal_size * 0.6),
-        (crystal_center_x + 5, crystal_center_y - crystal_size * 0.2)
-    )
-    pygame.draw.line(
-        screen, WHITE,
-        (crystal_center_x + 10, crystal_center_y - crystal_size * 0.4),
-        (crystal_center_x - 5, crystal_center_y - crystal_size * 0.1)
-    )
+def circle_sprite(color, radius):
+    surf = pygame.Surface((radius * 2, radius * 2), pygame.SRCALPHA)
+    pygame.draw.circle(surf, color, (radius, radius), radius)
+    return to_display_format(surf)
 
 
-def handle_input():
+def circle_sprites(color, max_radius):
     """
-    플레이어 입력 처리
+    반지름 0~max_radius 원 스프라이트 목록과 중심 보정값 (인덱스 = 반지름)
     """
-    keys = pygame.key.get_pressed()
+    radii = [max(r, 1) for r in range(max_radius + 1)]
+    return [circle_sprite(color, r) for r in radii], [(r, r) for r in radii]
 
-    # 좌우 이동
-    if keys[pygame.K_LEFT]:
-        player["velocity_x"] = -player["speed"]
-        player["direction"] = -1
-    elif keys[pygame.K_RIGHT]:
-        player["velocity_x"] = player["speed"]
-        player["direction"] = 1
-    else:
-        # 마찰력 적용 (얼음이면 적게, 아니면 크게)
-        friction = 0.1 if player["on_ice"] else 0.3
-        if abs(player["velocity_x"]) < friction:
-            player["velocity_x"] = 0
-        elif player["velocity_x"] > 0:
-            player["velocity_x"] -= friction
-        else:
-            player["velocity_x"] += friction
 
-    # 점프
-    if keys[pygame.K_UP]:
-        if player["on_ground"]:
-            # 첫 점프
-            player["velocity_y"] = -player["jump_force"]
-            player["on_ground"] = False
-            player["double_jump_used"] = False
-        elif not player["double_jump_used"]:
-            # 더블 점프
-            player["velocity_y"] = -player["jump_force"]
-            player["double_jump_used"] = True
+def rect_sprite(color, width, height):
+    surf = pygame.Surface((width, height), pygame.SRCALPHA)
+    surf.fill(color)
+    return to_display_format(surf)
 
-    # 대쉬 (Shift)
-    if keys[pygame.K_LSHIFT] or keys[pygame.K_RSHIFT]:
-        if player["dash_ability"] and player["dash_cooldown"] <= 0:
-            dash_power = 15
-            player["velocity_x"] = dash_power * player["direction"]
-            player["dash_cooldown"] = 30  # 대쉬 후 쿨타임
 
-    # 슈팅 (Space)
-    if keys[pygame.K_SPACE]:
-        if player["shooting_cooldown"] <= 0:
-            shoot_bullet()
-            player["shooting_cooldown"] = 15  # 총알 발사 간격
+def ellipse_sprite(color, width, height):
+    surf = pygame.Surface((width, height), pygame.SRCALPHA)
+    pygame.draw.ellipse(surf, color, (0, 0, width, height))
+    return to_display_format(surf)
 
 
-def shoot_bullet():
+class ParticleEmitter:
     """
-    플레이어가 총알 발사
+    배경 파티클 묶음
+    - 속성은 이름별 float 배열 (x, y, speed ...)
+    - sprite 배열은 sprites 목록의 인덱스, offset 은 스프라이트 기준점 보정
     """
-    bullet_speed = 8
-    bullet_direction = player["direction"]
-    bullet_x = player["x"] + player["width"] // 2
-    bullet_y = player["y"] + player["height"] // 2
+    def __init__(self, count, sprites, offsets=None, **fields):
+        self.count = count
+        self.sprites = sprites
+        self.offsets = offsets if offsets is not None else [(0, 0)] * len(sprites)
+        for name, values in fields.items():
+            setattr(self, name, np.asarray(values, dtype=np.float64))
+
+    def __len__(self):
+        return self.count
+
+    def draw(self, surface, sprite_index=None):
+        """
+        모든 파티클을 blits 한 번으로 그림
+        sprite_index: 프레임마다 바뀌는 스프라이트 인덱스 배열 (없으면 self.sprite)
+        반환값: 그린 영역 목록
+        """
+        if sprite_index is None:
+            sprite_index = self.sprite
+        sprites = self.sprites
+        offsets = self.offsets
+        return surface.blits([
+            (sprites[k], (x - offsets[k][0], y - offsets[k][1]))
+            for k, x, y in zip(sprite_index.astype(int).tolist(),
+                               self.x.astype(int).tolist(),
+                               self.y.astype(int).tolist())
+        ])
+
+
+def make_emitter(count, sprites, offsets=None, **fields):
+    """
+    fields: 이름 -> (분포, 인자...) 로 초기값 생성
+      ("int", lo, hi)     : random.randint(lo, hi) 와 같은 정수 균등분포
+      ("uniform", lo, hi) : random.uniform(lo, hi)
+    """
+    values = {}
+    for name, (kind, lo, hi) in fields.items():
+        if kind == "int":
+            values[name] = particle_rng.integers(lo, hi + 1, size=count)
+        else:
+            values[name] = particle_rng.uniform(lo, hi, size=count)
+    return ParticleEmitter(count, sprites, offsets, **values)
 
-    player["bullets"].append({
-        "x": bullet_x,
-        "y": bullet_y,
-        "radius": 5,
-        "speed": bullet_speed * bullet_direction,
-        "color": YELLOW
-    })
 
+# 배경 파티클 스프라이트
+STAR_SPRITES = circle_sprites(WHITE, 5)          # 반지름 1~5 (승리 화면 반짝임까지)
+CLOUD_SIZES = [0.5 + i * 0.1 for i in range(11)]  # 구름 크기 0.5~1.5 를 0.1 단위로
+CLOUD_SPRITES = [ellipse_sprite(WHITE, int(80 * size), int(40 * size)) for size in CLOUD_SIZES]
+BUBBLE_SPRITES = circle_sprites(BLUE, 10)        # 반지름 2~10
+LAVA_SPRITES = [rect_sprite((255, 80, 0), 3, max(h, 1)) for h in range(0, 16)]  # 폭 3, 높이 5~15
+SNOW_SPRITES = circle_sprites(WHITE, 4)          # 반지름 1~4
 
-def update_player():
+# 우주 잔해 - 크기 2~8, 색은 회전값에 따라 번쩍임
+#  - 색상 채널을 DEBRIS_COLOR_STEP 단위로 양자화해서 스프라이트를 필요할 때 만들어 둠
+DEBRIS_COLOR_STEP = 8
+debris_sprite_cache = {}
+
+
+def build_particles(density=PARTICLE_DENSITY):
     """
-    플레이어 물리/상태 업데이트
+    배경 파티클 이미터 생성 (density: 파티클 수 배율, 벤치마크 부하 시나리오에서도 사용)
     """
-    # 중력
-    player["velocity_y"] += player["gravity"]
-    if player["velocity_y"] > 10:
-        player["velocity_y"] = 10
-
-    # 이동
-    player["x"] += player["velocity_x"]
-    player["y"] += player["velocity_y"]
-
-    # 화면 밖으로 나가지 않도록
-    if player["x"] < 0:
-        player["x"] = 0
-    if player["x"] + player["width"] > SCREEN_WIDTH:
-        player["x"] = SCREEN_WIDTH - player["width"]
-    if player["y"] < 0:
-        player["y"] = 0
-        player["velocity_y"] = 0
-    if player["y"] > SCREEN_HEIGHT:  # 바닥 아래로 떨어지면 사망 처리
-        damage_player(999)  # 즉시 사망
+    global stars, clouds, bubbles, lava_particles, snowflakes, space_debris
 
-    # 대쉬 쿨타임
-    if player["dash_cooldown"] > 0:
-        player["dash_cooldown"] -= 1
+    # 별 (Space/Title 화면 등에 사용)
+    stars = make_emitter(
+        100 * density, *STAR_SPRITES,
+        x=("int", 0, SCREEN_WIDTH), y=("int", 0, SCREEN_HEIGHT),
+        sprite=("int", 1, 3), speed=("uniform", 0.1, 0.5),
+    )
 
-    # 무적 시간
-    if player["invincible"]:
-        player["invincible_timer"] -= 1
-        if player["invincible_timer"] <= 0:
-            player["invincible"] = False
+    # 구름 (Forest 레벨 등에 사용)
+    clouds = make_emitter(
+        10 * density, CLOUD_SPRITES,
+        x=("int", -200, SCREEN_WIDTH), y=("int", 50, 150),
+        speed=("uniform", 0.3, 0.7), sprite=("int", 0, len(CLOUD_SIZES) - 1),
+    )
 
-    # 사격 쿨타임
-    if player["shooting_cooldown"] > 0:
-        player["shooting_cooldown"] -= 1
+    # 물방울 (Cave 테마 연출용)
+    bubbles = make_emitter(
+        20 * density, *BUBBLE_SPRITES,
+        x=("int", 0, SCREEN_WIDTH), y=("int", SCREEN_HEIGHT, SCREEN_HEIGHT + 200),
+        sprite=("int", 2, 10), speed=("uniform", 1, 3),
+    )
 
-    # 총알 업데이트
-    for bullet in player["bullets"][:]:
-        bullet["x"] += bullet["speed"]
-        # 화면 밖으로 나가면 제거
-        if bullet["x"] < 0 or bullet["x"] > SCREEN_WIDTH:
-            player["bullets"].remove(bullet)
+    # 용암 파티클
+    lava_particles = make_emitter(
+        30 * density, LAVA_SPRITES,
+        x=("int", 0, SCREEN_WIDTH), y=("int", 550, 600),
+        sprite=("int", 5, 15), speed=("uniform", 2, 5), lifetime=("int", 30, 60),
+    )
 
-    # 플랫폼 충돌 체크
-    check_platform_collisions()
+    # 눈 파티클 (Ice 레벨)
+    snowflakes = make_emitter(
+        100 * density, *SNOW_SPRITES,
+        x=("int", 0, SCREEN_WIDTH), y=("int", -50, SCREEN_HEIGHT),
+        sprite=("int", 1, 4), speed=("uniform", 1, 3), wobble=("uniform", -0.5, 0.5),
+    )
 
-    # 아이템/파워업 수거
-    collect_items()
-    collect_powerups()
+    # 우주 잔해 (Space 레벨)
+    space_debris = make_emitter(
+        20 * density, [],
+        x=("int", 0, SCREEN_WIDTH), y=("int", 0, SCREEN_HEIGHT),
+        size=("int", 2, 8), speed_x=("uniform", -1, 1), speed_y=("uniform", -1, 1),
+        rotation=("uniform", 0, 360), rotation_speed=("uniform", -2, 2),
+    )
 
 
-def damage_player(amount):
+build_particles()
+
+# ===========================
+# 폰트
+# ===========================
+title_font = pygame.font.SysFont("Arial", 64)
+subtitle_font = pygame.font.SysFont("Arial", 32)
+hud_font = pygame.font.SysFont("Arial", 24)
+small_font = pygame.font.SysFont("Arial", 18)
+
+# ===========================
+# 텍스트 렌더 캐시
+#  - 같은 (폰트, 문자열, 색, 안티앨리어싱) 조합은 한 번만 래스터라이즈 (LRU)
+#  - 점수처럼 자주 바뀌는 숫자는 숫자 글리프 아틀라스에서 조합해 그림
+# ===========================
+TEXT_CACHE_SIZE = 256
+DIGIT_GLYPHS = "0123456789/-"
+
+
+class TextCache:
     """
-    플레이어 데미지 처리
+    크기 제한이 있는 텍스트 Surface LRU 캐시
     """
-    global lives, game_state
-    if player["invincible"]:
-        return
+    def __init__(self, capacity=TEXT_CACHE_SIZE):
+        self.capacity = capacity
+        self.surfaces = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.surfaces)
+
+    def render(self, font, text, color, antialias=True):
+        key = (font, text, color, antialias)
+        surface = self.surfaces.get(key)
+        if surface is not None:
+            self.surfaces.move_to_end(key)
+            self.hits += 1
+            return surface
+        self.misses += 1
+        surface = font.render(text, antialias, color)
+        self.surfaces[key] = surface
+        if len(self.surfaces) > self.capacity:
+            self.surfaces.popitem(last=False)
+        return surface
+
+
+class GlyphAtlas:
+    """
+    숫자 글리프 아틀라스 (폰트/색 조합별로 한 장)
+    - DIGIT_GLYPHS 를 가로로 이어 붙인 Surface 와 글자별 영역/전진폭
+    """
+    def __init__(self, font, color, antialias=True):
+        glyphs = [font.render(ch, antialias, color) for ch in DIGIT_GLYPHS]
+        width = sum(g.get_width() for g in glyphs)
+        self.height = max(g.get_height() for g in glyphs)
+        atlas = pygame.Surface((width, self.height), pygame.SRCALPHA)
+        self.areas = {}
+        self.advances = {}
+        x = 0
+        for ch, glyph, metrics in zip(DIGIT_GLYPHS, glyphs, font.metrics(DIGIT_GLYPHS)):
+            # 알파를 섞지 않고 그대로 복사 (투명 배경에 블렌딩하면 가장자리가 어두워짐)
+            atlas.blit(glyph, (x, 0), special_flags=pygame.BLEND_RGBA_MAX)
+            self.areas[ch] = pygame.Rect(x, 0, glyph.get_width(), glyph.get_height())
+            self.advances[ch] = metrics[4] if metrics else glyph.get_width()
+            x += glyph.get_width()
+        self.surface = to_display_format(atlas)
+
+    def width(self, text):
+        advances = self.advances
+        return sum(advances[ch] for ch in text)
+
+    def draw(self, surface, text, x, y):
+        atlas = self.surface
+        areas = self.areas
+        advances = self.advances
+        batch = []
+        for ch in text:
+            batch.append((atlas, (x, y), areas[ch]))
+            x += advances[ch]
+        surface.blits(batch, False)
+
+
+text_cache = TextCache()
+glyph_atlases = {}
+
+
+def glyph_atlas(font, color, antialias=True):
+    key = (font, color, antialias)
+    atlas = glyph_atlases.get(key)
+    if atlas is None:
+        atlas = glyph_atlases[key] = GlyphAtlas(font, color, antialias)
+    return atlas
+
+
+def render_text(font, text, color, antialias=True):
+    """
+    font.render 대신 쓰는 캐시된 텍스트 렌더링
+    """
+    return text_cache.render(font, text, color, antialias)
 
-    player["health"] -= amount
-    if player["health"] <= 0:
-        # 라이프 감소 후 체크
-        lives -= 1
-        if lives > 0:
-            player["health"] = player["max_health"]
-            reset_level()
-        else:
-            game_state = GameState.GAME_OVER
 
+def draw_counter(font, label, value, color, pos=None, center=None):
+    """
+    "Score: 1234" 처럼 라벨 + 숫자 텍스트 그리기
+    - 라벨은 텍스트 캐시, 숫자는 글리프 아틀라스에서 조합
+    - pos(왼쪽 위) 또는 center(가운데) 기준, 그린 영역을 돌려줌
+    """
+    label_surface = text_cache.render(font, label, color)
+    atlas = glyph_atlas(font, color)
+    value = str(value)
+    label_width = label_surface.get_width()
+    rect = pygame.Rect(0, 0, label_width + atlas.width(value),
+                       max(label_surface.get_height(), atlas.height))
+    if center is not None:
+        rect.center = center
+    else:
+        rect.topleft = pos
+    screen.blit(label_surface, rect.topleft)
+    atlas.draw(screen, value, rect.x + label_width, rect.y)
+    return rect
 
-def check_platform_collisions():
+# ===========================
+# 애니메이션 굽기
+#  - math.sin(timer / N) 류의 주기 함수는 한 주기만큼 룩업 테이블로 미리 계산
+#  - 모양이 몇 가지 크기로만 바뀌는 것(포털, 파워업, 승리 화면 결정)은
+#    크기별 Surface 를 미리 그려 두고 blit 만 함 (포털/파워업은 스프라이트 아틀라스에)
+# ===========================
+class PeriodicTable:
     """
-    플랫폼 충돌로 플레이어 on_ground 체크, y위치 보정 등
-    (움직이는 플랫폼이면 플랫폼과 함께 이동 처리)
-    """
-    player_rect = pygame.Rect(player["x"], player["y"], player["width"], player["height"])
-    player["on_ground"] = False
-
-    for p in level_designs[current_level]["platforms"]:
-        platform_rect = pygame.Rect(p["x"], p["y"], p["width"], p["height"])
-        if player_rect.colliderect(platform_rect):
-            # 수직 충돌 감지
-            # 플레이어가 위에서 내려오고 있으면
-            if player["velocity_y"] > 0 and player_rect.bottom <= platform_rect.bottom:
-                player["y"] = p["y"] - player["height"]
-                player["velocity_y"] = 0
-                player["on_ground"] = True
-                # 얼음 여부 체크
-                if level_designs[current_level]["theme"] == LevelTheme.ICE:
-                    player["on_ice"] = True
-                else:
-                    player["on_ice"] = False
+    timer 에 대한 주기 함수 룩업 테이블
+    - func 는 한 주기 안의 위상(0 ~ 1)을 받아 값을 돌려줌
+    - table[t] == table[t % period]
+    """
+    def __init__(self, period, func):
+        self.period = period
+        self.values = [func(i / period) for i in range(period)]
 
-                # 움직이는 플랫폼이면, 플랫폼의 움직임에 따라 x 이동
-                if "moving" in p and p["moving"]:
-                    # 플레이어가 플랫폼 위에 있는 동안 함께 이동
-                    player["x"] += p["speed"] * p["direction"]
+    def __getitem__(self, t):
+        return self.values[int(t) % self.period]
 
-    # 용암 테마면, 바닥(0번 플랫폼)이 용암
-    if level_designs[current_level]["theme"] == LevelTheme.LAVA:
-        # 바닥 플랫폼 y=550 (전체 너비)
-        # 플레이어가 y+height>=550이면, 데미지
-        if player["y"] + player["height"] >= 550:
-            # 용암 데미지
-            damage_player(0.1)  # 매 프레임마다 조금씩 데미지
 
+trig_tables = {}
 
-def collect_items():
+
+def sin_table(divisor):
     """
-    레벨에 놓인 크리스탈(collectibles) 습득 처리
+    math.sin(timer / divisor) 룩업 테이블 (주기 = round(2π·divisor) 프레임)
     """
-    global score, collected_gems
-    player_rect = pygame.Rect(player["x"], player["y"], player["width"], player["height"])
-
-    for c in level_designs[current_level]["collectibles"]:
-        if not c["collected"]:
-            c_rect = pygame.Rect(c["x"], c["y"], 20, 20)
-            if player_rect.colliderect(c_rect):
-                c["collected"] = True
-                collected_gems += 1
-                score += 100  # 보석 하나당 100점 추가
+    key = ("sin", divisor)
+    table = trig_tables.get(key)
+    if table is None:
+        period = round(2 * math.pi * divisor)
+        table = trig_tables[key] = PeriodicTable(period, lambda phase: math.sin(2 * math.pi * phase))
+    return table
 
 
-def collect_powerups():
+def abs_sin_table(divisor):
     """
-    레벨에 놓인 파워업 습득 처리
+    abs(math.sin(timer / divisor)) 룩업 테이블 (주기 = round(π·divisor) 프레임)
     """
-    player_rect = pygame.Rect(player["x"], player["y"], player["width"], player["height"])
+    key = ("abs_sin", divisor)
+    table = trig_tables.get(key)
+    if table is None:
+        period = round(math.pi * divisor)
+        table = trig_tables[key] = PeriodicTable(period, lambda phase: abs(math.sin(math.pi * phase)))
+    return table
 
-    for p in level_designs[current_level]["power_ups"]:
-        if not p["collected"]:
-            p_rect = pygame.Rect(p["x"], p["y"], 20, 20)
-            if player_rect.colliderect(p_rect):
-                p["collected"] = True
-                # 파워업 적용
-                apply_powerup(p["type"])
+
+class FrameCache:
+    """
+    키(위상, 크기 등)별로 한 번만 그린 Surface 를 재사용하는 프레임 캐시
+    render(key) 가 Surface 를 돌려줌
+    """
+    def __init__(self, render, keys=()):
+        self.render = render
+        self.frames = {}
+        for key in keys:
+            self[key]
+
+    def __getitem__(self, key):
+        frame = self.frames.get(key)
+        if frame is None:
+            frame = self.frames[key] = self.render(key)
+        return frame
+
+
+def crystal_color(t, offset=0):
+    """
+    결정 반짝임 색 (timer 기준, offset 은 결정마다 다른 위상)
+    """
+    return (
+        int(100 + 155 * abs_sin_table(20)[t + 20 * offset]),
+        int(100 + 155 * abs_sin_table(15)[t + 15 * offset]),
+        int(200 + 55 * abs_sin_table(10)[t + 10 * offset])
+    )
+
+
+def pulse_text_frames(font, text, color_of_pulse):
+    """
+    (sin(timer / 10) + 1) / 2 로 색이 깜박이는 문구의 프레임 캐시 (위상별 한 장)
+    """
+    table = sin_table(10)
+
+    def render(phase):
+        pulse = (table[phase] + 1) / 2
+        return font.render(text, True, color_of_pulse(pulse))
+    return FrameCache(render)
+
+
+# 타이틀 화면 하단 장식 결정 (높이는 고정 시드로 한 번만 정해서 깜박이지 않게)
+TITLE_CRYSTAL_SEED = 7
+title_crystal_rng = random.Random(TITLE_CRYSTAL_SEED)
+TITLE_CRYSTAL_HEIGHTS = [title_crystal_rng.randint(20, 50) for _ in range(10)]
+
+# 깜박이는 문구들
+title_prompt_frames = pulse_text_frames(
+    subtitle_font, "Press SPACE to Start",
+    lambda pulse: (int(255 * pulse), int(255 * pulse), int(255 * (1 - pulse))))
+game_over_prompt_frames = pulse_text_frames(
+    subtitle_font, "Press R to Restart",
+    lambda pulse: (int(255 * pulse), int(255 * (1 - pulse)), int(100 * pulse)))
+win_prompt_frames = pulse_text_frames(
+    subtitle_font, "Press R to Play Again",
+    lambda pulse: (int(100 * pulse), int(255 * pulse), int(100 * pulse)))
+
+
+def render_title_layer():
+    """
+    타이틀 화면에서 움직이지 않는 부분 (제목, 안내문, 플레이어 그림, 결정 로고)
+    """
+    layer = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT), pygame.SRCALPHA)
+
+    title_text = render_text(title_font, "Crystal Cavern Chronicles", CYAN)
+    layer.blit(title_text, title_text.get_rect(center=(SCREEN_WIDTH // 2, 150)))
+
+    # 컨트롤 안내
+    controls_text1 = render_text(small_font, "Controls: Arrow Keys to Move, UP to Jump, SPACE to Shoot", WHITE)
+    controls_text2 = render_text(small_font, "Press SHIFT to Dash, Collect Crystals and Defeat Enemies", WHITE)
+    layer.blit(controls_text1, controls_text1.get_rect(center=(SCREEN_WIDTH // 2, 450)))
+    layer.blit(controls_text2, controls_text2.get_rect(center=(SCREEN_WIDTH // 2, 480)))
+
+    # 간단한 플레이어 그림
+    player_x = SCREEN_WIDTH // 2
+    player_y = 250
+    pygame.draw.rect(layer, BLUE, (player_x - 15, player_y - 25, 30, 50))  # 몸통
+    pygame.draw.circle(layer, LIGHT_BLUE, (player_x, player_y - 35), 15)   # 머리
+    pygame.draw.circle(layer, WHITE, (player_x - 5, player_y - 38), 4)     # 왼눈
+    pygame.draw.circle(layer, WHITE, (player_x + 5, player_y - 38), 4)     # 오른눈
+    pygame.draw.circle(layer, BLACK, (player_x - 5, player_y - 38), 2)
+    pygame.draw.circle(layer, BLACK, (player_x + 5, player_y - 38), 2)
+
+    # 옆에 결정 로고
+    crystal_points = [
+        (player_x + 50, player_y - 10),
+        (player_x + 65, player_y - 30),
+        (player_x + 80, player_y - 10),
+        (player_x + 65, player_y + 20)
+    ]
+    pygame.draw.polygon(layer, CYAN, crystal_points)
+    pygame.draw.polygon(layer, WHITE, crystal_points, 2)
+    return to_display_format(layer)
+
+
+title_layer = render_title_layer()
+
+# 승리 화면 거대한 결정: 크기 = 50 + sin(timer / 15) * 5 (정수 크기별로 구움)
+WIN_CRYSTAL_CENTER = (SCREEN_WIDTH // 2, 500)
+WIN_CRYSTAL_MARGIN = 20  # 글로우가 퍼지는 여유
+
+
+def win_crystal_points(size, cx, cy, grow=0):
+    return [
+        (cx, cy - size - grow),
+        (cx + size * 0.7 + grow, cy),
+        (cx, cy + size * 0.7 + grow),
+        (cx - size * 0.7 - grow, cy)
+    ]
+
+
+def render_win_glow(size):
+    """
+    결정 뒤 아우라/글로우 (크기별 한 장, 중심이 Surface 가운데)
+    """
+    extent = size + WIN_CRYSTAL_MARGIN
+    surf = pygame.Surface((extent * 2, extent * 2), pygame.SRCALPHA)
+    for i in range(5, 0, -1):
+        glow_color = (
+            int(100 + (5 - i) * 30),
+            int(100 + (5 - i) * 30),
+            int(200 + (5 - i) * 10)
+        )
+        pygame.draw.polygon(surf, glow_color, win_crystal_points(size, extent, extent, i * 3))
+    return to_display_format(surf)
+
+
+def render_win_overlay(size):
+    """
+    결정 본체 위에 덮는 테두리와 반사선 (크기별 한 장)
+    """
+    extent = size + WIN_CRYSTAL_MARGIN
+    surf = pygame.Surface((extent * 2, extent * 2), pygame.SRCALPHA)
+    pygame.draw.polygon(surf, WHITE, win_crystal_points(size, extent, extent), 2)
+    pygame.draw.line(surf, WHITE, (extent - 10, extent - size * 0.6), (extent + 5, extent - size * 0.2))
+    pygame.draw.line(surf, WHITE, (extent + 10, extent - size * 0.4), (extent - 5, extent - size * 0.1))
+    return to_display_format(surf)
+
+
+WIN_CRYSTAL_SIZES = range(45, 56)
+win_glow_frames = FrameCache(render_win_glow, WIN_CRYSTAL_SIZES)
+win_overlay_frames = FrameCache(render_win_overlay, WIN_CRYSTAL_SIZES)
+
+
+def render_portal(radius):
+    """
+    반짝이는 원형 포털 (반지름 20~25 별로 한 장)
+    """
+    surf = pygame.Surface((radius * 2, radius * 2), pygame.SRCALPHA)
+    pygame.draw.circle(surf, (0, 255, 100), (radius, radius), radius)
+    pygame.draw.circle(surf, WHITE, (radius, radius), radius, 2)
+    return surf
+
+
+POWERUP_COLORS = {
+    "health": GREEN,
+    "speed": ORANGE,
+    "jump": PINK,
+    "shield": WHITE,
+}
+
+
+def render_powerup(key):
+    """
+    번쩍이는 파워업 사각형 ((종류, 크기) 별로 한 장)
+    """
+    power_type, size = key
+    surf = pygame.Surface((size, size), pygame.SRCALPHA)
+    surf.fill(POWERUP_COLORS.get(power_type, YELLOW))
+    pygame.draw.rect(surf, BLACK, (0, 0, size, size), 1)
+    return surf
+
+
+# ===========================
+# 스프라이트 아틀라스
+#  - 게임 플레이 화면의 엔티티(움직이는 플랫폼, 포털, 크리스탈, 파워업, 적, 보스, 플레이어, 총알)를
+#    (종류, 색/테마, 크기, 애니메이션 프레임) 키마다 처음 쓸 때 한 번만 그려 아틀라스 페이지에 모아 둠
+#  - 페이지는 화면 픽셀 포맷, 선반(shelf) 방식으로 왼쪽부터 채우고 줄이 차면 아랫줄로
+#    스프라이트가 모두 안티앨리어싱 없는 도형이라 알파 대신 컬러키 페이지 (픽셀별 알파 blit 보다 빠름,
+#    RLE 는 큰 페이지의 일부 영역을 잘라 그릴 때 오히려 느려서 쓰지 않음)
+#  - draw_gameplay 는 그릴 것을 (페이지, 위치, 영역) 목록으로 모았다가 Surface.blits 한 번으로 출력
+# ===========================
+SPRITE_PAGE_SIZE = 1024
+SPRITE_COLORKEY = (255, 0, 255)  # 엔티티 색으로 쓰지 않는 색
+ENEMY_COLORS = {
+    "walker": (200, 0, 0),
+    "flyer": (255, 128, 0),
+    "jumper": (255, 0, 128),
+}
+
+
+def render_rect_sprite(color, width, height):
+    surf = pygame.Surface((width, height), pygame.SRCALPHA)
+    surf.fill(color)
+    return surf, (0, 0)
+
+
+def render_circle_sprite(color, radius):
+    surf = pygame.Surface((radius * 2, radius * 2), pygame.SRCALPHA)
+    pygame.draw.circle(surf, color, (radius, radius), radius)
+    return surf, (radius, radius)
+
+
+def render_crystal_sprite():
+    """
+    작은 보석 (기준점이 보석 가운데)
+    """
+    surf = pygame.Surface((21, 16), pygame.SRCALPHA)
+    points = [(10, 0), (20, 5), (10, 15), (0, 5)]
+    pygame.draw.polygon(surf, CYAN, points)
+    pygame.draw.polygon(surf, WHITE, points, 1)
+    return surf, (10, 5)
+
+
+def render_player_sprite(color, width, height):
+    """
+    몸통 + 머리(원) (기준점이 몸통 왼쪽 위)
+    """
+    surf = pygame.Surface((width, height + 20), pygame.SRCALPHA)
+    pygame.draw.rect(surf, color, (0, 20, width, height))
+    pygame.draw.circle(surf, LIGHT_BLUE, (width // 2, 10), 10)
+    return surf, (0, 20)
+
+
+def render_portal_sprite(radius):
+    return render_portal(radius), (radius, radius)
+
+
+def render_powerup_sprite(power_type, size):
+    return render_powerup((power_type, size)), (size // 2, size // 2)
+
+
+SPRITE_RENDERERS = {
+    "rect": render_rect_sprite,
+    "circle": render_circle_sprite,
+    "crystal": render_crystal_sprite,
+    "player": render_player_sprite,
+    "portal": render_portal_sprite,
+    "powerup": render_powerup_sprite,
+}
+
+
+class SpriteAtlas:
+    """
+    키 -> (페이지, 페이지 안 영역, 기준점) 스프라이트 아틀라스
+    - 키는 (종류, 인자...) 튜플, 종류별 그리기 함수는 SPRITE_RENDERERS (Surface, 기준점) 을 돌려줌
+    - queue(batch, key, x, y) 는 기준점이 (x, y) 에 오도록 blits 항목을 추가
+    """
+    def __init__(self, renderers=SPRITE_RENDERERS, page_size=SPRITE_PAGE_SIZE):
+        self.renderers = renderers
+        self.page_size = page_size
+        self.pages = []
+        self.sprites = {}
+        self.shelf_page = None  # 선반식으로 채우는 페이지 (혼자 한 장을 쓰는 큰 스프라이트 페이지는 아님)
+        self.cursor_x = self.cursor_y = self.shelf_height = page_size  # 첫 스프라이트에서 새 페이지
+
+    def __getitem__(self, key):
+        sprite = self.sprites.get(key)
+        if sprite is None:
+            surf, origin = self.renderers[key[0]](*key[1:])
+            page, area = self._pack(surf)
+            sprite = self.sprites[key] = (page, area, origin)
+        return sprite
+
+    def preload(self, keys):
+        for key in keys:
+            self[key]
+
+    def _pack(self, surf):
+        w, h = surf.get_size()
+        size = self.page_size
+        if w > size or h > size:
+            # 페이지보다 큰 스프라이트는 혼자 한 장
+            page = self._new_page(w, h)
+            page.blit(surf, (0, 0))
+            return page, pygame.Rect(0, 0, w, h)
+        if self.cursor_x + w > size:
+            self.cursor_x = 0
+            self.cursor_y += self.shelf_height
+            self.shelf_height = 0
+        if self.cursor_y + h > size:
+            self.shelf_page = self._new_page(size, size)
+            self.cursor_x = self.cursor_y = self.shelf_height = 0
+        page = self.shelf_page
+        area = pygame.Rect(self.cursor_x, self.cursor_y, w, h)
+        page.blit(surf, area)
+        self.cursor_x += w
+        self.shelf_height = max(self.shelf_height, h)
+        return page, area
+
+    def _new_page(self, w, h):
+        page = pygame.Surface((w, h))
+        if not HEADLESS:
+            page = page.convert()
+        page.fill(SPRITE_COLORKEY)
+        page.set_colorkey(SPRITE_COLORKEY)
+        self.pages.append(page)
+        return page
+
+    def queue(self, batch, key, x, y):
+        page, area, (ox, oy) = self[key]
+        batch.append((page, (x - ox, y - oy), area))
+
+
+sprite_atlas = SpriteAtlas()
+sprite_atlas.preload([("crystal",)]
+                     + [("portal", radius) for radius in range(20, 26)]
+                     + [("powerup", power_type, size) for power_type in POWERUP_COLORS for size in range(10, 14)]
+                     + [("player", color, 30, 50) for color in (BLUE, WHITE)]
+                     + [("rect", color, 30, 30) for color in ENEMY_COLORS.values()])
+
+# ===========================
+# 특수 효과 & 파워업
+# ===========================
+effects = []
+
+# ===========================
+# 공간 해시 (충돌 브로드페이즈)
+#  - 화면을 균일한 격자로 나누고, 움직이는 객체를 걸치는 셀에 등록
+#  - 충돌 검사 시 주변 셀의 객체만 후보로 보므로 적 수 × 총알 수만큼 돌지 않음
+# ===========================
+SPATIAL_CELL_SIZE = 64
+
+
+class SpatialHash:
+    """
+    균일 격자 공간 해시
+    - insert/update/remove 로 객체의 AABB 를 등록/갱신
+    - update 는 걸치는 셀이 바뀐 경우에만 셀을 옮김 (증분 갱신)
+    - query 는 사각형과 같은 셀에 있는 객체 후보를 등록 순서대로 돌려줌
+    """
+    def __init__(self, cell_size=SPATIAL_CELL_SIZE):
+        self.cell_size = cell_size
+        self.cells = {}    # (cx, cy) -> {id(obj): obj}
+        self.entries = {}  # id(obj) -> 셀 범위 (x0, y0, x1, y1)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, obj):
+        return id(obj) in self.entries
+
+    def _cell_range(self, x, y, w, h):
+        cs = self.cell_size
+        return (int(x // cs), int(y // cs), int((x + w) // cs), int((y + h) // cs))
+
+    def _add_cells(self, obj, key, cell_range):
+        x0, y0, x1, y1 = cell_range
+        cells = self.cells
+        for cx in range(x0, x1 + 1):
+            for cy in range(y0, y1 + 1):
+                bucket = cells.get((cx, cy))
+                if bucket is None:
+                    bucket = cells[(cx, cy)] = {}
+                bucket[key] = obj
+
+    def _remove_cells(self, key, cell_range):
+        x0, y0, x1, y1 = cell_range
+        cells = self.cells
+        for cx in range(x0, x1 + 1):
+            for cy in range(y0, y1 + 1):
+                bucket = cells.get((cx, cy))
+                if bucket is not None:
+                    bucket.pop(key, None)
+                    if not bucket:
+                        del cells[(cx, cy)]
+
+    def insert(self, obj, x, y, w, h):
+        key = id(obj)
+        if key in self.entries:
+            self.update(obj, x, y, w, h)
+            return
+        cell_range = self._cell_range(x, y, w, h)
+        self.entries[key] = cell_range
+        self._add_cells(obj, key, cell_range)
+
+    def update(self, obj, x, y, w, h):
+        key = id(obj)
+        old_range = self.entries.get(key)
+        new_range = self._cell_range(x, y, w, h)
+        if old_range == new_range:
+            return
+        if old_range is not None:
+            self._remove_cells(key, old_range)
+        self.entries[key] = new_range
+        self._add_cells(obj, key, new_range)
+
+    def remove(self, obj):
+        key = id(obj)
+        cell_range = self.entries.pop(key, None)
+        if cell_range is not None:
+            self._remove_cells(key, cell_range)
+
+    def clear(self):
+        self.cells.clear()
+        self.entries.clear()
+
+    def query(self, x, y, w, h):
+        x0, y0, x1, y1 = self._cell_range(x, y, w, h)
+        cells = self.cells
+        if x0 == x1 and y0 == y1:
+            bucket = cells.get((x0, y0))
+            return list(bucket.values()) if bucket else []
+        found = {}
+        for cx in range(x0, x1 + 1):
+            for cy in range(y0, y1 + 1):
+                bucket = cells.get((cx, cy))
+                if bucket:
+                    found.update(bucket)
+        return list(found.values())
+
+
+# 엔티티 종류별 해시
+# (총알은 ProjectilePool 에서 배열 단위로 판정하므로 여기 등록하지 않음)
+enemy_grid = SpatialHash()
+collectible_grid = SpatialHash()
+powerup_grid = SpatialHash()
+
+
+def rebuild_spatial_index():
+    """
+    현재 레벨 기준으로 공간 해시를 새로 구성 (레벨 시작/재시작 시)
+    """
+    level = active_level
+    for grid in (enemy_grid, collectible_grid, powerup_grid):
+        grid.clear()
+    for e in level.enemies:
+        enemy_grid.insert(e, e.x, e.y, e.width, e.height)
+    for c in level.collectibles:
+        if not c.collected:
+            collectible_grid.insert(c, c.x, c.y, ITEM_SIZE, ITEM_SIZE)
+    for p in level.power_ups:
+        if not p.collected:
+            powerup_grid.insert(p, p.x, p.y, ITEM_SIZE, ITEM_SIZE)
+
+
+rebuild_spatial_index()
+
+# ===========================
+# 정적 플랫폼 충돌 격자
+#  - 레벨 로드 시 움직이지 않는 플랫폼을 한 번만 격자에 컴파일
+#  - "이 사각형과 겹치는 고체는?" 질의를 주변 셀만 보고 처리
+#  - 움직이는 플랫폼은 경로 전체(왕복 범위)를 덮는 상자로 따로 격자에 넣음 (mover_grid)
+#    질의 결과는 그 사각형에 올 수 있는 움직이는 플랫폼만 (움직이는 플랫폼 수와 무관)
+#  - 청크 파일 레벨은 빈 격자에서 시작해 상주 청크의 플랫폼만 add/remove
+# ===========================
+STATIC_CELL_SIZE = 64
+
+
+class StaticCollisionGrid:
+    """
+    정적 플랫폼 점유 격자 (컴파일 후 읽기 전용, 청크 스트리밍 때만 add/remove)
+    - 셀마다 걸치는 플랫폼 인덱스 튜플을 저장
+    - query 는 후보 인덱스를 원래 플랫폼 순서대로 돌려줌
+    """
+    def __init__(self, platforms, cell_size=STATIC_CELL_SIZE):
+        self.cell_size = cell_size
+        cells = {}
+        for i, p in enumerate(platforms):
+            if p is None or p.get("moving"):
+                continue
+            for key in self.cell_keys(p):
+                cells.setdefault(key, []).append(i)
+        self.cells = {key: tuple(indices) for key, indices in cells.items()}
+
+    def cell_keys(self, p):
+        cs = self.cell_size
+        x0 = int(p["x"] // cs)
+        y0 = int(p["y"] // cs)
+        x1 = int((p["x"] + p["width"]) // cs)
+        y1 = int((p["y"] + p["height"]) // cs)
+        return [(cx, cy) for cx in range(x0, x1 + 1) for cy in range(y0, y1 + 1)]
+
+    def add(self, i, p):
+        cells = self.cells
+        for key in self.cell_keys(p):
+            cells[key] = tuple(sorted(cells.get(key, ()) + (i,)))
+
+    def remove(self, i, p):
+        cells = self.cells
+        for key in self.cell_keys(p):
+            rest = tuple(j for j in cells.get(key, ()) if j != i)
+            if rest:
+                cells[key] = rest
+            else:
+                cells.pop(key, None)
+
+    def query(self, x, y, w, h):
+        cs = self.cell_size
+        cells = self.cells
+        x0, y0 = int(x // cs), int(y // cs)
+        x1, y1 = int((x + w) // cs), int((y + h) // cs)
+        if x0 == x1 and y0 == y1:
+            return cells.get((x0, y0), ())
+        found = set()
+        for cx in range(x0, x1 + 1):
+            for cy in range(y0, y1 + 1):
+                indices = cells.get((cx, cy))
+                if indices:
+                    found.update(indices)
+        return sorted(found)
+
+
+def mover_sweep_box(p, path):
+    """
+    움직이는 플랫폼이 경로를 따라 지나가는 영역 (StaticCollisionGrid 에 넣을 수 있는 x/y/width/height)
+    """
+    return {"x": path.lo, "y": p["y"], "width": path.span + p["width"], "height": p["height"]}
+
+
+def build_mover_grid(design):
+    """
+    레벨의 움직이는 플랫폼 격자 (플랫폼마다 경로 전체를 덮는 상자로 등록)
+    """
+    grid = StaticCollisionGrid(())
+    for i, path in design.platform_paths.items():
+        grid.add(i, mover_sweep_box(design.platforms[i], path))
+    return grid
+
+
+# 레벨 인덱스별 컴파일 결과 캐시 (정적 플랫폼, 움직이는 플랫폼 경로는 변하지 않음)
+static_grids = {}
+mover_grids = {}
+static_grid = None
+mover_grid = None
+moving_platform_indices = ()
+
+
+def load_level_collision():
+    """
+    현재 레벨의 정적 충돌 격자를 준비 (처음 한 번만 컴파일)
+    - 청크 파일 레벨은 매번 헤더 플랫폼만 든 격자에서 시작 (나머지는 update_residency 가 채움)
+    """
+    global static_grid, mover_grid, moving_platform_indices
+    design = level_designs[current_level]
+    platforms = design.platforms
+    if design.chunk_store is not None:
+        static_grid = StaticCollisionGrid(platforms)
+    else:
+        if current_level not in static_grids:
+            static_grids[current_level] = StaticCollisionGrid(platforms)
+        static_grid = static_grids[current_level]
+    if current_level not in mover_grids:
+        mover_grids[current_level] = build_mover_grid(design)
+    mover_grid = mover_grids[current_level]
+    moving_platform_indices = tuple(i for i, p in enumerate(platforms) if p is not None and p.get("moving"))
+    reset_residency()
+
+
+def platforms_near(x, y, w, h):
+    """
+    사각형과 겹칠 수 있는 플랫폼 후보 (정적 격자 + 경로가 겹치는 움직이는 플랫폼, 원래 순서)
+    """
+    platforms = active_level.platforms
+    indices = static_grid.query(x, y, w, h)
+    if moving_platform_indices:
+        movers = mover_grid.query(x, y, w, h)
+        if movers:
+            sync_movers(movers)
+            indices = sorted(set(indices).union(movers))
+    return [platforms[i] for i in indices]
+
+
+# ===========================
+# 연속 충돌 (swept AABB)
+#  - 움직이기 전 상자와 이번 틱 이동량으로 플랫폼에 처음 닿는 시각(0~1, time of impact)을 구해서
+#    닿는 지점에서 멈추고, 막힌 축의 속도만 지운 뒤 남은 이동을 다른 축으로 이어감 (벽/바닥을 따라 미끄러짐)
+#  - 한 틱 이동량이 플랫폼 두께보다 커도(대쉬, 빠른 낙하, 큰 타임스텝) 뚫고 지나가지 않음
+#  - 처음부터 겹쳐 있는 플랫폼은 막지 않음 (움직이는 플랫폼에 밀려 들어간 경우 빠져나올 수 있도록)
+#  - 맞닿기만 한 면은 겹침이 아님 (바닥 위를 걸을 때 옆 플랫폼 윗면 모서리에 걸리지 않음)
+#  - 플레이어, 적(walker/jumper), 적 길찾기 그래프, 레벨 검증기가 같은 함수를 씀
+#    투사체는 ProjectilePool.sweep_cull 이 같은 방식으로 배열 단위 판정 (닿으면 제거)
+# ===========================
+def platform_box(p, x=None):
+    """
+    플랫폼의 (left, top, right, bottom) (x: 다른 위치에서 계산할 때, 검증기의 움직이는 플랫폼 등)
+    """
+    if x is None:
+        x = p["x"]
+    return x, p["y"], x + p["width"], p["y"] + p["height"]
+
+
+def sweep_aabb(x, y, w, h, dx, dy, box):
+    """
+    (x, y, w, h) 상자가 (dx, dy) 만큼 움직일 때 box 에 처음 닿는 (시각, 축) ("x": 옆면, "y": 윗면/아랫면)
+    - 닿지 않거나, 처음부터 겹쳐 있거나, 스치기만 하면 None
+    - 모서리에 동시에 닿으면 "y" (바닥에 내려앉음)
+    """
+    left, top, right, bottom = box
+    if dx > 0:
+        x_entry = (left - x - w) / dx
+        x_exit = (right - x) / dx
+    elif dx < 0:
+        x_entry = (right - x) / dx
+        x_exit = (left - x - w) / dx
+    elif x < right and x + w > left:
+        x_entry, x_exit = -math.inf, math.inf
+    else:
+        return None
+    if dy > 0:
+        y_entry = (top - y - h) / dy
+        y_exit = (bottom - y) / dy
+    elif dy < 0:
+        y_entry = (bottom - y) / dy
+        y_exit = (top - y - h) / dy
+    elif y < bottom and y + h > top:
+        y_entry, y_exit = -math.inf, math.inf
+    else:
+        return None
+    entry = max(x_entry, y_entry)
+    if entry < 0 or entry > 1 or entry >= min(x_exit, y_exit):
+        return None
+    return entry, "y" if y_entry >= x_entry else "x"
+
+
+def sweep_move(x, y, w, h, dx, dy, boxes):
+    """
+    상자를 (dx, dy) 만큼 옮기되 boxes 에 막히면 닿는 면에서 멈추고 남은 이동은 다른 축으로 미끄러짐
+    반환값: (x, y, 옆면으로 막은 box 인덱스, 위/아래로 막은 box 인덱스) (막히지 않았으면 None)
+    - 위/아래 구분은 넘겨준 dy 부호로 (dy > 0 이면 바닥에 내려앉음)
+    """
+    hit_x = hit_y = None
+    while dx or dy:
+        # 이동 경로 전체를 덮는 사각형과 (맞닿는 것까지) 겹치지 않는 상자는 정밀 판정을 건너뜀
+        x0, x1 = (x, x + w + dx) if dx >= 0 else (x + dx, x + w)
+        y0, y1 = (y, y + h + dy) if dy >= 0 else (y + dy, y + h)
+        first = None
+        for i, box in enumerate(boxes):
+            if box[0] > x1 or box[2] < x0 or box[1] > y1 or box[3] < y0:
+                continue
+            hit = sweep_aabb(x, y, w, h, dx, dy, box)
+            if hit is not None and (first is None or hit[0] < first[0]):
+                first = hit[0], hit[1], i
+        if first is None:
+            return x + dx, y + dy, hit_x, hit_y
+        t, axis, i = first
+        left, top, right, bottom = boxes[i]
+        if axis == "y":
+            x += dx * t
+            y = top - h if dy > 0 else bottom
+            dx *= 1 - t
+            dy = 0
+            hit_y = i
+        else:
+            x = left - w if dx > 0 else right
+            y += dy * t
+            dy *= 1 - t
+            dx = 0
+            hit_x = i
+    return x, y, hit_x, hit_y
+
+
+def sweep_bounds(x, y, w, h, dx, dy):
+    """
+    이동 전후 상자를 모두 덮는 사각형 (x, y, w, h) (충돌 후보 질의용)
+    """
+    return min(x, x + dx), min(y, y + dy), w + abs(dx), h + abs(dy)
+
+
+def platform_boxes(x, y, w, h):
+    """
+    사각형과 겹칠 수 있는 플랫폼의 상자 목록 (투사체 sweep_cull 용)
+    """
+    return [(p["x"], p["y"], p["x"] + p["width"], p["y"] + p["height"]) for p in platforms_near(x, y, w, h)]
+
+
+def platforms_swept(x, y, w, h, dx, dy):
+    """
+    (dx, dy) 이동 경로와 겹칠 수 있는 플랫폼 목록과 그 상자 목록 (sweep_move 에 넘김, 인덱스가 같음)
+    """
+    platforms = platforms_near(*sweep_bounds(x, y, w, h, dx, dy))
+    return platforms, [(p["x"], p["y"], p["x"] + p["width"], p["y"] + p["height"]) for p in platforms]
+
+
+# ===========================
+# 카메라 & 청크 상주 관리
+#  - 게임 좌표는 모두 월드 좌표, 화면에 그릴 때만 카메라 위치를 뺌
+#  - 카메라는 플레이어가 데드존(화면 가장자리에서 CAMERA_MARGIN 안쪽)을 벗어날 때만 따라가고,
+#    월드 밖은 보여주지 않음 (화면 한 장짜리 레벨은 항상 (0, 0))
+#  - 월드를 chunk_size 격자(청크)로 나눠 카메라가 보는 청크 둘레 CHUNK_RESIDENT_RADIUS 칸까지만 상주
+#    * 청크 파일 레벨은 상주 청크의 정적 플랫폼만 active_level.platforms / 충돌 격자에 올림
+#    * 적은 화면(+CHUNK_ACTIVE_MARGIN) 근처면 매 틱, 상주 영역 안이면 FAR_UPDATE_INTERVAL 틱마다,
+#      그 밖이면 멈춰 있음
+#  - 상주 범위는 카메라 위치만으로 정해짐 (카메라가 게임 상태에 들어 있으므로 되감기/리플레이도 같은 결과)
+#    경계를 오가며 생기는 다시 읽기는 ChunkStore 의 파싱 캐시가 흡수
+# ===========================
+CAMERA_MARGIN_X = 300
+CAMERA_MARGIN_Y = 200
+CHUNK_RESIDENT_RADIUS = 1
+CHUNK_ACTIVE_MARGIN = 64
+FAR_UPDATE_INTERVAL = 4
+
+
+class Camera:
+    """
+    화면에 보이는 월드 영역의 왼쪽 위 (정수 픽셀)
+    """
+    __slots__ = ("x", "y")
+
+    def __init__(self, x=0, y=0):
+        self.x = x
+        self.y = y
+
+    def clamp(self, level):
+        self.x = min(max(self.x, 0), max(level.width - SCREEN_WIDTH, 0))
+        self.y = min(max(self.y, 0), max(level.height - SCREEN_HEIGHT, 0))
+
+    def center(self, target, level):
+        self.x = int(target.x + target.width / 2) - SCREEN_WIDTH // 2
+        self.y = int(target.y + target.height / 2) - SCREEN_HEIGHT // 2
+        self.clamp(level)
+
+    def follow(self, target, level):
+        """
+        target 이 데드존을 벗어난 만큼만 따라감
+        """
+        if target.x < self.x + CAMERA_MARGIN_X:
+            self.x = int(target.x) - CAMERA_MARGIN_X
+        elif target.x + target.width > self.x + SCREEN_WIDTH - CAMERA_MARGIN_X:
+            self.x = int(target.x + target.width) - SCREEN_WIDTH + CAMERA_MARGIN_X
+        if target.y < self.y + CAMERA_MARGIN_Y:
+            self.y = int(target.y) - CAMERA_MARGIN_Y
+        elif target.y + target.height > self.y + SCREEN_HEIGHT - CAMERA_MARGIN_Y:
+            self.y = int(target.y + target.height) - SCREEN_HEIGHT + CAMERA_MARGIN_Y
+        self.clamp(level)
+
+    def view(self, margin=0):
+        return (self.x - margin, self.y - margin, SCREEN_WIDTH + 2 * margin, SCREEN_HEIGHT + 2 * margin)
+
+
+camera = Camera()
+resident_range = None   # 상주 청크 범위 (cx0, cy0, cx1, cy1), 양 끝 포함
+resident_chunks = {}    # 청크 파일 레벨에서 올라와 있는 청크 키 -> 그 청크의 (인덱스, 플랫폼) 튜플
+platform_refs = {}      # 스트리밍된 플랫폼 인덱스 -> 그 플랫폼이 걸친 상주 청크 수
+resident_movers = ()    # 경로가 상주 영역에 걸친 움직이는 플랫폼 인덱스 (매 틱 배치, 보간, 그리기 대상)
+platform_tick = 0       # 움직이는 플랫폼이 맞춰져 있어야 하는 틱 (place_moving_platforms 의 t)
+
+
+def chunk_span(level, x, y, w, h):
+    """
+    월드 사각형이 걸치는 청크 범위 (cx0, cy0, cx1, cy1), 월드 안으로 자름
+    """
+    cw, ch = level.chunk_size
+    last_x = max((level.width - 1) // cw, 0)
+    last_y = max((level.height - 1) // ch, 0)
+    return (min(max(int(x // cw), 0), last_x), min(max(int(y // ch), 0), last_y),
+            min(max(int((x + w - 1) // cw), 0), last_x), min(max(int((y + h - 1) // ch), 0), last_y))
+
+
+def resident_bounds():
+    """
+    상주 영역의 월드 사각형 (x0, y0, x1, y1)
+    """
+    cw, ch = active_level.design.chunk_size
+    cx0, cy0, cx1, cy1 = resident_range
+    return cx0 * cw, cy0 * ch, (cx1 + 1) * cw, (cy1 + 1) * ch
+
+
+def reset_residency():
+    global resident_range, resident_movers
+    resident_range = None
+    resident_movers = moving_platform_indices
+    resident_chunks.clear()
+    platform_refs.clear()
+
+
+def update_residency():
+    """
+    카메라 위치에 맞춰 상주 청크 범위 갱신 (청크 파일 레벨이면 정적 플랫폼을 올리고 내림)
+    """
+    global resident_range, resident_movers
+    design = active_level.design
+    cw, ch = design.chunk_size
+    x0, y0, x1, y1 = chunk_span(design, *camera.view())
+    r = CHUNK_RESIDENT_RADIUS
+    span = chunk_span(design, (x0 - r) * cw, (y0 - r) * ch, (x1 - x0 + 1 + 2 * r) * cw,
+                      (y1 - y0 + 1 + 2 * r) * ch)
+    if span == resident_range:
+        return
+    resident_range = span
+    if moving_platform_indices:
+        x0, y0, x1, y1 = resident_bounds()
+        resident_movers = tuple(mover_grid.query(x0, y0, x1 - x0, y1 - y0))
+        sync_movers(resident_movers)
+    store = design.chunk_store
+    if store is None:
+        return
+    wanted = [(cx, cy) for cy in range(span[1], span[3] + 1) for cx in range(span[0], span[2] + 1)
+              if (cx, cy) in store.index]
+    platforms = active_level.platforms
+    for key in [key for key in resident_chunks if key not in wanted]:
+        for i, p in resident_chunks.pop(key):
+            platform_refs[i] -= 1
+            if not platform_refs[i]:
+                del platform_refs[i]
+                platforms[i] = None
+                static_grid.remove(i, p)
+    for key in wanted:
+        if key in resident_chunks:
+            continue
+        records = resident_chunks[key] = store.read(key)
+        for i, p in records:
+            if i not in platform_refs:
+                platform_refs[i] = 0
+                platforms[i] = p
+                static_grid.add(i, p)
+            platform_refs[i] += 1
+
+
+def update_camera():
+    """
+    플레이어를 따라 카메라 이동, 상주 청크 갱신 (청크 파일 레벨은 새 상주 범위의 길찾기 그래프도 바로 만듦)
+    """
+    camera.follow(player, active_level)
+    span = resident_range
+    update_residency()
+    if resident_range != span and active_level.design.chunk_store is not None:
+        nav_graph()
+
+
+def place_moving_platforms(t):
+    """
+    움직이는 플랫폼을 t 틱 위치로 (dx: 다음 틱까지 이동량, 위에 선 플레이어를 함께 옮길 때 씀)
+    - 상주 영역에 걸친 것만 바로 옮김, 나머지는 충돌 질의가 찾았을 때 sync_movers 가 맞춤
+    """
+    global platform_tick
+    platform_tick = t
+    platforms = active_level.platforms
+    paths = active_level.design.platform_paths
+    for i in resident_movers:
+        place_mover(platforms[i], paths[i], t)
+
+
+def place_mover(p, path, t):
+    x = path.at(t)
+    p["x"] = x
+    p["direction"] = path.heading(t)
+    p["dx"] = path.at(t + 1) - x
+    p["tick"] = t
+
+
+def sync_movers(indices):
+    """
+    아직 platform_tick 위치가 아닌 움직이는 플랫폼을 맞춤 (경로는 닫힌 식이라 몇 틱 건너뛰어도 결과가 같음)
+    """
+    platforms = active_level.platforms
+    paths = active_level.design.platform_paths
+    for i in indices:
+        p = platforms[i]
+        if p.get("tick") != platform_tick:
+            place_mover(p, paths[i], platform_tick)
+
+
+def seek_movers(t):
+    """
+    스크립트 이동체(움직이는 플랫폼, 보스 순찰, flyer)를 레벨 시작 t 틱 뒤 위치로 바로 맞춤
+    (레벨 시작/되감기/리플레이 탐색, 적 공간 해시는 부르는 쪽에서 다시 구성)
+    """
+    global level_tick
+    level_tick = t
+    place_moving_platforms(t)
+    if boss and boss.get("active", False):
+        place_boss(t)
+    bob = flyer_bob(t)
+    for e in active_level.enemies:
+        if e.type == "flyer":
+            e.y = e.home_y + e.speed * bob
+            e.sync_rect()
+
+
+def place_boss(t):
+    """
+    보스를 순찰 경로의 t 틱 위치로 (speed 부호가 이동 방향)
+    """
+    path = active_level.design.boss_path
+    heading = path.heading(t)
+    boss["x"] = path.at(t)
+    boss["speed"] = abs(boss["speed"]) * heading
+
+
+load_level_collision()
+seek_movers(0)
+camera.center(player, active_level)
+update_residency()
+
+# ===========================
+# 적 길찾기 그래프
+#  - 레벨의 정적 플랫폼을 노드로, 적이 오갈 수 있는 길을 간선으로 레벨마다 한 번만 만듦
+#    walk: 같은 높이에서 맞닿은 플랫폼, drop: 가장자리에서 걸어 내려가 떨어지는 곳,
+#    jump: jumper 의 jump_force 와 적 중력으로 닿는 플랫폼
+#  - 레벨을 불러올 때 만들어 둠 (첫 update_enemies 프레임에서 멈추지 않도록)
+#    walk/drop 은 jump_force 와 무관하므로 그래프 하나를 모든 jumper 가 같이 쓰고, jump 간선만 jump_force 별로 얹음
+#  - 포물선(착지 프레임, 최고점)은 닫힌 식, 궤적 확인은 궤적을 덮는 사각형으로 격자를 한 번만 물어본 상자들로
+#  - 플레이어 쪽 경로(BFS)는 (jump_force, 목표 노드)별로 캐시
+#    청크 파일 레벨은 상주 플랫폼만으로 만들고 상주 범위별로 캐시
+#  - 적의 노드 번호(Enemy.node)는 정적 플랫폼 인덱스 (NAV_UNKNOWN: 아직 모름, NAV_NONE: 발밑에 없음)
+# ===========================
+NAV_UNKNOWN = -1
+NAV_NONE = -2
+NAV_ENEMY_SPEED = 2     # 길을 따라 움직일 때 jumper 의 가로 속도
+NAV_GRAVITY = 0.5       # update_enemies 의 적 중력
+NAV_FOOT = 8            # 발밑 플랫폼으로 볼 여유 (적은 플랫폼에 살짝 묻혀 있기도 함)
+NAV_MAX_DROP = SCREEN_HEIGHT
+NAV_ROUTE_CACHE = 64
+NAV_GRAPH_CACHE = 16    # 청크 파일 레벨에서 상주 범위별로 들고 있을 그래프 수
+NAV_ENEMY_SIZE = 30
+NAV_MARGIN = 2 * NAV_ENEMY_SPEED  # 점프 착지 지점을 플랫폼 가장자리에서 띄우는 여유
+
+# (함수, jump_force, 높이 차) -> 프레임 수 / 최고점 (닫힌 식 결과 캐시)
+arc_cache = {}
+
+
+def arc_drop(force, frames):
+    """
+    force 로 뛰고(0 이면 그냥 떨어지고) frames 프레임 뒤 출발 높이에서 내려간 거리 (위로는 음수)
+    - update_enemies 와 같은 순서: 속도에 중력을 더한 뒤 위치 이동
+    """
+    return -force * frames + NAV_GRAVITY * frames * (frames + 1) / 2
+
+
+def arc_peak(force):
+    """
+    force 로 뛰었을 때 가장 높이 올라가는 거리 (프레임 단위 위치 기준, 0 이상)
+    """
+    key = ("peak", force)
+    peak = arc_cache.get(key)
+    if peak is None:
+        k = max(int(force / NAV_GRAVITY - 0.5), 0)
+        peak = arc_cache[key] = -min(0.0, arc_drop(force, k), arc_drop(force, k + 1))
+    return peak
+
+
+def arc_frames(force, rise):
+    """
+    force 로 뛰어(0 이면 그냥 떨어져서) 출발 높이보다 rise 만큼 위(음수면 아래)에
+    내려앉을 때까지의 프레임 수 (그 높이까지 못 올라가면 None)
+    - 내려오는 중(속도가 아래)에 처음으로 그 높이를 지나는 프레임, 근의 공식으로 구함
+    """
+    key = ("fall", force, rise)
+    if key in arc_cache:
+        return arc_cache[key]
+    if arc_peak(force) < rise:
+        arc_cache[key] = None
+        return None
+    g = NAV_GRAVITY
+    first = max(int(force / g), 0) + 1  # 처음으로 아래로 움직이는 프레임 (force < 0: 이미 떨어지는 중)
+    b = g / 2 - force
+    root = (-b + math.sqrt(max(b * b - 2 * g * rise, 0.0))) / g
+    frames = max(first, math.ceil(root))
+    # 부동소수 오차 보정
+    while frames > first and arc_drop(force, frames - 1) >= -rise:
+        frames -= 1
+    while arc_drop(force, frames) < -rise:
+        frames += 1
+    arc_cache[key] = frames
+    return frames
+
+
+def arc_rise_frames(force, rise):
+    """
+    force 로 뛰어 올라가는 중에 출발 높이보다 rise(> 0) 만큼 처음 올라가는 프레임 수 (못 올라가면 None)
+    """
+    key = ("rise", force, rise)
+    if key in arc_cache:
+        return arc_cache[key]
+    if arc_peak(force) < rise:
+        arc_cache[key] = None
+        return None
+    g = NAV_GRAVITY
+    b = g / 2 - force
+    root = (-b - math.sqrt(max(b * b - 2 * g * rise, 0.0))) / g
+    frames = max(1, math.ceil(root))
+    while frames > 1 and arc_drop(force, frames - 1) <= -rise:
+        frames -= 1
+    while arc_drop(force, frames) > -rise:
+        frames += 1
+    arc_cache[key] = frames
+    return frames
+
+
+def arc_passes(force, lo, hi):
+    """
+    force 로 뛴 적의 위치(출발 위치 기준 내려간 거리)가 lo ~ hi 띠를 지나는 프레임 구간들 ((처음, 끝), ...)
+    - 처음: 그 프레임 이동 중에 띠에 닿을 수 있는 첫 프레임, 끝: 띠를 벗어나는 프레임
+      (구간 밖에서는 띠 밖에서만 움직이므로 띠 안의 상자와 부딪힐 수 없음)
+    - 띠 끝에 맞닿아 있는 것은 띠 밖 (서 있는 플랫폼은 다시 내려올 때까지 지나지 않음)
+    """
+    if lo < 0 < hi:
+        return (1, arc_frames(force, -hi)),
+    if lo >= 0:
+        return (arc_frames(force, -lo), arc_frames(force, -hi)),
+    # 머리 위 띠: 올라가며 들어가서, 띠 위로 빠져나가면 내려오며 한 번 더 지남
+    if hi < 0:
+        first = arc_rise_frames(force, -hi)
+    else:
+        first = 1 if force > 0 else None
+    if first is None:
+        return ()
+    over = arc_rise_frames(force, -lo)
+    if over is None:
+        return (first, arc_frames(force, -hi)),
+    return (first, over), (arc_frames(force, -lo), arc_frames(force, -hi))
+
+
+class NavGraph:
+    """
+    한 레벨의 길찾기 그래프 (만든 뒤 읽기 전용, jump 간선과 경로/벽 캐시만 처음 물을 때 채움)
+    - edges[i]: i 번 플랫폼에서 나가는 walk/drop 간선 (도착 노드, 종류, 출발 x, 진행 방향)
+      출발 x 는 적의 왼쪽 x, 거기서 진행 방향으로 NAV_ENEMY_SPEED 씩 움직이면 도착 노드에 내려앉음
+    - jump_edges(force)[i]: 같은 형식의 jump 간선 (jump_force 별로 한 번 계산)
+    - spans[i]: walk 로 이어진 구간 전체의 (왼쪽 끝, 오른쪽 끝) (walker 순찰 범위)
+    - walls(i, y, height): 그 구간 위에서 walker 를 옆면으로 막는 정적 플랫폼 상자 (처음 물을 때 계산해 캐시)
+    """
+    def __init__(self, platforms, grid, jump_forces=(), speed=NAV_ENEMY_SPEED, size=NAV_ENEMY_SIZE):
+        self.platforms = platforms
+        self.grid = grid
+        self.speed = speed
+        self.size = size
+        self.static = [p is not None and not p.get("moving") for p in platforms]
+        self.edges = [[] for _ in platforms]
+        self.jumps = {}     # jump_force -> 노드별 jump 간선
+        self.incoming = {}  # jump_force -> 노드별 들어오는 (출발 노드, 간선)
+        self.routes = {}
+        self.wall_cache = {}
+        for a, p in enumerate(platforms):
+            if self.static[a]:
+                self.link(a, p)
+        self.spans = self.walk_spans()
+        for force in jump_forces:
+            self.jump_edges(force)
+
+    def surface_below(self, x, y, w, h, depth=NAV_FOOT):
+        """
+        사각형 발밑(바닥에서 depth 이내)에서 가장 높은 정적 플랫폼 인덱스 (없으면 NAV_NONE)
+        """
+        platforms = self.platforms
+        best = NAV_NONE
+        best_top = None
+        for i in self.grid.query(x, y, w, h + depth):
+            p = platforms[i]
+            top = p["y"]
+            if (top > y and x + w > p["x"] and x < p["x"] + p["width"]
+                    and (best_top is None or top < best_top)):
+                best, best_top = i, top
+        return best
+
+    def link(self, a, p):
+        """
+        a 번 플랫폼에서 나가는 walk/drop 간선 계산
+        """
+        platforms = self.platforms
+        speed, size = self.speed, self.size
+        top = p["y"]
+        a_lo, a_hi = p["x"] - size + 1, p["x"] + p["width"] - 1  # 발이 걸쳐 있는 왼쪽 x 범위
+        edges = self.edges[a]
+        reached = {a}
+
+        # walk: 같은 높이에서 적이 양쪽에 동시에 걸칠 수 있는 플랫폼
+        for b in self.grid.query(p["x"] - size, top, p["width"] + 2 * size, 1):
+            q = platforms[b]
+            if b in reached or not self.static[b] or q["y"] != top:
+                continue
+            lo, hi = max(a_lo, q["x"] - size + 1), min(a_hi, q["x"] + q["width"] - 1)
+            if lo <= hi:
+                direction = 1 if q["x"] > p["x"] else -1
+                edges.append((b, "walk", hi if direction > 0 else lo, direction))
+                reached.add(b)
+
+        # drop: 가장자리에서 걸어 나가 떨어지며 처음 닿는 플랫폼
+        for direction in (-1, 1):
+            x_off = p["x"] + p["width"] if direction > 0 else p["x"] - size
+            if self.surface_below(x_off, top - size, size, size, 0) != NAV_NONE:
+                continue  # 같은 높이로 이어져 있어 떨어지지 않음
+            b = self.landing(x_off, top, 0, direction)
+            if b >= 0 and b not in reached and b == self.landing(x_off + direction * speed, top, 0, direction):
+                edges.append((b, "drop", x_off, direction))
+                reached.add(b)
+
+    def jump_edges(self, force):
+        """
+        jump_force 가 force 인 jumper 의 노드별 jump 간선 (처음 물을 때 계산)
+        - 포물선으로 닿는 플랫폼 (바로 위면 제자리, 아니면 그쪽으로 움직이며)
+        - 가로로 닿는 거리와 착지 프레임은 닫힌 식, 중간에 다른 플랫폼에 먼저 닿지 않는지만 궤적으로 확인
+        """
+        jumps = self.jumps.get(force)
+        if jumps is not None:
+            return jumps
+        platforms = self.platforms
+        speed, size = self.speed, self.size
+        jumps = self.jumps[force] = [[] for _ in platforms]
+        if force <= 0:
+            return jumps
+        rise_max = force * force / (2 * NAV_GRAVITY)  # 후보를 찾는 범위 (실제 최고점보다 조금 넉넉함)
+        reach = speed * arc_frames(force, -rise_max) + size
+        for a, p in enumerate(platforms):
+            if not self.static[a]:
+                continue
+            top = p["y"]
+            a_lo, a_hi = p["x"] - size + 1, p["x"] + p["width"] - 1
+            reached = {a}
+            reached.update(edge[0] for edge in self.edges[a])
+            for b in self.grid.query(p["x"] - reach, top - rise_max, p["width"] + 2 * reach, 2 * rise_max):
+                q = platforms[b]
+                if b in reached or not self.static[b]:
+                    continue
+                rise = top - q["y"]
+                frames = arc_frames(force, rise)
+                if frames is None:
+                    continue
+                b_lo, b_hi = q["x"] - size + 1 + NAV_MARGIN, q["x"] + q["width"] - 1 - NAV_MARGIN
+                toward = 1 if q["x"] + q["width"] / 2 > p["x"] + p["width"] / 2 else -1
+                for direction in (0, toward):
+                    # 제자리 점프로는 처음부터 몸이 걸쳐 있는 머리 위 플랫폼에만 올라설 수 있음
+                    # (아니면 그 아랫면에 부딪히고, 아래쪽 플랫폼이면 출발한 플랫폼에 다시 내려앉음)
+                    if direction == 0 and (rise < 0 or rise > 0 and q["y"] + q["height"] <= top - size):
+                        continue
+                    shift = direction * speed * frames
+                    lo, hi = max(a_lo, b_lo - shift), min(a_hi, b_hi - shift)
+                    if lo > hi:
+                        continue
+                    # 중간에 다른 플랫폼(출발한 플랫폼 포함)에 먼저 내려앉지 않는지 궤적으로 확인
+                    # (출발이 한 프레임 늦어진 경우까지, 윗면에 딱 맞닿은 프레임은 아직 착지가 아니므로 1px 더)
+                    takeoff = (lo + hi) // 2
+                    if (self.landing(takeoff, top, force, direction, rise - 1) == b
+                            and self.landing(takeoff + direction * speed, top, force, direction, rise - 1) == b):
+                        jumps[a].append((b, "jump", takeoff, direction))
+                        reached.add(b)
+                        break
+        return jumps
+
+    def landing(self, x, top, force, direction, rise=None):
+        """
+        높이 top 에 서 있던 적(왼쪽 x)이 force 로 뛰어(0 이면 그냥 떨어져) direction 쪽으로 움직일 때
+        발이 출발 높이보다 rise 위(음수면 아래, 기본은 머리가 NAV_MAX_DROP 아래) 높이를 지나기 전까지
+        처음 내려앉는 정적 플랫폼 (update_enemies 와 같은 순서/연속 충돌 규칙, 없으면 NAV_NONE)
+        - 부딪히기 전까지의 궤적은 닫힌 식 포물선이므로, 처음 부딪힐 수 있는 프레임까지 건너뛰고
+          부딪힐 때마다(벽, 천장) 그 자리에서 새 포물선으로 다시 건너뜀
+        """
+        if rise is None:
+            rise = -NAV_MAX_DROP - self.size
+        bottom = top - rise
+        platforms = self.platforms
+        size = self.size
+        dx = direction * self.speed
+        y = top - size
+        vy = -force
+        while True:
+            force = -vy
+            frames = arc_frames(force, y + size - bottom)
+            if frames is None:
+                return NAV_NONE
+            # 남은 궤적을 덮는 사각형 (마지막 프레임에 bottom 을 지나친 만큼 여유)
+            x_end = x + dx * frames
+            left, right = min(x, x_end), max(x, x_end) + size
+            y0 = y - arc_peak(force) - 1
+            y1 = bottom + abs(vy) + NAV_GRAVITY * frames + 1
+            # 사각형과 실제로 겹치는 상자만 시뮬레이션에 넣고,
+            # 포물선이 어느 상자에든 (높이 띠를 지나는 동안 가로로도) 처음 닿을 수 있는 프레임 전까지는 건너뜀
+            near, boxes = [], []
+            start = frames
+            for i in self.grid.query(left, y0, right - left, y1 - y0):
+                box = platform_box(platforms[i])
+                if box[2] <= left or box[0] >= right or box[3] <= y0 or box[1] >= y1:
+                    continue
+                near.append(i)
+                boxes.append(box)
+                for first, last in arc_passes(force, box[1] - size - y, box[3] - y):
+                    if first > start:
+                        break
+                    xa, xb = x + dx * (first - 1), x + dx * min(last, frames)
+                    if min(xa, xb) < box[2] and max(xa, xb) + size > box[0]:
+                        start = first - 1
+                        break
+            if start >= frames:
+                return NAV_NONE
+            x += dx * start
+            y += arc_drop(force, start)
+            vy += NAV_GRAVITY * start
+            for _ in range(frames - start):
+                vy += NAV_GRAVITY
+                x, y, wall, floor = sweep_move(x, y, size, size, dx, vy, boxes)
+                if wall is not None:
+                    dx = 0
+                if floor is not None:
+                    if vy > 0:
+                        return near[floor]
+                    vy = 0
+                if wall is not None or floor is not None:
+                    break
+            else:
+                return NAV_NONE
+
+    def walk_spans(self):
+        """
+        walk 간선으로 이어진 플랫폼 묶음마다 (왼쪽 끝, 오른쪽 끝)
+        """
+        spans = [None] * len(self.platforms)
+        for start, p in enumerate(self.platforms):
+            if not self.static[start] or spans[start] is not None:
+                continue
+            group, stack = [start], [start]
+            spans[start] = ()
+            while stack:
+                for b, kind, _, _ in self.edges[stack.pop()]:
+                    if kind == "walk" and spans[b] is None:
+                        spans[b] = ()
+                        group.append(b)
+                        stack.append(b)
+            left = min(self.platforms[i]["x"] for i in group)
+            right = max(self.platforms[i]["x"] + self.platforms[i]["width"] for i in group)
+            for i in group:
+                spans[i] = (left, right)
+        return spans
+
+    def walls(self, node, y, height):
+        """
+        node 의 walk 구간 위, 높이 y ~ y + height 띠와 겹치는 정적 플랫폼 상자 (sweep_move 에 넘김)
+        """
+        key = (node, y, height)
+        walls = self.wall_cache.get(key)
+        if walls is None:
+            platforms = self.platforms
+            left, right = self.spans[node]
+            walls = self.wall_cache[key] = tuple(
+                platform_box(platforms[i]) for i in self.grid.query(left, y, right - left, height)
+                if platforms[i]["y"] < y + height and platforms[i]["y"] + platforms[i]["height"] > y)
+        return walls
+
+    def incoming_edges(self, force):
+        """
+        jump_force 가 force 인 jumper 기준으로 노드별 들어오는 (출발 노드, 간선)
+        """
+        incoming = self.incoming.get(force)
+        if incoming is None:
+            incoming = self.incoming[force] = [[] for _ in self.platforms]
+            for a, (edges, jumps) in enumerate(zip(self.edges, self.jump_edges(force))):
+                for edge in edges + jumps:
+                    incoming[edge[0]].append((a, edge))
+        return incoming
+
+    def next_edge(self, node, target, force=0):
+        """
+        node 에서 target 으로 가는 가장 적은 간선 경로의 첫 간선 (길이 없으면 None, force: jumper 의 jump_force)
+        - (force, target) 별 BFS 결과(모든 노드 -> 첫 간선)를 캐시
+        """
+        key = (force, target)
+        route = self.routes.get(key)
+        if route is None:
+            if len(self.routes) >= NAV_ROUTE_CACHE:
+                self.routes.clear()
+            incoming = self.incoming_edges(force)
+            route = {}
+            frontier = [target]
+            seen = {target}
+            while frontier:
+                following = []
+                for b in frontier:
+                    for a, edge in incoming[b]:
+                        if a not in seen:
+                            seen.add(a)
+                            route[a] = edge
+                            following.append(a)
+                frontier = following
+            self.routes[key] = route
+        return route.get(node)
+
+
+# (레벨 인덱스, 상주 범위) -> NavGraph
+nav_graphs = {}
+
+
+def nav_graph():
+    """
+    현재 레벨의 길찾기 그래프 (레벨에 있는 jumper 의 jump_force 별 jump 간선까지 만들어 캐시)
+    - reset_level/상태 복원/상주 범위 변경 때 불러 두어 게임 프레임 중에는 캐시에서 꺼내기만 함
+    """
+    design = level_designs[current_level]
+    if design.chunk_store is None:
+        key = (current_level, None)
+        platforms = design.platforms
+    else:
+        key = (current_level, resident_range)
+        platforms = tuple(active_level.platforms)
+    graph = nav_graphs.get(key)
+    if graph is None:
+        if design.chunk_store is not None and len(nav_graphs) >= NAV_GRAPH_CACHE:
+            nav_graphs.clear()
+        forces = sorted({e.jump_force for e in active_level.enemies if e.type == "jumper"})
+        graph = nav_graphs[key] = NavGraph(platforms, static_grid, forces)
+    return graph
+
+
+nav_graph()
+
+# ===========================
+# 함수들
+# ===========================
+
+def reset_level():
+    """
+    현재 레벨을 다시 시작할 때(플레이어 사망 등) 상태 초기화
+    """
+    global boss, active_level
+
+    # 레벨 상태를 컴파일된 레벨에서 새로 생성 (적/수집품/파워업/움직이는 플랫폼/보스)
+    active_level = level_designs[current_level].instantiate()
+    boss = active_level.boss
+    boss_bullets.clear()
+
+    # 플레이어 재배치
+    player.x = active_level.spawn_point["x"]
+    player.y = active_level.spawn_point["y"]
+    player.sync_rect()
+    player.velocity_x = 0
+    player.velocity_y = 0
+    player.on_ground = False
+    player.double_jump_used = False
+    player.invincible = True
+    player.invincible_timer = 60
+    player.bullets.clear()
+
+    load_level_collision()
+    seek_movers(0)
+    camera.center(player, active_level)
+    update_residency()
+    nav_graph()
+    rebuild_spatial_index()
+    compositor.load_level(current_level, level_designs[current_level])
+
+
+def draw_title_screen():
+    screen.fill(BLACK)
+
+    # 별 그리기 (배경)
+    draw_stars()
+
+    # 타이틀, 안내문, 플레이어 그림, 결정 로고 (미리 그려 둔 레이어)
+    screen.blit(title_layer, (0, 0))
+
+    # 깜박이는 서브타이틀
+    subtitle_text = title_prompt_frames[timer % sin_table(10).period]
+    subtitle_rect = subtitle_text.get_rect(center=(SCREEN_WIDTH // 2, 350))
+    screen.blit(subtitle_text, subtitle_rect)
+
+    # 하단부 장식 결정 (높이 고정, 색은 룩업 테이블)
+    for i, height in enumerate(TITLE_CRYSTAL_HEIGHTS):
+        x = i * 90 + 45
+        y = 550
+        crystal_points = [
+            (x - 10, y),
+            (x, y - height),
+            (x + 10, y)
+        ]
+        color = crystal_color(timer, i)
+        pygame.draw.polygon(screen, color, crystal_points)
+        pygame.draw.polygon(screen, WHITE, crystal_points, 1)
+
+
+def draw_game_over_screen():
+    screen.fill(BLACK)
+
+    # 별 배경
+    draw_stars()
+
+    # 텍스트
+    title_text = render_text(title_font, "Game Over", RED)
+    title_rect = title_text.get_rect(center=(SCREEN_WIDTH // 2, 200))
+    screen.blit(title_text, title_rect)
+
+    draw_counter(subtitle_font, "Final Score: ", score, WHITE, center=(SCREEN_WIDTH // 2, 280))
+    draw_counter(subtitle_font, "Crystals: ", f"{collected_gems}/{level_designs.total_gems()}", CYAN,
+                 center=(SCREEN_WIDTH // 2, 330))
+
+    restart_text = game_over_prompt_frames[timer % sin_table(10).period]
+    restart_rect = restart_text.get_rect(center=(SCREEN_WIDTH // 2, 400))
+    screen.blit(restart_text, restart_rect)
+
+    # 깨진 결정 표현
+    crystal_pieces = [
+        [(SCREEN_WIDTH // 2 - 40, 480), (SCREEN_WIDTH // 2 - 60, 500), (SCREEN_WIDTH // 2 - 30, 510)],
+        [(SCREEN_WIDTH // 2 - 10, 470), (SCREEN_WIDTH // 2, 490), (SCREEN_WIDTH // 2 + 10, 480)],
+        [(SCREEN_WIDTH // 2 + 20, 490), (SCREEN_WIDTH // 2 + 40, 470), (SCREEN_WIDTH // 2 + 30, 510)]
+    ]
+    color = crystal_color(timer)
+    for piece in crystal_pieces:
+        pygame.draw.polygon(screen, color, piece)
+        pygame.draw.polygon(screen, WHITE, piece, 1)
+
+
+def draw_game_win_screen():
+    screen.fill(BLACK)
+
+    # 별 반짝임
+    sizes = stars.sprite + np.sin(timer / 10 + stars.x) * 2
+    draw_stars(np.maximum(1, sizes.astype(int)))
+
+    title_text = render_text(title_font, "Victory!", GOLD)
+    title_rect = title_text.get_rect(center=(SCREEN_WIDTH // 2, 150))
+    screen.blit(title_text, title_rect)
+
+    subtitle_text = render_text(subtitle_font, "You've Saved the Crystal Caverns!", CYAN)
+    subtitle_rect = subtitle_text.get_rect(center=(SCREEN_WIDTH // 2, 220))
+    screen.blit(subtitle_text, subtitle_rect)
+
+    draw_counter(subtitle_font, "Final Score: ", score, WHITE, center=(SCREEN_WIDTH // 2, 280))
+    draw_counter(subtitle_font, "Crystals: ", f"{collected_gems}/{level_designs.total_gems()}", CYAN,
+                 center=(SCREEN_WIDTH // 2, 330))
+
+    restart_text = win_prompt_frames[timer % sin_table(10).period]
+    restart_rect = restart_text.get_rect(center=(SCREEN_WIDTH // 2, 400))
+    screen.blit(restart_text, restart_rect)
+
+    # 거대한 결정 (글로우/테두리는 크기별로 구운 프레임, 본체 색만 매 프레임)
+    crystal_size = round(50 + sin_table(15)[timer] * 5)
+    cx, cy = WIN_CRYSTAL_CENTER
+    glow = win_glow_frames[crystal_size]
+    glow_rect = glow.get_rect(center=WIN_CRYSTAL_CENTER)
+    screen.blit(glow, glow_rect)
+    pygame.draw.polygon(screen, crystal_color(timer), win_crystal_points(crystal_size, cx, cy))
+    screen.blit(win_overlay_frames[crystal_size], glow_rect)
+
+
+class KeyState:
+    """
+    pygame.key.get_pressed() 대신 주입할 수 있는 키 상태
+    keys[pygame.K_LEFT] 처럼 인덱싱하면 눌림 여부(bool)를 돌려줌
+    """
+    def __init__(self, pressed=()):
+        self.pressed = frozenset(pressed)
+
+    def __getitem__(self, key):
+        return key in self.pressed
+
+
+# 입력 소스 (기본은 실제 키보드, 헤드리스에서는 KeyState 등으로 교체)
+key_source = pygame.key.get_pressed
+
+
+def set_key_source(source):
+    """
+    handle_input 이 읽을 키 상태 함수를 교체 (인자 없이 호출하면 keys 반환)
+    """
+    global key_source
+    key_source = source
+
+
+# 플레이어 물리 상수 (레벨 검증기도 같은 값을 씀)
+DASH_POWER = 15
+DASH_COOLDOWN = 30
+GROUND_FRICTION = 0.3
+ICE_FRICTION = 0.1
+MAX_FALL_SPEED = 10
+
+
+def handle_input():
+    """
+    플레이어 입력 처리
+    """
+    keys = key_source()
+
+    # 좌우 이동
+    if keys[pygame.K_LEFT]:
+        player.velocity_x = -player.speed
+        player.direction = -1
+    elif keys[pygame.K_RIGHT]:
+        player.velocity_x = player.speed
+        player.direction = 1
+    else:
+        # 마찰력 적용 (얼음이면 적게, 아니면 크게)
+        friction = ICE_FRICTION if player.on_ice else GROUND_FRICTION
+        if abs(player.velocity_x) < friction:
+            player.velocity_x = 0
+        elif player.velocity_x > 0:
+            player.velocity_x -= friction
+        else:
+            player.velocity_x += friction
+
+    # 점프
+    if keys[pygame.K_UP]:
+        if player.on_ground:
+            # 첫 점프
+            player.velocity_y = -player.jump_force
+            player.on_ground = False
+            player.double_jump_used = False
+        elif not player.double_jump_used:
+            # 더블 점프
+            player.velocity_y = -player.jump_force
+            player.double_jump_used = True
+
+    # 대쉬 (Shift)
+    if keys[pygame.K_LSHIFT] or keys[pygame.K_RSHIFT]:
+        if player.dash_ability and player.dash_cooldown <= 0:
+            player.velocity_x = DASH_POWER * player.direction
+            player.dash_cooldown = DASH_COOLDOWN  # 대쉬 후 쿨타임
+
+    # 슈팅 (Space)
+    if keys[pygame.K_SPACE]:
+        if player.shooting_cooldown <= 0:
+            shoot_bullet()
+            player.shooting_cooldown = 15  # 총알 발사 간격
+
+
+def shoot_bullet():
+    """
+    플레이어가 총알 발사
+    """
+    bullet_speed = 8
+    bullet_direction = player.direction
+    bullet_x = player.x + player.width // 2
+    bullet_y = player.y + player.height // 2
+
+    player.bullets.spawn(bullet_x, bullet_y, bullet_speed * bullet_direction, 0, 5)
+
+
+def update_player():
+    """
+    플레이어 물리/상태 업데이트
+    """
+    # 중력
+    player.velocity_y += player.gravity
+    if player.velocity_y > MAX_FALL_SPEED:
+        player.velocity_y = MAX_FALL_SPEED
+
+    # 이동 (플랫폼 연속 충돌, 착지 처리 포함)
+    check_platform_collisions()
+
+    # 월드 밖으로 나가지 않도록
+    if player.x < 0:
+        player.x = 0
+    if player.x + player.width > active_level.width:
+        player.x = active_level.width - player.width
+    if player.y < 0:
+        player.y = 0
+        player.velocity_y = 0
+    if player.y > active_level.height:  # 바닥 아래로 떨어지면 사망 처리
+        damage_player(999)  # 즉시 사망
+    player.sync_rect()
+
+    # 대쉬 쿨타임
+    if player.dash_cooldown > 0:
+        player.dash_cooldown -= 1
+
+    # 무적 시간
+    if player.invincible:
+        player.invincible_timer -= 1
+        if player.invincible_timer <= 0:
+            player.invincible = False
+
+    # 사격 쿨타임
+    if player.shooting_cooldown > 0:
+        player.shooting_cooldown -= 1
+
+    # 총알 업데이트
+    bullets = player.bullets
+    if bullets.count:
+        bullets.sweep_cull(platform_boxes)  # 플랫폼에 막히면 제거
+        bullets.integrate()
+        # 화면 밖으로 나가면 제거 (좌우만 검사)
+        bullets.cull_outside(camera.x, -math.inf, camera.x + SCREEN_WIDTH, math.inf)
+        bullets.compact()
+
+    # 아이템/파워업 수거
+    collect_items()
+    collect_powerups()
+
+
+def damage_player(amount):
+    """
+    플레이어 데미지 처리
+    """
+    global lives, game_state
+    if player.invincible:
+        return
+
+    player.health -= amount
+    if player.health <= 0:
+        # 라이프 감소 후 체크
+        lives -= 1
+        if lives > 0:
+            player.health = player.max_health
+            reset_level()
+        else:
+            game_state = GameState.GAME_OVER
+
+
+def check_platform_collisions():
+    """
+    이번 틱 속도만큼 플레이어를 옮기며 플랫폼과 연속 충돌 처리 (swept AABB)
+    - 바닥: on_ground, y 보정 (움직이는 플랫폼이면 플랫폼과 함께 이동)
+    - 천장: 위로 가던 속도를 지움, 벽: 가로 속도를 지움
+    """
+    w, h = player.width, player.height
+    vx, vy = player.velocity_x, player.velocity_y
+    platforms, boxes = platforms_swept(player.x, player.y, w, h, vx, vy)
+    player.x, player.y, wall, floor = sweep_move(player.x, player.y, w, h, vx, vy, boxes)
+    player.on_ground = False
+
+    if wall is not None:
+        player.velocity_x = 0
+    if floor is not None:
+        player.velocity_y = 0
+        if vy > 0:
+            player.on_ground = True
+            # 얼음 여부 체크
+            player.on_ice = active_level.theme == LevelTheme.ICE
+            p = platforms[floor]
+            if p.get("moving"):
+                # 플레이어가 플랫폼 위에 있는 동안 함께 이동 (이번 틱 플랫폼 이동량, 벽에 막히면 거기까지)
+                dx = p["dx"]
+                boxes = platforms_swept(player.x, player.y, w, h, dx, 0)[1]
+                player.x = sweep_move(player.x, player.y, w, h, dx, 0, boxes)[0]
+    player.sync_rect()
+
+    # 용암 테마면, 바닥(0번 플랫폼)이 용암
+    if active_level.theme == LevelTheme.LAVA:
+        # 바닥 플랫폼은 월드 맨 아래 50px (전체 너비)
+        # 플레이어가 그 위에 닿으면 데미지
+        if player.y + player.height >= active_level.height - 50:
+            # 용암 데미지
+            damage_player(0.1)  # 매 프레임마다 조금씩 데미지
+
+
+def collect_items():
+    """
+    레벨에 놓인 크리스탈(collectibles) 습득 처리
+    """
+    global score, collected_gems
+    player_rect = player.rect
+
+    for c in collectible_grid.query(*player_rect):
+        if not c.collected:
+            if player_rect.colliderect(c.rect):
+                c.collected = True
+                collectible_grid.remove(c)
+                collected_gems += 1
+                score += 100  # 보석 하나당 100점 추가
+
+
+def collect_powerups():
+    """
+    레벨에 놓인 파워업 습득 처리
+    """
+    player_rect = player.rect
+
+    for p in powerup_grid.query(*player_rect):
+        if not p.collected:
+            if player_rect.colliderect(p.rect):
+                p.collected = True
+                powerup_grid.remove(p)
+                # 파워업 적용
+                apply_powerup(p.type)
 
 
 def apply_powerup(power_type):
@@ -834,11 +2737,11 @@ def apply_powerup(power_type):
 
     if power_type == "health":
         # 체력 회복
-        player["health"] = min(player["max_health"], player["health"] + 30)
+        player.health = min(player.max_health, player.health + 30)
         # 효과음 or 이펙트 ...
     elif power_type == "speed":
         # 일시적 속도 증가
-        player["speed"] += 2
+        player.speed += 2
         # 일정 시간 후 원상 복귀를 위한 효과
         effects.append({
             "type": "speed",
@@ -846,50 +2749,120 @@ def apply_powerup(power_type):
         })
     elif power_type == "jump":
         # 점프력 증가
-        player["jump_force"] += 5
+        player.jump_force += 5
         effects.append({
             "type": "jump",
             "timer": 300
         })
     elif power_type == "shield":
         # 무적
-        player["invincible"] = True
-        player["invincible_timer"] = 180  # 3초 정도
+        player.invincible = True
+        player.invincible_timer = 180  # 3초 정도
 
 
 def update_enemies():
     """
     적 AI 업데이트
+    - 화면 근처 적은 매 틱, 상주 영역 안의 먼 적은 FAR_UPDATE_INTERVAL 틱마다, 나머지는 멈춤
     """
-    for e in level_designs[current_level]["enemies"]:
-        # walker: 좌우로 움직임
-        if e["type"] == "walker":
-            # 간단히 좌우 왕복 AI 등...
-            # 화면 영역에서 되돌아가도록
-            e["x"] += e["speed"]
-            if e["x"] < 0 or e["x"] + e["width"] > SCREEN_WIDTH:
-                e["speed"] *= -1
-
-        # jumper: 일정 간격으로 점프
-        if e["type"] == "jumper":
-            # 점프 중인지 여부는 저장 안 했으므로 간단히 충돌 판단
-            # 플레이어 것과 달리 아주 단순화
-            # y가 플랫폼 위에 있다고 가정하면
-            if random.randint(0, 100) == 0:  # 가끔 점프
-                e["velocity_y"] = -e["jump_force"]
+    ax, ay, aw, ah = camera.view(CHUNK_ACTIVE_MARGIN)
+    rx0, ry0, rx1, ry1 = resident_bounds()
+    far_tick = timer % FAR_UPDATE_INTERVAL == 0
+    player_node = None  # 플레이어 발밑 노드 (처음 필요할 때 한 번만 계산)
+    for e in active_level.enemies:
+        if not (e.x < ax + aw and e.x + e.width > ax and e.y < ay + ah and e.y + e.height > ay):
+            if not (far_tick and rx0 <= e.x and e.x + e.width <= rx1
+                    and ry0 <= e.y and e.y + e.height <= ry1):
+                continue
+
+        # walker: 서 있는 플랫폼(맞닿은 플랫폼 포함) 위를 좌우로 순찰
+        if e.type == "walker":
+            graph = nav_graph()
+            if e.node == NAV_UNKNOWN:
+                e.node = graph.surface_below(e.x, e.y, e.width, e.height)
+            # 벽(옆면)에 막히면 되돌아감 (순찰 구간 위의 벽은 그래프에 캐시, 발밑이 없으면 주변 플랫폼)
+            if e.node >= 0:
+                boxes = graph.walls(e.node, e.y, e.height)
+            else:
+                boxes = platforms_swept(e.x, e.y, e.width, e.height, e.speed, 0)[1]
+            if boxes:
+                e.x, _, wall, _ = sweep_move(e.x, e.y, e.width, e.height, e.speed, 0, boxes)
+                if wall is not None:
+                    e.speed = -e.speed
+            else:
+                e.x += e.speed
+            span = graph.spans[e.node] if e.node >= 0 else None
+            if span:
+                left, right = span
+            else:
+                # 발밑에 플랫폼이 없으면(내려간 청크 포함) 월드 영역에서 되돌아가도록
+                left, right = 0, active_level.width
+            if e.x < left:
+                e.speed = abs(e.speed)
+            elif e.x + e.width > right:
+                e.speed = -abs(e.speed)
+            e.sync_rect()
+            enemy_grid.update(e, *e.rect)
+
+        # jumper: 길찾기 그래프를 따라 플레이어 쪽으로 (길이 없으면 가끔 제자리 점프)
+        if e.type == "jumper":
+            graph = nav_graph()
+            hop = enemy_rng.randint(0, 100) == 0
+            if e.node >= 0 and not graph.static[e.node]:
+                e.node = NAV_NONE  # 서 있던 플랫폼의 청크가 내려감
+            if e.node != NAV_UNKNOWN:  # 지난 프레임에 착지함 (바닥에 서 있음)
+                if player_node is None:
+                    player_node = graph.surface_below(player.x, player.y, player.width, player.height,
+                                                      NAV_MAX_DROP)
+                e.speed = 0
+                if e.node >= 0 and player_node >= 0:
+                    if e.node == player_node:
+                        # 같은 플랫폼: 떨어지지 않는 범위에서 플레이어에게 다가감
+                        left, right = graph.spans[e.node]
+                        goal = min(max(player.x, left), right - e.width)
+                    else:
+                        edge = graph.next_edge(e.node, player_node, e.jump_force)
+                        goal = None if edge is None else edge[2]
+                        if edge is not None and abs(goal - e.x) <= NAV_ENEMY_SPEED:
+                            # 출발 지점 도착: 간선 방향으로 출발 (jump 면 점프)
+                            e.x = goal
+                            e.speed = edge[3] * NAV_ENEMY_SPEED
+                            if edge[1] == "jump":
+                                e.velocity_y = -e.jump_force
+                            goal = None
+                    if goal is not None and abs(goal - e.x) > NAV_ENEMY_SPEED:
+                        e.speed = NAV_ENEMY_SPEED if goal > e.x else -NAV_ENEMY_SPEED
+                elif e.node == NAV_NONE and player_node >= 0 and e.y + e.height < active_level.height:
+                    # 그래프에 없는 곳(움직이는 플랫폼 등): 플레이어 쪽으로 걸어 내려감
+                    e.speed = NAV_ENEMY_SPEED if player.x > e.x else -NAV_ENEMY_SPEED
+                if hop and e.speed == 0 and e.velocity_y >= 0:
+                    e.velocity_y = -e.jump_force
             # 중력
-            if "velocity_y" not in e:
-                e["velocity_y"] = 0
-            e["velocity_y"] += 0.5
-            e["y"] += e["velocity_y"]
-            # 바닥 충돌
-            if e["y"] + e["height"] > 550:
-                e["y"] = 550 - e["height"]
-                e["velocity_y"] = 0
-
-        # flyer: 상하 or 좌우 부유
-        if e["type"] == "flyer":
-            e["y"] += math.sin(timer / 30) * e["speed"]
+            e.velocity_y += NAV_GRAVITY
+            e.node = NAV_UNKNOWN
+            # 이동 (플랫폼 연속 충돌, 플레이어와 같은 규칙: 바닥에 착지, 천장/벽에 막힘)
+            dx, dy = e.speed, e.velocity_y
+            boxes = platforms_swept(e.x, e.y, e.width, e.height, dx, dy)[1]
+            e.x, e.y, wall, floor = sweep_move(e.x, e.y, e.width, e.height, dx, dy, boxes)
+            if wall is not None:
+                e.speed = 0
+            if floor is not None:
+                e.velocity_y = 0
+                if dy > 0:
+                    e.node = graph.surface_below(e.x, e.y, e.width, e.height)
+            # 아래에 플랫폼이 없으면 월드 바닥에서 멈춤
+            if e.y + e.height > active_level.height:
+                e.y = active_level.height - e.height
+                e.velocity_y = 0
+                e.node = NAV_NONE
+            e.sync_rect()
+            enemy_grid.update(e, *e.rect)
+
+        # flyer: 상하 부유 (닫힌 형태, 멈춰 있던 틱이 있어도 제자리로)
+        if e.type == "flyer":
+            e.y = e.home_y + e.speed * flyer_bob(level_tick)
+            e.sync_rect()
+            enemy_grid.update(e, *e.rect)
 
     # 플레이어와 적 충돌 체크
     check_enemy_collisions()
@@ -900,88 +2873,99 @@ def check_enemy_collisions():
     적과 플레이어, 적과 플레이어 총알 충돌 처리
     """
     global score
-    player_rect = pygame.Rect(player["x"], player["y"], player["width"], player["height"])
+    player_rect = player.rect
 
-    for e in level_designs[current_level]["enemies"][:]:
-        e_rect = pygame.Rect(e["x"], e["y"], e["width"], e["height"])
-
-        # 플레이어와 충돌
-        if player_rect.colliderect(e_rect):
+    # 플레이어와 충돌 (플레이어 주변 셀의 적만)
+    for e in enemy_grid.query(*player_rect):
+        if player_rect.colliderect(e.rect):
             damage_player(0.5)  # 부딪힐 때 조금씩 데미지
 
-        # 플레이어 총알과 충돌
-        for bullet in player["bullets"][:]:
-            b_rect = pygame.Rect(bullet["x"] - bullet["radius"], bullet["y"] - bullet["radius"],
-                                 bullet["radius"] * 2, bullet["radius"] * 2)
-            if b_rect.colliderect(e_rect):
-                # 적 제거
-                if e in level_designs[current_level]["enemies"]:
-                    level_designs[current_level]["enemies"].remove(e)
-                # 점수 상승
-                score += 50
-                # 총알도 제거
-                player["bullets"].remove(bullet)
-                break  # 한 번에 여러 번 처리되지 않도록
+    # 플레이어 총알과 충돌
+    #  - 총알 주변 셀의 적만 후보로 모은 뒤, 총알 × 후보 적을 한 번에 판정
+    bullets = player.bullets
+    if not bullets.count:
+        return
+    candidates = {}
+    for x, y, r in bullets.positions():
+        for e in enemy_grid.query(x - r, y - r, r * 2, r * 2):
+            candidates[id(e)] = e
+    if not candidates:
+        return
+    enemies = active_level.enemies
+    # 후보 순서를 적 목록 순서로 고정 (격자 등록 순서와 무관하게 같은 결과)
+    targets = [e for e in enemies if id(e) in candidates]
+    left = np.array([e.rect.left for e in targets], dtype=np.float64)
+    top = np.array([e.rect.top for e in targets], dtype=np.float64)
+    right = np.array([e.rect.right for e in targets], dtype=np.float64)
+    bottom = np.array([e.rect.bottom for e in targets], dtype=np.float64)
+    hits = bullets.hit_matrix(left, top, right, bottom)
+
+    killed = set()
+    for i in np.flatnonzero(hits.any(axis=1)).tolist():
+        for j in np.flatnonzero(hits[i]).tolist():
+            if j in killed:
+                continue
+            # 적 제거 (총알 하나로 적 하나만 처리)
+            killed.add(j)
+            enemies.remove(targets[j])
+            enemy_grid.remove(targets[j])
+            # 점수 상승
+            score += 50
+            # 총알도 제거
+            bullets.alive[i] = False
+            break
+    bullets.compact()
 
 
 def update_boss():
     """
     보스 존재 시 업데이트 (보스 총알 패턴 등)
     """
-    global boss_bullets, score, game_state
+    global score, game_state
     if not boss or not boss.get("active", False):
         return
 
-    # 간단한 이동 AI (좌우로 움직이거나 등등)
-    boss["x"] += boss["speed"]
-    # 화면 범위에서 반전
-    if boss["x"] < 0 or boss["x"] + boss["width"] > SCREEN_WIDTH:
-        boss["speed"] *= -1
+    # 좌우 순찰 (닫힌 형태 경로)
+    place_boss(level_tick)
 
     # 보스 공격 쿨타임
     boss["attack_cooldown"] -= 1
     if boss["attack_cooldown"] <= 0:
         boss["attack_cooldown"] = 60
-        # 스파이럴 패턴
+        # 스파이럴 패턴 (8방향을 한 번에 생성)
         angle_step = 45
-        for angle in range(0, 360, angle_step):
-            rad = math.radians(angle + timer * 2)
-            vx = boss["bullet_speed"] * math.cos(rad)
-            vy = boss["bullet_speed"] * math.sin(rad)
-            boss_bullets.append({
-                "x": boss["x"] + boss["width"] // 2,
-                "y": boss["y"] + boss["height"] // 2,
-                "vx": vx,
-                "vy": vy,
-                "radius": 6,
-                "color": RED
-            })
-
-    # 보스 총알 이동
-    for b in boss_bullets[:]:
-        b["x"] += b["vx"]
-        b["y"] += b["vy"]
-        # 화면 벗어나면 제거
-        if b["x"] < 0 or b["x"] > SCREEN_WIDTH or b["y"] < 0 or b["y"] > SCREEN_HEIGHT:
-            boss_bullets.remove(b)
+        rad = np.radians(np.arange(0, 360, angle_step) + timer * 2)
+        boss_bullets.spawn_many(
+            boss["x"] + boss["width"] // 2,
+            boss["y"] + boss["height"] // 2,
+            boss["bullet_speed"] * np.cos(rad),
+            boss["bullet_speed"] * np.sin(rad),
+            6
+        )
+
+    # 보스 총알 이동 (플랫폼에 막히면 제거), 화면 벗어나면 제거
+    if boss_bullets.count:
+        boss_bullets.sweep_cull(platform_boxes)
+    boss_bullets.integrate()
+    boss_bullets.cull_outside(camera.x, camera.y, camera.x + SCREEN_WIDTH, camera.y + SCREEN_HEIGHT)
 
     # 플레이어와 보스 총알 충돌
-    player_rect = pygame.Rect(player["x"], player["y"], player["width"], player["height"])
-    for b in boss_bullets[:]:
-        b_rect = pygame.Rect(b["x"] - b["radius"], b["y"] - b["radius"],
-                             b["radius"] * 2, b["radius"] * 2)
-        if player_rect.colliderect(b_rect):
-            damage_player(1)
-            boss_bullets.remove(b)
+    hits = boss_bullets.hit_mask(player.rect)
+    hit_count = int(hits.sum())
+    boss_bullets.alive[:boss_bullets.count] &= ~hits
+    boss_bullets.compact()
+    for _ in range(hit_count):
+        damage_player(1)
 
     # 플레이어 총알이 보스에 맞으면 체력 감소
     boss_rect = pygame.Rect(boss["x"], boss["y"], boss["width"], boss["height"])
-    for bullet in player["bullets"][:]:
-        b_rect = pygame.Rect(bullet["x"] - bullet["radius"], bullet["y"] - bullet["radius"],
-                             bullet["radius"] * 2, bullet["radius"] * 2)
-        if b_rect.colliderect(boss_rect):
+    bullets = player.bullets
+    hits = bullets.hit_mask(boss_rect)
+    bullets.alive[:bullets.count] &= ~hits
+    bullets.compact()
+    for _ in range(int(hits.sum())):
+        if boss["active"]:
             boss["health"] -= 5
-            player["bullets"].remove(bullet)
             # 보스 사망
             if boss["health"] <= 0:
                 boss["active"] = False
@@ -990,346 +2974,1662 @@ def update_boss():
                 game_state = GameState.GAME_WIN
 
 
-def update_moving_platforms():
+def update_moving_platforms():
+    """
+    움직이는 플랫폼을 이번 틱(level_tick) 위치로
+    """
+    place_moving_platforms(level_tick)
+
+
+# ===========================
+# 렌더 보간 (고정 타임스텝)
+#  - 틱 직전 위치를 기억해 두고, 렌더 시 이전/현재 상태 사이를 보간
+# ===========================
+render_alpha = 1.0  # 0: 직전 틱 상태, 1: 현재 틱 상태
+prev_positions = {}
+
+
+def save_previous_positions():
+    """
+    시뮬레이션 틱 직전에 움직이는 객체들의 위치를 저장
+    """
+    prev_positions.clear()
+    platforms = active_level.platforms
+    movers = [platforms[i] for i in resident_movers]
+    if boss:
+        movers.append(boss)
+    prev_positions[id(player)] = (player.x, player.y)
+    prev_positions[id(camera)] = (camera.x, camera.y)
+    for e in active_level.enemies:
+        prev_positions[id(e)] = (e.x, e.y)
+    for obj in movers:
+        prev_positions[id(obj)] = (obj["x"], obj["y"])
+
+
+def lerp_pos(obj, x, y):
+    """
+    렌더용 보간 위치 (x, y): obj 의 현재 위치 x, y 와 직전 틱 위치 사이
+    """
+    prev = prev_positions.get(id(obj))
+    if prev is None or render_alpha >= 1.0:
+        return x, y
+    px, py = prev
+    if abs(x - px) > TELEPORT_DISTANCE or abs(y - py) > TELEPORT_DISTANCE:
+        return x, y
+    return px + (x - px) * render_alpha, py + (y - py) * render_alpha
+
+
+def camera_offset():
+    """
+    렌더용 카메라 위치 (보간 후 정수 픽셀)
+    """
+    x, y = lerp_pos(camera, camera.x, camera.y)
+    return round(x), round(y)
+
+
+# ===========================
+# 레이어 합성 & 더티 렉트 렌더링
+#  - 정적 플랫폼(움직이지 않는 것)과 용암 테두리는 청크마다 한 장의 레이어로 미리 그림
+#    (청크가 처음 화면에 들어올 때, 최근 RENDER_CHUNK_CACHE 장만 유지)
+#  - 매 프레임 움직이는 것들의 사각형을 모아 두었다가,
+#    다음 프레임엔 그 영역만 지우고 다시 그린 뒤 display.update(rects) 로 내보냄
+#  - 바뀌는 영역이 넓은 프레임(구름이 큰 숲 테마 등)이나 카메라가 움직인 프레임은 통째로 다시 그림
+#  - 월드 좌표 객체는 카메라 위치를 빼서 그리고, 화면 밖이면 그리지 않음
+# ===========================
+THEME_PLATFORM_COLORS = {
+    LevelTheme.FOREST: BROWN,
+    LevelTheme.CAVE: GRAY,
+    LevelTheme.LAVA: (255, 80, 0),
+    LevelTheme.ICE: LIGHT_BLUE,
+    LevelTheme.SPACE: (50, 50, 70),
+}
+DIRTY_RECT_LIMIT = 200     # 이보다 사각형이 많으면 전체 갱신
+DIRTY_AREA_LIMIT = 0.4     # 화면 대비 이 비율보다 넓으면 전체 갱신
+RENDER_CHUNK_CACHE = 32
+SCREEN_RECT = pygame.Rect(0, 0, SCREEN_WIDTH, SCREEN_HEIGHT)
+
+
+class LayerCompositor:
+    """
+    게임 플레이 화면 합성기
+    - layers: (레벨 인덱스, 청크 키) -> 그 청크의 정적 지형 (투명 배경, LRU)
+    - begin_frame() 이 이번 프레임을 부분 갱신할지 결정하고 지울 영역을 돌려줌
+    - mark(rect) 로 이번 프레임에 그린 동적 요소 영역을 기록
+    - present() 로 화면에 내보냄 (부분 갱신이면 display.update(rects))
+    """
+    def __init__(self):
+        self.layers = OrderedDict()
+        self.level_index = None
+        self.level = None
+        self.offset = None
+        self.prev_rects = []
+        self.rects = []
+        self.partial = False
+        self.full_redraw = True
+
+    def load_level(self, level_index, level):
+        self.level_index = level_index
+        self.level = level
+        self.invalidate()
+
+    def chunk_layer(self, key):
+        cache_key = (self.level_index, key)
+        layer = self.layers.get(cache_key)
+        if layer is None:
+            layer = self.layers[cache_key] = self._build_chunk_layer(key)
+            if len(self.layers) > RENDER_CHUNK_CACHE:
+                self.layers.popitem(last=False)
+        else:
+            self.layers.move_to_end(cache_key)
+        return layer
+
+    def _build_chunk_layer(self, key):
+        # 보이는 청크는 항상 상주 범위 안이므로 현재 충돌 격자에 그 청크의 정적 플랫폼이 다 있음
+        level = self.level
+        theme = level.theme
+        color = THEME_PLATFORM_COLORS.get(theme, BROWN)
+        cw, ch = level.chunk_size
+        ox, oy = key[0] * cw, key[1] * ch
+        layer = pygame.Surface((cw, ch), pygame.SRCALPHA)
+        platforms = active_level.platforms
+        for i in static_grid.query(ox, oy, cw, ch):
+            p = platforms[i]
+            x, y = p["x"] - ox, p["y"] - oy
+            pygame.draw.rect(layer, color, (x, y, p["width"], p["height"]))
+            # 용암바닥이면 상단 테두리에 빨간색
+            if theme == LevelTheme.LAVA and p["y"] == level.height - 50:
+                pygame.draw.line(layer, RED, (x, y), (x + p["width"], y), 3)
+        return to_display_format(layer)
+
+    def draw_static(self, offset, rects=None):
+        """
+        보이는 청크의 정적 레이어를 화면에 덮음 (rects 가 있으면 그 영역만, 배경 파티클 위로 플랫폼이 보이도록)
+        """
+        level = self.level
+        cw, ch = level.chunk_size
+        cam_x, cam_y = offset
+        x0, y0, x1, y1 = chunk_span(level, cam_x, cam_y, SCREEN_WIDTH, SCREEN_HEIGHT)
+        blits = []
+        for cy in range(y0, y1 + 1):
+            for cx in range(x0, x1 + 1):
+                layer = self.chunk_layer((cx, cy))
+                sx, sy = cx * cw - cam_x, cy * ch - cam_y
+                if rects is None:
+                    blits.append((layer, (sx, sy)))
+                    continue
+                area = pygame.Rect(sx, sy, cw, ch)
+                for r in rects:
+                    clip = r.clip(area)
+                    if clip:
+                        blits.append((layer, clip, clip.move(-sx, -sy)))
+        screen.blits(blits, False)
+
+    def invalidate(self):
+        """
+        다음 프레임은 전체를 다시 그리도록 (레벨 전환, 다른 화면에서 복귀 등)
+        """
+        self.full_redraw = True
+
+    def begin_frame(self, offset):
+        """
+        이번 프레임 합성 방식 결정 (offset: 이번 프레임 카메라 위치)
+        반환값: 부분 갱신이면 지워야 할 영역 목록, 전체 갱신이면 None
+        """
+        prev = self.prev_rects
+        self.rects = []
+        self.partial = False
+        moved = offset != self.offset
+        self.offset = offset
+        if self.full_redraw or moved or HEADLESS or len(prev) > DIRTY_RECT_LIMIT:
+            self.full_redraw = False
+            return None
+        area = sum(r.width * r.height for r in prev)
+        if area > SCREEN_WIDTH * SCREEN_HEIGHT * DIRTY_AREA_LIMIT:
+            return None
+        self.partial = True
+        return prev
+
+    def mark(self, rect):
+        self.rects.append(rect)
+
+    def mark_all(self, rects):
+        self.rects.extend(rects)
+
+    def present(self):
+        rects = [r.clip(SCREEN_RECT) for r in self.rects]
+        if not HEADLESS:
+            if self.partial:
+                pygame.display.update(self.prev_rects + rects)
+            else:
+                pygame.display.flip()
+        self.prev_rects = rects
+
+
+compositor = LayerCompositor()
+mark = compositor.mark
+compositor.load_level(current_level, level_designs[current_level])
+
+
+def batch_projectiles(pool, offset, batch):
+    """
+    투사체를 스프라이트 묶음에 추가 (등속 직선 운동이므로 속도로 직전 위치를 되짚어 보간, 화면 밖은 건너뜀)
+    """
+    n = pool.count
+    back = 1.0 - render_alpha
+    xs = pool.x[:n] - pool.vx[:n] * back - offset[0]
+    ys = pool.y[:n] - pool.vy[:n] * back - offset[1]
+    radius = pool.radius[:n]
+    visible = ((xs + radius >= 0) & (xs - radius < SCREEN_WIDTH)
+               & (ys + radius >= 0) & (ys - radius < SCREEN_HEIGHT))
+    if not visible.all():
+        xs, ys, radius = xs[visible], ys[visible], radius[visible]
+    xs = xs.astype(int)
+    ys = ys.astype(int)
+    radius = radius.astype(int)
+    # 반지름별로 스프라이트를 한 번만 찾고 좌표는 배열로 계산
+    for r in np.unique(radius).tolist():
+        page, area, (ox, oy) = sprite_atlas[("circle", pool.color, r)]
+        same = radius == r
+        dest = zip((xs[same] - ox).tolist(), (ys[same] - oy).tolist())
+        batch.extend(zip(itertools.repeat(page), dest, itertools.repeat(area)))
+
+
+def draw_gameplay():
+    """
+    게임 플레이 중 화면 그리기
+    - 레벨 테마별 동적 배경
+    - 플랫폼/적/보스/플레이어
+    - 포털
+    - HUD
+    """
+    # ---------------------------
+    # 배경 그리기 (레벨 테마별)
+    #  - 부분 갱신 프레임이면 직전 프레임에 움직였던 영역만 지움
+    # ---------------------------
+    offset = camera_offset()
+    cam_x, cam_y = offset
+    view = pygame.Rect(cam_x, cam_y, SCREEN_WIDTH, SCREEN_HEIGHT)
+    erase = compositor.begin_frame(offset)
+    theme = active_level.theme
+    if theme == LevelTheme.FOREST:
+        particle_rects = draw_forest_background(erase)
+    elif theme == LevelTheme.CAVE:
+        particle_rects = draw_cave_background(erase)
+    elif theme == LevelTheme.LAVA:
+        particle_rects = draw_lava_background(erase)
+    elif theme == LevelTheme.ICE:
+        particle_rects = draw_ice_background(erase)
+    elif theme == LevelTheme.SPACE:
+        particle_rects = draw_space_background(erase)
+    else:
+        fill_background(BLACK, erase)
+        particle_rects = []
+    compositor.mark_all(particle_rects)
+
+    # ---------------------------
+    # 플랫폼 그리기
+    #  - 정적 플랫폼은 미리 그려 둔 청크 레이어를 덮음
+    #  - 움직이는 플랫폼은 아래 엔티티 묶음에서 매 프레임 그림
+    # ---------------------------
+    if erase is None:
+        compositor.draw_static(offset)
+    else:
+        compositor.draw_static(offset, erase + particle_rects)
+
+    # ---------------------------
+    # 엔티티 그리기
+    #  - 화면에 보이는 것만 아틀라스 스프라이트로 묶어 두었다가 blits 한 번으로 출력
+    #  - 순서: 움직이는 플랫폼, 포털, 크리스탈, 파워업, 적, 보스, 보스 총알, 플레이어, 플레이어 총알
+    # ---------------------------
+    batch = []
+    queue = sprite_atlas.queue
+
+    platform_color = THEME_PLATFORM_COLORS.get(theme, BROWN)
+    for i in resident_movers:
+        p = active_level.platforms[i]
+        px, py = lerp_pos(p, p["x"], p["y"])
+        if view.colliderect(px, py, p["width"], p["height"]):
+            queue(batch, ("rect", platform_color, p["width"], p["height"]), px - cam_x, py - cam_y)
+
+    # 반짝이는 원형 포털
+    portal = active_level.exit_portal
+    if portal:
+        portal_radius = 20 + int(5 * abs_sin_table(10)[timer])
+        if view.colliderect(portal["x"] - portal_radius, portal["y"] - portal_radius,
+                            2 * portal_radius, 2 * portal_radius):
+            queue(batch, ("portal", portal_radius), portal["x"] - cam_x, portal["y"] - cam_y)
+
+    # 작은 보석 형태의 크리스탈
+    for c in active_level.collectibles:
+        if not c.collected and view.colliderect(c.x - 10, c.y - 5, 20, 15):
+            queue(batch, ("crystal",), c.x - cam_x, c.y - cam_y)
+
+    # 번쩍이는 사각형 파워업
+    size = 10 + int(3 * abs_sin_table(5)[timer])
+    for p in active_level.power_ups:
+        if not p.collected and view.colliderect(p.x - size//2, p.y - size//2, size, size):
+            queue(batch, ("powerup", p.type, size), p.x - cam_x, p.y - cam_y)
+
+    # 적 (타입별 색)
+    for e in active_level.enemies:
+        ex, ey = lerp_pos(e, e.x, e.y)
+        if view.colliderect(ex, ey, e.width, e.height):
+            queue(batch, ("rect", ENEMY_COLORS.get(e.type, RED), e.width, e.height), ex - cam_x, ey - cam_y)
+
+    # 보스 (보스가 있는 레벨, update_boss 와 같은 조건)
+    show_boss = boss and boss.get("active", False)
+    if show_boss:
+        bx, by = lerp_pos(boss, boss["x"], boss["y"])
+        if view.colliderect(bx, by, boss["width"], boss["height"]):
+            queue(batch, ("rect", PURPLE, boss["width"], boss["height"]), bx - cam_x, by - cam_y)
+        batch_projectiles(boss_bullets, offset, batch)
+
+    # 플레이어 (무적 상태면 반짝이는 효과)
+    if player.invincible and int(timer % 2):
+        player_color = WHITE
+    else:
+        player_color = BLUE
+    px, py = lerp_pos(player, player.x, player.y)
+    queue(batch, ("player", player_color, player.width, player.height), px - cam_x, py - cam_y)
+    batch_projectiles(player.bullets, offset, batch)
+
+    compositor.mark_all(screen.blits(batch))
+
+    # 보스 체력바
+    if show_boss:
+        bar_width = 200
+        bar_height = 10
+        bar_x = SCREEN_WIDTH // 2 - bar_width // 2
+        bar_y = 50
+        ratio = boss["health"] / 100
+        mark(pygame.draw.rect(screen, RED, (bar_x, bar_y, bar_width, bar_height)))
+        pygame.draw.rect(screen, GREEN, (bar_x, bar_y, int(bar_width * ratio), bar_height))
+
+    # ---------------------------
+    # HUD (점수, 라이프, 체력)
+    # ---------------------------
+    mark(draw_counter(hud_font, "Score: ", score, WHITE, (10, 10)))
+    mark(draw_counter(hud_font, "Lives: ", lives, WHITE, (10, 40)))
+
+    health_ratio = player.health / player.max_health
+    mark(pygame.draw.rect(screen, RED, (10, 70, 100, 10)))
+    pygame.draw.rect(screen, GREEN, (10, 70, int(100 * health_ratio), 10))
+
+    mark(draw_counter(hud_font, "Gems: ", f"{collected_gems}/{level_designs.total_gems()}", CYAN, (10, 90)))
+
+
+def update_background():
+    """
+    현재 레벨 테마의 배경 파티클 이동 (시뮬레이션 틱마다 한 번, 배열 단위)
+    """
+    theme = active_level.theme
+    rng = particle_rng
+    if theme == LevelTheme.FOREST:
+        # 구름 이동, 오른쪽 끝을 넘으면 왼쪽에서 다시
+        c = clouds
+        c.x += c.speed
+        wrap = c.x > SCREEN_WIDTH + 200
+        k = int(wrap.sum())
+        if k:
+            c.x[wrap] = -200
+            c.y[wrap] = rng.integers(50, 151, size=k)
+
+    elif theme == LevelTheme.CAVE:
+        # 물방울 상승
+        b = bubbles
+        b.y -= b.speed
+        wrap = b.y < -50
+        k = int(wrap.sum())
+        if k:
+            b.y[wrap] = SCREEN_HEIGHT + 50
+            b.x[wrap] = rng.integers(0, SCREEN_WIDTH + 1, size=k)
+
+    elif theme == LevelTheme.LAVA:
+        # 용암 파티클, 수명이 다하면 바닥에서 다시
+        lp = lava_particles
+        lp.y -= lp.speed
+        lp.lifetime -= 1
+        dead = lp.lifetime <= 0
+        k = int(dead.sum())
+        if k:
+            lp.x[dead] = rng.integers(0, SCREEN_WIDTH + 1, size=k)
+            lp.y[dead] = rng.integers(550, 601, size=k)
+            lp.lifetime[dead] = rng.integers(30, 61, size=k)
+
+    elif theme == LevelTheme.ICE:
+        # 눈
+        f = snowflakes
+        f.y += f.speed
+        f.x += f.wobble
+        wrap = f.y > SCREEN_HEIGHT
+        k = int(wrap.sum())
+        if k:
+            f.y[wrap] = rng.integers(-50, 1, size=k)
+            f.x[wrap] = rng.integers(0, SCREEN_WIDTH + 1, size=k)
+
+    elif theme == LevelTheme.SPACE:
+        # 별
+        st = stars
+        st.y += st.speed
+        wrap = st.y > SCREEN_HEIGHT
+        k = int(wrap.sum())
+        if k:
+            st.x[wrap] = rng.integers(0, SCREEN_WIDTH + 1, size=k)
+            st.y[wrap] = 0
+
+        # 우주 잔해 (화면 가장자리에서 튕김)
+        d = space_debris
+        d.x += d.speed_x
+        d.y += d.speed_y
+        d.rotation += d.rotation_speed
+        d.speed_x[(d.x < 0) | (d.x > SCREEN_WIDTH)] *= -1
+        d.speed_y[(d.y < 0) | (d.y > SCREEN_HEIGHT)] *= -1
+
+
+def draw_stars(sizes=None):
+    """
+    별 배경 (sizes: 반짝임 등으로 바뀐 반지름 배열, 없으면 기본 크기)
+    """
+    return stars.draw(screen, sizes)
+
+
+def fill_background(color, erase=None):
+    """
+    배경색 칠하기 (erase 가 있으면 그 영역만)
+    """
+    if erase is None:
+        screen.fill(color)
+    else:
+        for rect in erase:
+            screen.fill(color, rect)
+
+
+# 테마 배경 그리기 함수들
+#  - erase: 부분 갱신 시 지울 영역 (None 이면 전체)
+#  - 반환값: 이번에 그린 파티클 영역 목록
+
+
+def draw_forest_background(erase=None):
+    fill_background(DARK_GREEN, erase)
+    # 구름
+    return clouds.draw(screen)
+
+
+def draw_cave_background(erase=None):
+    fill_background(BLACK, erase)
+    # 물방울
+    return bubbles.draw(screen)
+
+
+def draw_lava_background(erase=None):
+    fill_background((100, 0, 0), erase)
+    # 용암 파티클
+    return lava_particles.draw(screen)
+
+
+def draw_ice_background(erase=None):
+    fill_background((180, 220, 255), erase)
+    # 눈
+    return snowflakes.draw(screen)
+
+
+def draw_space_background(erase=None):
+    fill_background(BLACK, erase)
+    # 별
+    rects = draw_stars()
+
+    # 우주 잔해
+    #  - 회전은 그리지 않고 회전값에 따른 색 번쩍임으로 표현
+    #  - 색상은 양자화해서 같은 (크기, 색) 스프라이트를 재사용
+    d = space_debris
+    step = DEBRIS_COLOR_STEP
+    r = ((100 + 155 * np.abs(np.sin(d.rotation / 20))) // step * step).astype(int).tolist()
+    g = ((100 + 155 * np.abs(np.cos(d.rotation / 25))) // step * step).astype(int).tolist()
+    b = ((100 + 155 * np.abs(np.sin(d.rotation / 30))) // step * step).astype(int).tolist()
+    cache = debris_sprite_cache
+    batch = []
+    for size, x, y, key in zip(d.size.astype(int).tolist(), d.x.astype(int).tolist(),
+                               d.y.astype(int).tolist(), zip(r, g, b)):
+        sprite = cache.get((size, key))
+        if sprite is None:
+            sprite = cache[(size, key)] = rect_sprite(key, size, size)
+        batch.append((sprite, (x, y)))
+    rects.extend(screen.blits(batch))
+    return rects
+
+
+def check_portal_collision():
+    """
+    플레이어가 포털에 닿았는지 체크해서 레벨 이동
+    """
+    global current_level, game_state
+    portal = active_level.exit_portal
+    if not portal:
+        return
+    portal_rect = pygame.Rect(portal["x"] - 20, portal["y"] - 20, 40, 40)
+    player_rect = player.rect
+
+    if player_rect.colliderect(portal_rect):
+        # 다음 레벨로 이동
+        current_level += 1
+        if current_level >= len(level_designs):
+            # 마지막 레벨 이후면 게임 승리
+            game_state = GameState.GAME_WIN
+        else:
+            # 레벨 초기화
+            reset_level()
+
+
+def update_effects():
+    """
+    파워업 효과 해제 등을 위한 타이머 처리
+    """
+    global player
+    for eff in effects[:]:
+        eff["timer"] -= 1
+        if eff["timer"] <= 0:
+            # 효과 종료
+            if eff["type"] == "speed":
+                player.speed = 5
+            elif eff["type"] == "jump":
+                player.jump_force = 12
+            effects.remove(eff)
+
+
+def restart_game():
+    """
+    처음부터 다시 시작 (게임 오버/승리 후 R, 헤드리스 에피소드 시작)
+    """
+    global game_state, current_level, score, lives, collected_gems
+    current_level = 0
+    score = 0
+    lives = 3
+    collected_gems = 0
+    game_state = GameState.PLAYING
+    reset_level()
+    rewind_buffer.clear()
+
+
+def update_gameplay():
+    """
+    PLAYING 상태의 한 프레임 로직 (입력 → 물리 → 카메라 → 적/보스 → 포털)
+    """
+    global level_tick
+    level_tick += 1
+    handle_input()
+    update_player()
+    update_camera()
+    update_enemies()
+    update_boss()
+    update_moving_platforms()
+    update_effects()
+    check_portal_collision()
+
+
+def step(inputs=(), n_frames=1):
+    """
+    헤드리스 시뮬레이션 API
+    - 렌더링/이벤트 처리/프레임 제한 없이 n_frames 만큼 게임 진행
+    - inputs: 누르고 있을 키 코드 모음 (예: {pygame.K_RIGHT, pygame.K_UP}),
+              KeyState, 또는 프레임 번호를 받아 키 모음을 돌려주는 함수
+    - PLAYING 상태가 끝나면(게임 오버/승리) 그 자리에서 멈춤
+    반환값: 실제로 진행한 프레임 수
+    """
+    global timer
+
+    if callable(inputs):
+        per_frame = inputs
+    else:
+        keys = inputs if isinstance(inputs, KeyState) else KeyState(inputs)
+        per_frame = None
+
+    previous_source = key_source
+    frames = 0
+    try:
+        for i in range(n_frames):
+            if game_state != GameState.PLAYING:
+                break
+            if per_frame is not None:
+                keys = per_frame(i)
+                if not isinstance(keys, KeyState):
+                    keys = KeyState(keys)
+            set_key_source(lambda: keys)
+            timer += 1
+            update_gameplay()
+            frames += 1
+    finally:
+        set_key_source(previous_source)
+    return frames
+
+
+def run_headless(n_frames):
+    """
+    헤드리스 실행 (CI 스모크 테스트/처리량 측정용)
+    - 입력 없이 n_frames 만큼 돌리고 초당 틱 수를 출력
+    """
+    restart_game()
+    start = time.perf_counter()
+    frames = step((), n_frames)
+    elapsed = time.perf_counter() - start
+    rate = frames / elapsed if elapsed > 0 else float("inf")
+    print(f"{frames} frames in {elapsed:.3f}s ({rate:.0f} ticks/s), "
+          f"state={game_state.name}, level={current_level + 1}, score={score}")
+
+
+# ===========================
+# 상태 스냅샷 & 되감기
+#  - state_vector(): 게임 진행 상태 전체를 float64 배열 하나로 (레벨, 점수, 레벨 틱, 카메라, 플레이어, 보스,
+#    적, 수집품/파워업 습득 여부, 효과, 총알)
+#    움직이는 플랫폼/보스 순찰/flyer 높이는 레벨 틱으로 다시 계산 (seek_movers)
+#  - snapshot()/restore(): 중간 상태에서 시뮬레이션을 갈라 돌릴 때 사용 (적 AI 난수 상태 포함)
+#  - RewindBuffer: 틱마다 상태를 쌓아 두는 링 버퍼
+#    키프레임은 통째로, 나머지는 키프레임과의 XOR 차이만 zlib 으로 압축해서 저장
+#    프레임 수/바이트 예산을 넘으면 가장 오래된 키프레임 묶음부터 버림
+# ===========================
+PLAYER_STATE_FIELDS = tuple(f for f in Player.__slots__ if f not in ("bullets", "rect"))
+PLAYER_BOOL_FIELDS = frozenset(("on_ground", "double_jump", "double_jump_used", "on_ice",
+                                "invincible", "dash_ability"))
+BOSS_STATE_FIELDS = ("x", "y", "health", "speed", "attack_cooldown", "active")
+ENEMY_TYPES = ("walker", "flyer", "jumper")
+ENEMY_STATE_FIELDS = ("x", "y", "width", "height", "speed", "jump_force", "velocity_y", "node", "home_y")
+EFFECT_TYPES = ("speed", "jump")
+
+REWIND_KEY = pygame.K_BACKSPACE
+REWIND_SECONDS = 10
+REWIND_BUDGET = 4 * 1024 * 1024  # 바이트
+REWIND_KEYFRAME_INTERVAL = 30
+
+
+def as_number(value):
+    """
+    float 로 저장된 값을 원래 모양대로 (정수면 int)
+    """
+    return int(value) if value.is_integer() else value
+
+
+def state_vector():
+    """
+    현재 게임 상태를 float64 배열로
+    """
+    values = [current_level, game_state.value, score, lives, collected_gems, timer, level_tick,
+              camera.x, camera.y]
+    values.extend(getattr(player, f) for f in PLAYER_STATE_FIELDS)
+    if boss:
+        values.append(1)
+        values.extend(boss[f] for f in BOSS_STATE_FIELDS)
+    else:
+        values.extend([0] * (len(BOSS_STATE_FIELDS) + 1))
+    values.extend(c.collected for c in active_level.collectibles)
+    values.extend(p.collected for p in active_level.power_ups)
+    values.append(len(effects))
+    for eff in effects:
+        values.append(EFFECT_TYPES.index(eff["type"]))
+        values.append(eff["timer"])
+    enemies = active_level.enemies
+    values.append(len(enemies))
+    for e in enemies:
+        values.append(ENEMY_TYPES.index(e.type))
+        values.extend(getattr(e, f) for f in ENEMY_STATE_FIELDS)
+
+    parts = [np.array(values, dtype=np.float64)]
+    for pool in (player.bullets, boss_bullets):
+        n = pool.count
+        parts.append(np.array([n], dtype=np.float64))
+        parts.extend((pool.x[:n], pool.y[:n], pool.vx[:n], pool.vy[:n], pool.radius[:n]))
+    return np.concatenate(parts)
+
+
+def load_state_vector(vector):
+    """
+    state_vector() 로 만든 배열에서 게임 상태 복원
+    """
+    global current_level, game_state, score, lives, collected_gems, timer, active_level, boss
+
+    values = vector.tolist()
+    pos = 9
+    level_index = int(values[0])
+    if level_index != current_level or active_level.design is not level_designs[level_index]:
+        current_level = level_index
+        active_level = level_designs[current_level].instantiate()
+        load_level_collision()
+        compositor.load_level(current_level, level_designs[current_level])
+    game_state = GameState(int(values[1]))
+    score = as_number(values[2])
+    lives = int(values[3])
+    collected_gems = int(values[4])
+    timer = int(values[5])
+    tick = int(values[6])
+    camera.x = int(values[7])
+    camera.y = int(values[8])
+
+    for f in PLAYER_STATE_FIELDS:
+        value = values[pos]
+        setattr(player, f, bool(value) if f in PLAYER_BOOL_FIELDS else as_number(value))
+        pos += 1
+    player.sync_rect()
+
+    if values[pos]:
+        boss = dict(level_designs[current_level].boss)
+        for i, f in enumerate(BOSS_STATE_FIELDS, pos + 1):
+            boss[f] = as_number(values[i])
+        boss["active"] = bool(boss["active"])
+    else:
+        boss = None
+    active_level.boss = boss
+    pos += len(BOSS_STATE_FIELDS) + 1
+
+    for c in active_level.collectibles:
+        c.collected = bool(values[pos])
+        pos += 1
+    for p in active_level.power_ups:
+        p.collected = bool(values[pos])
+        pos += 1
+
+    effects.clear()
+    count = int(values[pos])
+    pos += 1
+    for _ in range(count):
+        effects.append({"type": EFFECT_TYPES[int(values[pos])], "timer": as_number(values[pos + 1])})
+        pos += 2
+
+    count = int(values[pos])
+    pos += 1
+    width = len(ENEMY_STATE_FIELDS) + 1
+    enemies = []
+    for _ in range(count):
+        record = values[pos:pos + width]
+        enemies.append(Enemy(ENEMY_TYPES[int(record[0])], *(as_number(v) for v in record[1:])))
+        pos += width
+    active_level.enemies = enemies
+
+    for pool in (player.bullets, boss_bullets):
+        n = int(values[pos])
+        pos += 1
+        pool.clear()
+        if n:
+            columns = vector[pos:pos + 5 * n].reshape(5, n)
+            pool.spawn_many(columns[0], columns[1], columns[2], columns[3], columns[4])
+        pos += 5 * n
+
+    seek_movers(tick)
+    update_residency()
+    nav_graph()
+    rebuild_spatial_index()
+    prev_positions.clear()
+    compositor.invalidate()
+
+
+class GameSnapshot:
+    """
+    snapshot() 결과 (상태 배열 + 적 AI 난수 상태)
+    """
+    __slots__ = ("vector", "rng_state")
+
+    def __init__(self, vector, rng_state):
+        self.vector = vector
+        self.rng_state = rng_state
+
+
+def snapshot():
+    """
+    현재 게임 상태 저장
+    """
+    return GameSnapshot(state_vector(), enemy_rng.getstate())
+
+
+def restore(snap):
     """
-    움직이는 플랫폼 처리
+    snapshot() 으로 저장한 상태로 되돌림 (같은 스냅샷에서 여러 번 복원 가능)
     """
-    for p in level_designs[current_level]["platforms"]:
-        if "moving" in p and p["moving"]:
-            p["x"] += p["speed"] * p["direction"]
-            # 범위 이탈 시 방향 전환
-            # range: 시작점 기준 왕복
-            # p["range"] 만큼 왔다갔다
-            # 일단 x 초기값 기억용 변수가 없으므로, 간단히 화면 범위로 판단
-            if p["x"] < 0 or (p["x"] + p["width"]) > SCREEN_WIDTH:
-                p["direction"] *= -1
+    load_state_vector(snap.vector)
+    enemy_rng.setstate(snap.rng_state)
 
 
-def draw_gameplay():
+class RewindGroup:
     """
-    게임 플레이 중 화면 그리기
-    - 레벨 테마별 동적 배경
-    - 플랫폼/적/보스/플레이어
-    - 포털
-    - HUD
+    키프레임 하나와 그 뒤 델타 프레임들
     """
-    # ---------------------------
-    # 배경 그리기 (레벨 테마별)
-    # ---------------------------
-    theme = level_designs[current_level]["theme"]
-    if theme == LevelTheme.FOREST:
-        draw_forest_background()
-    elif theme == LevelTheme.CAVE:
-        draw_cave_background()
-    elif theme == LevelTheme.LAVA:
-        draw_lava_background()
-    elif theme == LevelTheme.ICE:
-        draw_ice_background()
-    elif theme == LevelTheme.SPACE:
-        draw_space_background()
-    else:
-        screen.fill(BLACK)
+    __slots__ = ("key", "vector", "deltas", "nbytes")
 
-    # ---------------------------
-    # 플랫폼 그리기 (pygame.draw)
-    # ---------------------------
-    for p in level_designs[current_level]["platforms"]:
-        # 테마별 색상
-        color = BROWN
-        if theme == LevelTheme.CAVE:
-            color = GRAY
-        elif theme == LevelTheme.LAVA:
-            color = (255, 80, 0)
-        elif theme == LevelTheme.ICE:
-            color = LIGHT_BLUE
-        elif theme == LevelTheme.SPACE:
-            color = (50, 50, 70)
-
-        pygame.draw.rect(screen, color, (p["x"], p["y"], p["width"], p["height"]))
-
-        # 용암바닥이면 상단 테두리에 빨간색
-        if theme == LevelTheme.LAVA and p["y"] == 550:
-            pygame.draw.line(screen, RED, (p["x"], p["y"]), (p["x"] + p["width"], p["y"]), 3)
+    def __init__(self, key, vector):
+        self.key = key          # 압축된 키프레임
+        self.vector = vector    # 풀어 둔 키프레임 (필요할 때만)
+        self.deltas = []        # 압축된 XOR 차이
+        self.nbytes = len(key)
 
-    # ---------------------------
-    # 포털 그리기
-    # ---------------------------
-    portal = level_designs[current_level]["exit_portal"]
-    if portal:
-        # 반짝이는 원형 포털
-        portal_x = portal["x"]
-        portal_y = portal["y"]
-        portal_radius = 20 + int(5 * abs(math.sin(timer / 10)))
-        pygame.draw.circle(screen, (0, 255, 100), (portal_x, portal_y), portal_radius)
-        pygame.draw.circle(screen, WHITE, (portal_x, portal_y), portal_radius, 2)
 
-    # ---------------------------
-    # 아이템/파워업/수집품
-    # ---------------------------
-    for c in level_designs[current_level]["collectibles"]:
-        if not c["collected"]:
-            # 작은 보석 형태
-            crystal_points = [
-                (c["x"], c["y"] - 5),
-                (c["x"] + 10, c["y"]),
-                (c["x"], c["y"] + 10),
-                (c["x"] - 10, c["y"])
-            ]
-            pygame.draw.polygon(screen, CYAN, crystal_points)
-            pygame.draw.polygon(screen, WHITE, crystal_points, 1)
-
-    # 파워업
-    for p in level_designs[current_level]["power_ups"]:
-        if not p["collected"]:
-            color = YELLOW
-            if p["type"] == "health":
-                color = GREEN
-            elif p["type"] == "speed":
-                color = ORANGE
-            elif p["type"] == "jump":
-                color = PINK
-            elif p["type"] == "shield":
-                color = WHITE
-
-            # 번쩍이는 사각형
-            size = 10 + int(3 * abs(math.sin(timer / 5)))
-            pygame.draw.rect(screen, color, (p["x"] - size//2, p["y"] - size//2, size, size))
-            pygame.draw.rect(screen, BLACK, (p["x"] - size//2, p["y"] - size//2, size, size), 1)
+class RewindBuffer:
+    """
+    되감기용 링 버퍼
+    - push(vector): 틱마다 상태 추가
+    - pop(): 가장 최근 상태를 꺼냄 (없으면 None)
+    """
+    def __init__(self, seconds=REWIND_SECONDS, budget=REWIND_BUDGET,
+                 keyframe_interval=REWIND_KEYFRAME_INTERVAL):
+        self.max_frames = seconds * FPS
+        self.budget = budget
+        self.keyframe_interval = keyframe_interval
+        self.groups = deque()
+        self.frames = 0
+        self.nbytes = 0
+
+    def __len__(self):
+        return self.frames
+
+    def clear(self):
+        self.groups.clear()
+        self.frames = 0
+        self.nbytes = 0
+
+    def push(self, vector):
+        groups = self.groups
+        last = groups[-1] if groups else None
+        if (last is None or len(last.deltas) + 1 >= self.keyframe_interval
+                or last.vector is None or last.vector.size != vector.size):
+            group = RewindGroup(zlib.compress(vector.tobytes(), 1), vector.copy())
+            # 이전 묶음의 키프레임은 풀어 둔 것을 버림 (되감을 때 다시 품)
+            if last is not None:
+                last.vector = None
+            groups.append(group)
+            self.nbytes += group.nbytes
+        else:
+            delta = np.bitwise_xor(vector.view(np.uint64), last.vector.view(np.uint64))
+            payload = zlib.compress(delta.tobytes(), 1)
+            last.deltas.append(payload)
+            last.nbytes += len(payload)
+            self.nbytes += len(payload)
+        self.frames += 1
+
+        # 예산 초과분은 가장 오래된 묶음부터 통째로 버림 (최신 묶음은 남김)
+        while len(groups) > 1 and (self.frames > self.max_frames or self.nbytes > self.budget):
+            old = groups.popleft()
+            self.frames -= len(old.deltas) + 1
+            self.nbytes -= old.nbytes
+
+    def pop(self):
+        groups = self.groups
+        if not groups:
+            return None
+        group = groups[-1]
+        if group.vector is None:
+            group.vector = np.frombuffer(zlib.decompress(group.key), dtype=np.float64)
+        self.frames -= 1
+        if group.deltas:
+            payload = group.deltas.pop()
+            group.nbytes -= len(payload)
+            self.nbytes -= len(payload)
+            delta = np.frombuffer(zlib.decompress(payload), dtype=np.uint64)
+            return np.bitwise_xor(delta, group.vector.view(np.uint64)).view(np.float64)
+        groups.pop()
+        self.nbytes -= group.nbytes
+        return group.vector
+
+
+rewind_buffer = RewindBuffer()
+
+
+def rewind_tick():
+    """
+    되감기 한 틱 (REWIND_KEY 를 누르고 있는 동안 main 루프에서 호출)
+    반환값: 되돌릴 상태가 있었는지
+    """
+    vector = rewind_buffer.pop()
+    if vector is None:
+        return False
+    load_state_vector(vector)
+    return True
 
-    # ---------------------------
-    # 적 그리기
-    # ---------------------------
-    for e in level_designs[current_level]["enemies"]:
-        # 적 타입별로 색 지정
-        color = RED
-        if e["type"] == "walker":
-            color = (200, 0, 0)
-        elif e["type"] == "flyer":
-            color = (255, 128, 0)
-        elif e["type"] == "jumper":
-            color = (255, 0, 128)
-
-        pygame.draw.rect(screen, color, (e["x"], e["y"], e["width"], e["height"]))
 
-    # ---------------------------
-    # 보스 그리기 (마지막 레벨)
-    # ---------------------------
-    if current_level == 4 and boss and boss.get("active", False):
-        pygame.draw.rect(screen, PURPLE, (boss["x"], boss["y"], boss["width"], boss["height"]))
-        # 보스 체력바
-        bar_width = 200
-        bar_height = 10
-        bar_x = SCREEN_WIDTH // 2 - bar_width // 2
-        bar_y = 50
-        ratio = boss["health"] / 100
-        pygame.draw.rect(screen, RED, (bar_x, bar_y, bar_width, bar_height))
-        pygame.draw.rect(screen, GREEN, (bar_x, bar_y, int(bar_width * ratio), bar_height))
+# ===========================
+# 시드 고정 & 입력 리플레이
+#  - seed_rng(seed): 모든 난수 스트림을 시드로 다시 맞춤
+#  - 리플레이 파일: 헤더 + 시작 상태(state_vector, zlib) + 체크섬 + 프레임별 키 비트(RLE)
+#    헤더: 매직 "CCCR", 버전, 키 개수, 체크섬 간격, 시드, 프레임 수, 체크섬 수
+#    키 비트는 (길이 varint, 비트 1바이트) 묶음으로 같은 입력이 이어지는 구간을 압축
+#  - 재생은 헤드리스로 최대 속도, 체크섬 간격마다 상태 crc32 를 녹화 때 값과 비교
+# ===========================
+REPLAY_MAGIC = b"CCCR"
+REPLAY_VERSION = 4
+REPLAY_HEADER = struct.Struct("<4sBBHQII")
+REPLAY_CHECK_INTERVAL = 60
+# handle_input 이 읽는 키 (비트 순서)
+REPLAY_KEYS = (pygame.K_LEFT, pygame.K_RIGHT, pygame.K_UP,
+               pygame.K_LSHIFT, pygame.K_RSHIFT, pygame.K_SPACE)
+REPLAY_KEY_STATES = [KeyState(k for i, k in enumerate(REPLAY_KEYS) if mask >> i & 1)
+                     for mask in range(1 << len(REPLAY_KEYS))]
+
+
+def seed_rng(seed):
+    """
+    난수 스트림 전체를 seed 로 다시 시드
+    (레벨 랜덤 배치도 새로 뽑으므로 현재 레벨을 다시 구성, 진행 상태는 유지)
+    """
+    global rng_seed
+    rng_seed = seed
+    enemy_rng.seed(f"{seed}:enemies")
+    particle_rng.bit_generator.state = np.random.default_rng([seed, 1]).bit_generator.state
+    level_designs.discard_compiled()
+    load_state_vector(state_vector())
 
-        # 보스 총알
-        for b in boss_bullets:
-            pygame.draw.circle(screen, b["color"], (int(b["x"]), int(b["y"])), b["radius"])
 
-    # ---------------------------
-    # 플레이어 그리기
-    # ---------------------------
-    # 무적 상태면 반짝이는 효과
-    if player["invincible"]:
-        blink = int(timer % 2)
-        if blink == 0:
-            player_color = BLUE
-        else:
-            player_color = WHITE
-    else:
-        player_color = BLUE
+def key_mask(keys):
+    mask = 0
+    for i, k in enumerate(REPLAY_KEYS):
+        if keys[k]:
+            mask |= 1 << i
+    return mask
 
-    pygame.draw.rect(screen, player_color, (player["x"], player["y"], player["width"], player["height"]))
-    # 머리(원)
-    pygame.draw.circle(screen, LIGHT_BLUE, (player["x"] + player["width"]//2, player["y"] - 10), 10)
 
-    # 플레이어 총알
-    for bullet in player["bullets"]:
-        pygame.draw.circle(screen, bullet["color"], (int(bullet["x"]), int(bullet["y"])), bullet["radius"])
+def state_checksum():
+    return zlib.crc32(state_vector().tobytes())
 
-    # ---------------------------
-    # HUD (점수, 라이프, 체력)
-    # ---------------------------
-    score_text = hud_font.render(f"Score: {score}", True, WHITE)
-    screen.blit(score_text, (10, 10))
 
-    lives_text = hud_font.render(f"Lives: {lives}", True, WHITE)
-    screen.blit(lives_text, (10, 40))
+class Replay:
+    """
+    입력 리플레이 (시드 + 시작 상태 + 프레임별 키 비트 + 체크섬)
+    """
+    __slots__ = ("seed", "check_interval", "initial_state", "masks", "checksums")
+
+    def __init__(self, seed, initial_state, check_interval=REPLAY_CHECK_INTERVAL):
+        self.seed = seed
+        self.check_interval = check_interval
+        self.initial_state = initial_state
+        self.masks = bytearray()
+        self.checksums = []
+
+    def __len__(self):
+        return len(self.masks)
+
+    def to_bytes(self):
+        state = zlib.compress(self.initial_state.tobytes())
+        out = bytearray(REPLAY_HEADER.pack(REPLAY_MAGIC, REPLAY_VERSION, len(REPLAY_KEYS),
+                                           self.check_interval, self.seed,
+                                           len(self.masks), len(self.checksums)))
+        out += struct.pack("<I", len(state))
+        out += state
+        out += np.array(self.checksums, dtype="<u4").tobytes()
+        masks = self.masks
+        i = 0
+        while i < len(masks):
+            mask = masks[i]
+            j = i + 1
+            while j < len(masks) and masks[j] == mask:
+                j += 1
+            # 구간 길이 (varint) + 키 비트
+            run = j - i
+            while run >= 0x80:
+                out.append(run & 0x7F | 0x80)
+                run >>= 7
+            out.append(run)
+            out.append(mask)
+            i = j
+        return bytes(out)
+
+    @staticmethod
+    def from_bytes(data):
+        """
+        to_bytes 의 역 (형식이 다르거나 잘리거나 손상된 파일이면 ValueError)
+        """
+        def need(pos, size, part):
+            if pos + size > len(data):
+                raise ValueError(f"리플레이 파일이 잘림 ({part})")
+
+        need(0, REPLAY_HEADER.size, "헤더")
+        magic, version, key_count, interval, seed, frames, check_count = \
+            REPLAY_HEADER.unpack_from(data)
+        if magic != REPLAY_MAGIC or version != REPLAY_VERSION or key_count != len(REPLAY_KEYS):
+            raise ValueError("리플레이 파일 형식이 아님 (또는 지원하지 않는 버전)")
+        pos = REPLAY_HEADER.size
+        need(pos, 4, "시작 상태")
+        (state_len,) = struct.unpack_from("<I", data, pos)
+        pos += 4
+        need(pos, state_len, "시작 상태")
+        try:
+            state = np.frombuffer(zlib.decompress(data[pos:pos + state_len]), dtype=np.float64)
+        except (zlib.error, ValueError) as exc:
+            raise ValueError(f"리플레이 파일의 시작 상태가 손상됨 ({exc})") from exc
+        pos += state_len
+        replay = Replay(seed, state, interval)
+        need(pos, 4 * check_count, "체크섬")
+        replay.checksums = np.frombuffer(data, dtype="<u4", count=check_count, offset=pos).tolist()
+        pos += 4 * check_count
+        masks = replay.masks
+        while len(masks) < frames:
+            run = 0
+            shift = 0
+            while True:
+                need(pos, 1, "입력")
+                b = data[pos]
+                pos += 1
+                run |= (b & 0x7F) << shift
+                shift += 7
+                if b < 0x80:
+                    break
+            need(pos, 1, "입력")
+            masks.extend(bytes((data[pos],)) * run)
+            pos += 1
+        return replay
+
+    def save(self, path):
+        with open(path, "wb") as f:
+            f.write(self.to_bytes())
+
+    @staticmethod
+    def load(path):
+        with open(path, "rb") as f:
+            return Replay.from_bytes(f.read())
+
+
+class ReplayRecorder:
+    """
+    main 루프용 녹화기
+    - start(): 시드를 다시 맞추고 시작 상태를 기록, 입력 소스를 감싸 매 틱 키 비트를 기록
+    - after_tick(): 틱이 끝날 때마다 호출 (체크섬 간격이면 상태 crc32 기록)
+    - finish(): 입력 소스를 되돌리고 파일로 저장
+    """
+    def __init__(self, path, seed=None, check_interval=REPLAY_CHECK_INTERVAL):
+        self.path = path
+        self.seed = seed
+        self.check_interval = check_interval
+        self.replay = None
+        self.source = None
+
+    @property
+    def active(self):
+        return self.replay is not None
+
+    def start(self):
+        seed_rng(rng_seed if self.seed is None else self.seed)
+        self.replay = Replay(rng_seed, state_vector(), self.check_interval)
+        self.source = key_source
+        set_key_source(self.read_keys)
+
+    def read_keys(self):
+        keys = self.source()
+        self.replay.masks.append(key_mask(keys))
+        return keys
+
+    def after_tick(self):
+        replay = self.replay
+        if replay.masks and len(replay.masks) % replay.check_interval == 0 \
+                and len(replay.checksums) < len(replay.masks) // replay.check_interval:
+            replay.checksums.append(state_checksum())
+
+    def finish(self):
+        set_key_source(self.source)
+        self.replay.save(self.path)
+        print(f"리플레이 저장: {self.path} ({len(self.replay)} frames, seed={self.replay.seed})")
+        self.replay = None
+
+
+def record_replay(inputs, n_frames, seed=None, check_interval=REPLAY_CHECK_INTERVAL):
+    """
+    헤드리스 녹화: step() 과 같은 inputs 로 n_frames 진행하면서 Replay 를 만듦
+    (현재 상태에서 시작, seed 가 없으면 현재 시드)
+    """
+    seed_rng(rng_seed if seed is None else seed)
+    replay = Replay(rng_seed, state_vector(), check_interval)
+    if not callable(inputs):
+        fixed = inputs if isinstance(inputs, KeyState) else KeyState(inputs)
+        inputs = lambda i: fixed
+
+    def per_frame(i):
+        if i and i % check_interval == 0:
+            replay.checksums.append(state_checksum())
+        keys = inputs(i)
+        if not isinstance(keys, KeyState):
+            keys = KeyState(keys)
+        replay.masks.append(key_mask(keys))
+        return keys
+
+    frames = step(per_frame, n_frames)
+    if frames and frames % check_interval == 0:
+        replay.checksums.append(state_checksum())
+    return replay
+
+
+def play_replay(replay):
+    """
+    리플레이를 최대 속도로 재생하고 체크섬 검증
+    반환값: (진행한 프레임 수, 처음 어긋난 프레임 또는 None)
+    """
+    seed_rng(replay.seed)
+    load_state_vector(replay.initial_state)
+    interval = replay.check_interval
+    masks = replay.masks
+    checksums = replay.checksums
+    mismatch = []
+
+    def verify(frame):
+        index = frame // interval - 1
+        if not mismatch and index < len(checksums) and state_checksum() != checksums[index]:
+            mismatch.append(frame)
 
-    health_ratio = player["health"] / player["max_health"]
-    pygame.draw.rect(screen, RED, (10, 70, 100, 10))
-    pygame.draw.rect(screen, GREEN, (10, 70, int(100 * health_ratio), 10))
+    def per_frame(i):
+        if i and i % interval == 0:
+            verify(i)
+        return REPLAY_KEY_STATES[masks[i]]
 
-    gem_text = hud_font.render(f"Gems: {collected_gems}/{total_gems}", True, CYAN)
-    screen.blit(gem_text, (10, 90))
+    frames = step(per_frame, len(masks))
+    if frames and frames % interval == 0:
+        verify(frames)
+    return frames, (mismatch[0] if mismatch else None)
 
 
-def draw_forest_background():
-    screen.fill(DARK_GREEN)
-    # 구름 이동
-    for cloud in clouds:
-        cloud["x"] += cloud["speed"]
-        if cloud["x"] > SCREEN_WIDTH + 200:
-            cloud["x"] = -200
-            cloud["y"] = random.randint(50, 150)
-        # 구름 그리기
-        cloud_width = int(80 * cloud["size"])
-        cloud_height = int(40 * cloud["size"])
-        pygame.draw.ellipse(screen, WHITE, (cloud["x"], cloud["y"], cloud_width, cloud_height))
+# ===========================
+# 프레임 프로파일러
+#  - 켜져 있을 때만 단계 함수들을 시간 측정 래퍼로 바꿔 끼움 (꺼져 있으면 원래 함수 그대로)
+#    할당 추적기(--alloc)와 함께 켜도 단계마다 래퍼 하나를 같이 씀 (켜고 끄는 순서와 상관없음)
+#  - 최근 PROFILE_WINDOW 프레임의 프레임 시간/단계별 시간으로 p50/p95/p99, 단계별 비중 계산
+#  - F3: 켜고 끄기 (켜져 있는 동안 화면 오른쪽 위에 표시)
+#  - --profile-trace FILE: 종료 시 Chrome trace event JSON 저장 (chrome://tracing, Perfetto)
+# ===========================
+UPDATE_STAGES = (
+    "handle_input", "update_player", "check_platform_collisions", "collect_items",
+    "collect_powerups", "update_camera", "update_enemies", "check_enemy_collisions", "update_boss",
+    "update_moving_platforms", "update_effects", "check_portal_collision", "update_background",
+)
+DRAW_STAGES = (
+    "draw_gameplay", "draw_forest_background", "draw_cave_background", "draw_lava_background",
+    "draw_ice_background", "draw_space_background", "batch_projectiles",
+)
+# 서로 겹치지 않는 단계 (프레임 시간 비중 계산용)
+PROFILE_TOP_STAGES = ("simulate_tick", "draw_gameplay")
+PROFILE_STAGES = ("simulate_tick", "update_gameplay") + UPDATE_STAGES + DRAW_STAGES
+PROFILE_WINDOW = 600
+PROFILE_TRACE_FRAMES = 1800
+PROFILE_OVERLAY_REFRESH = 15
+PROFILE_OVERLAY_LINES = 6
+PROFILE_TOGGLE_KEY = pygame.K_F3
+
+
+# 단계 이름 -> 래퍼를 씌우기 전 원래 함수 / 지금 붙어 있는 측정기 (totals, events, counter, bias) 목록
+# 프로파일러, 할당 추적기, time_stages 가 같은 단계에 동시에 붙어도 서로의 래퍼를 덮어쓰지 않도록
+# 단계마다 원래 함수는 한 번만 기억하고, 측정기가 붙거나 떨어질 때마다 원래 함수에서 래퍼 하나를 새로 만듦
+stage_originals = {}
+stage_sinks = {}
+
+
+def stage_wrapper(name, func, sinks):
+    """
+    func 를 sinks 의 측정기 모두에 기록하는 래퍼 하나로 감쌈
+    - 측정기가 여럿이면 나중에 붙은 것이 안쪽 (시작값을 마지막에 읽고 끝값을 먼저 읽음)
+    """
+    if len(sinks) == 1:
+        (totals, events, counter, bias), = sinks
+
+        def timed(*args, **kwargs):
+            start = counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                elapsed = counter() - start - bias
+                totals[name] += elapsed
+                if events is not None:
+                    events.append((name, start, elapsed))
+        return timed
+
+    inner_first = sinks[::-1]
+
+    def timed(*args, **kwargs):
+        starts = [sink[2]() for sink in sinks]
+        try:
+            return func(*args, **kwargs)
+        finally:
+            for (totals, events, counter, bias), start in zip(inner_first, starts[::-1]):
+                elapsed = counter() - start - bias
+                totals[name] += elapsed
+                if events is not None:
+                    events.append((name, start, elapsed))
+    return timed
+
+
+def rebuild_stage(name):
+    """
+    name 단계의 전역 함수를 지금 붙어 있는 측정기 기준으로 다시 설치 (없으면 원래 함수로 되돌림)
+    """
+    sinks = stage_sinks[name]
+    if sinks:
+        globals()[name] = stage_wrapper(name, stage_originals[name], tuple(sinks))
+    else:
+        globals()[name] = stage_originals.pop(name)
+        del stage_sinks[name]
 
 
-def draw_cave_background():
-    screen.fill(BLACK)
-    # 물방울 상승
-    for bubble in bubbles:
-        bubble["y"] -= bubble["speed"]
-        if bubble["y"] < -50:
-            bubble["y"] = SCREEN_HEIGHT + 50
-            bubble["x"] = random.randint(0, SCREEN_WIDTH)
-        pygame.draw.circle(screen, BLUE, (bubble["x"], int(bubble["y"])), bubble["size"])
+def install_stage_timers(names, totals, events=None, counter=time.perf_counter_ns, bias=0):
+    """
+    모듈 함수들에 측정기를 붙임 (호출하는 쪽은 전역 이름으로 찾으므로 그대로 잡힘)
+    - totals[name] 에 호출 전후 counter() 차이를 누적 (기본은 나노초)
+    - bias: 측정 자체가 더하는 값 (호출마다 빼 줌)
+    - events 가 있으면 (이름, 시작값, 차이) 를 추가
+    - 이미 다른 측정기가 붙은 단계면 같은 래퍼에 함께 기록 (어떤 순서로 떼어도 나머지는 그대로)
+    반환값: 붙인 측정기 (remove_stage_timers 에 넘김)
+    """
+    sink = (totals, events, counter, bias)
+    for name in names:
+        if name not in stage_sinks:
+            stage_originals[name] = globals()[name]
+            stage_sinks[name] = []
+        stage_sinks[name].append(sink)
+        rebuild_stage(name)
+    return names, sink
 
 
-def draw_lava_background():
-    screen.fill((100, 0, 0))
-    # 용암 파티클
-    for lp in lava_particles:
-        lp["y"] -= lp["speed"]
-        lp["lifetime"] -= 1
-        if lp["lifetime"] <= 0:
-            lp["x"] = random.randint(0, SCREEN_WIDTH)
-            lp["y"] = random.randint(550, 600)
-            lp["lifetime"] = random.randint(30, 60)
+def remove_stage_timers(timers):
+    """
+    install_stage_timers 로 붙인 측정기만 떼어냄 (같은 단계의 다른 측정기는 남김)
+    """
+    names, sink = timers
+    for name in names:
+        stage_sinks[name] = [s for s in stage_sinks[name] if s is not sink]
+        rebuild_stage(name)
 
-        pygame.draw.rect(screen, (255, 80, 0), (lp["x"], lp["y"], 3, lp["height"]))
 
+@contextlib.contextmanager
+def time_stages(names, totals, events=None, counter=time.perf_counter_ns):
+    """
+    with 블록 동안만 install_stage_timers
+    """
+    timers = install_stage_timers(names, totals, events, counter)
+    try:
+        yield
+    finally:
+        remove_stage_timers(timers)
 
-def draw_ice_background():
-    screen.fill((180, 220, 255))
-    # 눈
-    for flake in snowflakes:
-        flake["y"] += flake["speed"]
-        flake["x"] += flake["wobble"]
-        if flake["y"] > SCREEN_HEIGHT:
-            flake["y"] = random.randint(-50, 0)
-            flake["x"] = random.randint(0, SCREEN_WIDTH)
-        pygame.draw.circle(screen, WHITE, (int(flake["x"]), int(flake["y"])), flake["size"])
 
+class FrameProfiler:
+    """
+    프레임/단계별 시간 측정기
+    - enable()/disable()/toggle(): 래퍼 설치/제거
+    - end_frame(start_ns): main 루프에서 프레임 끝마다 호출 (켜져 있을 때만)
+    - draw_overlay(): 통계 표시
+    - export_trace(path): Chrome trace event JSON 저장
+    """
+    def __init__(self, stages=PROFILE_STAGES, window=PROFILE_WINDOW, trace_frames=PROFILE_TRACE_FRAMES):
+        self.stages = stages
+        self.enabled = False
+        self.timers = None
+        self.totals = dict.fromkeys(stages, 0)
+        self.events = []
+        self.frame_times = deque(maxlen=window)
+        self.stage_times = {name: deque(maxlen=window) for name in stages}
+        self.trace = deque(maxlen=trace_frames)  # 프레임별 (시작 ns, 길이 ns, 단계 이벤트 목록)
+        self.overlay = None
+        self.overlay_age = 0
+
+    def enable(self):
+        if not self.enabled:
+            self.timers = install_stage_timers(self.stages, self.totals, self.events)
+            self.enabled = True
+
+    def disable(self):
+        if self.enabled:
+            remove_stage_timers(self.timers)
+            self.timers = None
+            self.enabled = False
+            self.events.clear()
+            for name in self.stages:
+                self.totals[name] = 0
+
+    def toggle(self):
+        if self.enabled:
+            self.disable()
+        else:
+            self.enable()
+
+    def end_frame(self, start_ns):
+        end = time.perf_counter_ns()
+        self.frame_times.append(end - start_ns)
+        totals = self.totals
+        for name in self.stages:
+            self.stage_times[name].append(totals[name])
+            totals[name] = 0
+        self.trace.append((start_ns, end - start_ns, self.events[:]))
+        self.events.clear()
+        self.overlay_age += 1
+
+    def percentiles(self):
+        """
+        최근 프레임 시간 p50/p95/p99 (ms)
+        """
+        if not self.frame_times:
+            return 0.0, 0.0, 0.0
+        ms = np.fromiter(self.frame_times, dtype=np.float64) / 1e6
+        p50, p95, p99 = np.percentile(ms, (50, 95, 99))
+        return float(p50), float(p95), float(p99)
+
+    def stage_report(self):
+        """
+        단계별 (이름, 평균 ms, 프레임 시간 대비 비중) - 평균이 큰 순서
+        """
+        frame_total = sum(self.frame_times)
+        report = []
+        for name in self.stages:
+            times = self.stage_times[name]
+            total = sum(times)
+            if not total:
+                continue
+            report.append((name, total / len(times) / 1e6, total / frame_total if frame_total else 0.0))
+        report.sort(key=lambda item: -item[1])
+        return report
+
+    def render_overlay(self):
+        p50, p95, p99 = self.percentiles()
+        frame_total = sum(self.frame_times)
+        top_total = sum(sum(self.stage_times[name]) for name in PROFILE_TOP_STAGES)
+        other = 1.0 - top_total / frame_total if frame_total else 0.0
+        lines = [f"frame p50 {p50:.2f}  p95 {p95:.2f}  p99 {p99:.2f} ms ({len(self.frame_times)})",
+                 f"other (events/present) {other * 100:.1f}%"]
+        for name, mean_ms, share in self.stage_report()[:PROFILE_OVERLAY_LINES]:
+            lines.append(f"{name:26s} {mean_ms:6.3f} ms {share * 100:5.1f}%")
+        surfaces = [profile_font.render(line, True, WHITE) for line in lines]
+        width = max(s.get_width() for s in surfaces) + 12
+        height = sum(s.get_height() for s in surfaces) + 8
+        panel = pygame.Surface((width, height), pygame.SRCALPHA)
+        panel.fill((0, 0, 0, 170))
+        y = 4
+        for s in surfaces:
+            panel.blit(s, (6, y))
+            y += s.get_height()
+        return to_display_format(panel)
+
+    def draw_overlay(self):
+        if self.overlay is None or self.overlay_age >= PROFILE_OVERLAY_REFRESH:
+            self.overlay = self.render_overlay()
+            self.overlay_age = 0
+        x = SCREEN_WIDTH - self.overlay.get_width() - 10
+        return screen.blit(self.overlay, (x, 10))
+
+    def export_trace(self, path):
+        """
+        Chrome trace event 형식으로 저장 (프레임마다 "frame" 이벤트 아래에 단계 이벤트)
+        """
+        if not self.trace:
+            return 0
+        origin = self.trace[0][0]
+        pid = os.getpid()
+        events = []
+        for start, length, stages in self.trace:
+            events.append({"name": "frame", "ph": "X", "pid": pid, "tid": 1,
+                           "ts": (start - origin) / 1000, "dur": length / 1000})
+            for name, stage_start, elapsed in stages:
+                events.append({"name": name, "ph": "X", "pid": pid, "tid": 1,
+                               "ts": (stage_start - origin) / 1000, "dur": elapsed / 1000})
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+        return len(self.trace)
+
+
+profile_font = pygame.font.SysFont("consolas,dejavusansmono,couriernew", 14)
+profiler = FrameProfiler()
 
-def draw_space_background():
-    screen.fill(BLACK)
-    # 별
-    for star in stars:
-        star["y"] += star["speed"]
-        if star["y"] > SCREEN_HEIGHT:
-            star["x"] = random.randint(0, SCREEN_WIDTH)
-            star["y"] = 0
-        pygame.draw.circle(screen, WHITE, (int(star["x"]), int(star["y"])), star["size"])
 
-    # 우주 잔해
-    for debris in space_debris:
-        debris["x"] += debris["speed_x"]
-        debris["y"] += debris["speed_y"]
-        debris["rotation"] += debris["rotation_speed"]
-        if debris["x"] < 0 or debris["x"] > SCREEN_WIDTH:
-            debris["speed_x"] *= -1
-        if debris["y"] < 0 or debris["y"] > SCREEN_HEIGHT:
-            debris["speed_y"] *= -1
-
-        # 잔해는 간단히 사각형으로 그리고 회전은 무시(시각효과로 치환)
-        size = debris["size"]
-        color = GRAY
-        # 회전 효과 대신 색상 번쩍
-        r = int(100 + 155 * abs(math.sin(debris["rotation"] / 20)))
-        g = int(100 + 155 * abs(math.cos(debris["rotation"] / 25)))
-        b = int(100 + 155 * abs(math.sin(debris["rotation"] / 30)))
-        color = (r, g, b)
-
-        pygame.draw.rect(screen, color, (debris["x"], debris["y"], size, size))
+# ===========================
+# 메모리 할당 & GC 계측
+#  - 단계 함수마다 할당 블록 수 변화(sys.getallocatedblocks)를 잼 (--alloc-tracemalloc 이면 바이트)
+#    세대0 GC 는 (컨테이너 할당 - 해제) 순증가가 임계값을 넘을 때 돌므로 순증가가 곧 GC 압력
+#  - gc.callbacks 로 수집 횟수/세대/멈춘 시간을 프레임별로 기록
+#  - GC 멈춤이 임계값(ms)을 넘는 프레임은 표시해 두고 바로 출력
+#  - --alloc: main 루프(또는 --headless 실행)에서 켜고, 끝날 때 요약 출력 (--alloc-report 로 JSON)
+# ===========================
+GC_PAUSE_THRESHOLD_MS = 2.0
+ALLOC_TOP_SITES = 10
 
 
-def check_portal_collision():
+class AllocationTracker:
     """
-    플레이어가 포털에 닿았는지 체크해서 레벨 이동
+    프레임/단계별 할당량과 GC 멈춤 기록
+    - enable()/disable(): 래퍼와 gc 콜백 설치/제거
+    - end_frame(start_ns): 프레임 끝마다 호출
+    - report(): 요약 dict
     """
-    global current_level, game_state
-    portal = level_designs[current_level]["exit_portal"]
-    if not portal:
-        return
-    portal_rect = pygame.Rect(portal["x"] - 20, portal["y"] - 20, 40, 40)
-    player_rect = pygame.Rect(player["x"], player["y"], player["width"], player["height"])
+    def __init__(self, stages=PROFILE_STAGES, gc_threshold_ms=GC_PAUSE_THRESHOLD_MS,
+                 use_tracemalloc=False):
+        self.stages = stages
+        self.gc_threshold_ns = int(gc_threshold_ms * 1e6)
+        self.use_tracemalloc = use_tracemalloc
+        self.unit = "bytes" if use_tracemalloc else "blocks"
+        self.enabled = False
+        self.timers = None
+        self.totals = dict.fromkeys(stages, 0)
+        self.stage_sum = dict.fromkeys(stages, 0)
+        self.stage_max = dict.fromkeys(stages, 0)
+        self.stage_frames = dict.fromkeys(stages, 0)
+        self.frames = 0
+        self.frame_alloc_sum = 0
+        self.frame_alloc_max = 0
+        self.frame_peak_max = 0
+        self.frame_counter = 0
+        self.gc_start = 0
+        self.gc_frame = []       # 이번 프레임의 (세대, 멈춘 ns, 수거 수)
+        self.gc_counts = [0, 0, 0]
+        self.gc_pause_total = 0
+        self.gc_pause_max = 0
+        self.flagged = []
+        self.start_snapshot = None
+        self.end_snapshot = None
+
+    def counter(self):
+        if self.use_tracemalloc:
+            return tracemalloc.get_traced_memory()[0]
+        return sys.getallocatedblocks()
+
+    def measurement_bias(self):
+        """
+        래퍼가 측정 중에 스스로 잡는 양 (시작값을 담은 int 객체 등)
+        """
+        counter = self.counter
+
+        def probe():
+            start = counter()
+            return counter() - start
+
+        return min(probe() for _ in range(8))
+
+    def enable(self):
+        if self.enabled:
+            return
+        if self.use_tracemalloc:
+            tracemalloc.start()
+            self.start_snapshot = tracemalloc.take_snapshot()
+        self.timers = install_stage_timers(self.stages, self.totals, counter=self.counter,
+                                              bias=self.measurement_bias())
+        gc.callbacks.append(self.on_gc)
+        self.enabled = True
+        self.frame_counter = self.counter()
+
+    def disable(self):
+        if not self.enabled:
+            return
+        gc.callbacks.remove(self.on_gc)
+        remove_stage_timers(self.timers)
+        self.timers = None
+        if self.use_tracemalloc:
+            self.end_snapshot = tracemalloc.take_snapshot()
+            tracemalloc.stop()
+        self.enabled = False
+
+    def on_gc(self, phase, info):
+        if phase == "start":
+            self.gc_start = time.perf_counter_ns()
+            return
+        pause = time.perf_counter_ns() - self.gc_start
+        generation = info["generation"]
+        self.gc_frame.append((generation, pause, info["collected"]))
+        self.gc_counts[generation] += 1
+        self.gc_pause_total += pause
+        self.gc_pause_max = max(self.gc_pause_max, pause)
+
+    def end_frame(self, start_ns):
+        now = self.counter()
+        frame_alloc = now - self.frame_counter
+        self.frames += 1
+        self.frame_alloc_sum += frame_alloc
+        self.frame_alloc_max = max(self.frame_alloc_max, frame_alloc)
+        if self.use_tracemalloc:
+            # 프레임 중 최고 사용량 - 프레임 시작 사용량 = 프레임 안에서 잠깐 잡았다 놓은 양
+            peak = tracemalloc.get_traced_memory()[1] - self.frame_counter
+            self.frame_peak_max = max(self.frame_peak_max, peak)
+            tracemalloc.reset_peak()
+        totals = self.totals
+        for name in self.stages:
+            value = totals[name]
+            if value:
+                self.stage_sum[name] += value
+                self.stage_max[name] = max(self.stage_max[name], value)
+                self.stage_frames[name] += 1
+                totals[name] = 0
+
+        if self.gc_frame:
+            worst = max(pause for _, pause, _ in self.gc_frame)
+            if worst > self.gc_threshold_ns:
+                record = {
+                    "frame": self.frames,
+                    "frame_ms": round((time.perf_counter_ns() - start_ns) / 1e6, 3),
+                    "gc": [{"generation": gen, "pause_ms": round(pause / 1e6, 3), "collected": collected}
+                           for gen, pause, collected in self.gc_frame],
+                }
+                self.flagged.append(record)
+                print(f"[gc] frame {record['frame']}: {record['frame_ms']} ms, "
+                      + ", ".join(f"gen{g['generation']} {g['pause_ms']} ms" for g in record["gc"]),
+                      file=sys.stderr)
+            self.gc_frame = []
+        self.frame_counter = self.counter()
+
+    def report(self):
+        frames = max(self.frames, 1)
+        stages = {}
+        for name in self.stages:
+            if self.stage_frames[name]:
+                stages[name] = {
+                    "mean": round(self.stage_sum[name] / frames, 1),
+                    "max": self.stage_max[name],
+                }
+        report = {
+            "unit": self.unit,
+            "frames": self.frames,
+            "frame_mean": round(self.frame_alloc_sum / frames, 1),
+            "frame_max": self.frame_alloc_max,
+            "stages": stages,
+            "gc": {
+                "collections": {f"gen{i}": n for i, n in enumerate(self.gc_counts)},
+                "pause_total_ms": round(self.gc_pause_total / 1e6, 3),
+                "pause_max_ms": round(self.gc_pause_max / 1e6, 3),
+                "threshold_ms": self.gc_threshold_ns / 1e6,
+                "flagged_frames": self.flagged,
+            },
+        }
+        if self.use_tracemalloc:
+            report["frame_peak_max"] = self.frame_peak_max
+            if self.start_snapshot is not None and self.end_snapshot is not None:
+                diff = self.end_snapshot.compare_to(self.start_snapshot, "lineno")
+                report["top_sites"] = [
+                    {"site": str(stat.traceback[0]), "size_diff": stat.size_diff,
+                     "count_diff": stat.count_diff}
+                    for stat in diff[:ALLOC_TOP_SITES]
+                ]
+        return report
+
+    def print_report(self):
+        report = self.report()
+        unit = report["unit"]
+        print(f"할당 ({unit}): 프레임 평균 {report['frame_mean']}, 최대 {report['frame_max']} "
+              f"({report['frames']} frames)")
+        for name, stats in sorted(report["stages"].items(), key=lambda item: -abs(item[1]["mean"])):
+            print(f"  {name:28s} 평균 {stats['mean']:10.1f}  최대 {stats['max']:8d}")
+        gc_report = report["gc"]
+        print(f"GC: {gc_report['collections']}, 멈춤 합계 {gc_report['pause_total_ms']} ms, "
+              f"최대 {gc_report['pause_max_ms']} ms, "
+              f"{gc_report['threshold_ms']} ms 초과 프레임 {len(gc_report['flagged_frames'])}개")
+        for site in report.get("top_sites", ()):
+            print(f"  {site['site']:60s} {site['size_diff']:+10d} B {site['count_diff']:+7d}")
+        return report
+
+
+allocation_tracker = None
+alloc_report_path = None
+
+
+def finish_alloc_report(tracker):
+    """
+    요약 출력 (alloc_report_path 가 있으면 JSON 저장)
+    """
+    report = tracker.print_report()
+    if alloc_report_path:
+        with open(alloc_report_path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"할당 요약 저장: {alloc_report_path}")
 
-    if player_rect.colliderect(portal_rect):
-        # 다음 레벨로 이동
-        current_level += 1
-        if current_level >= len(level_designs):
-            # 마지막 레벨 이후면 게임 승리
-            game_state = GameState.GAME_WIN
-        else:
-            # 레벨 초기화
-            reset_level()
 
+def run_alloc_headless(n_frames, tracker):
+    """
+    헤드리스로 n_frames 동안 틱 + 그리기를 돌리며 할당/GC 계측
+    (입력은 벤치마크와 같은 좌우 왕복 + 점프 + 사격)
+    """
+    restart_game()
+    tracker.enable()
+    previous_source = key_source
+    try:
+        for frame in range(n_frames):
+            if game_state != GameState.PLAYING:
+                break
+            start = time.perf_counter_ns()
+            set_key_source(lambda keys=bench_inputs(frame): keys)
+            simulate_tick()
+            draw_gameplay()
+            tracker.end_frame(start)
+    finally:
+        set_key_source(previous_source)
+        tracker.disable()
 
-def update_effects():
+
+def simulate_tick():
     """
-    파워업 효과 해제 등을 위한 타이머 처리
+    고정 타임스텝 한 틱 (main 루프의 누산기에서 호출)
     """
-    global player
-    for eff in effects[:]:
-        eff["timer"] -= 1
-        if eff["timer"] <= 0:
-            # 효과 종료
-            if eff["type"] == "speed":
-                player["speed"] = 5
-            elif eff["type"] == "jump":
-                player["jump_force"] = 12
-            effects.remove(eff)
+    global timer
+    timer += 1
+    if game_state == GameState.PLAYING:
+        save_previous_positions()
+        update_gameplay()
+        update_background()
 
 
-def main():
-    global game_state, timer, current_level, score, lives, collected_gems
+def main(recorder=None, trace_path=None):
+    """
+    게임 루프
+    - recorder: ReplayRecorder 를 주면 타이틀에서 시작한 첫 플레이를 녹화 (녹화 중 되감기 불가)
+    - trace_path: 종료 시 프로파일러 기록을 Chrome trace 로 저장할 경로
+    """
+    global game_state, render_alpha
+
+    # 누산기 방식 고정 타임스텝
+    #  - 실제 경과 시간을 쌓아 두고 SIM_DT 만큼씩 시뮬레이션을 진행
+    #  - 렌더링은 MAX_RENDER_FPS 까지 자유롭게, 남은 시간 비율로 보간
+    #  - 프레임이 크게 밀려도 MAX_SUBSTEPS 까지만 따라잡고 나머지는 버림
+    accumulator = 0.0
+    last_time = time.perf_counter()
 
     running = True
     while running:
-        clock.tick(FPS)
-        timer += 1
+        clock.tick(MAX_RENDER_FPS)
+        frame_start = time.perf_counter_ns()
+        now = time.perf_counter()
+        accumulator += now - last_time
+        last_time = now
 
         # 이벤트 처리
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
                 running = False
             if event.type == pygame.KEYDOWN:
+                if event.key == PROFILE_TOGGLE_KEY:
+                    profiler.toggle()
+                    compositor.invalidate()
                 if game_state == GameState.TITLE:
                     if event.key == pygame.K_SPACE:
                         # 게임 시작
                         game_state = GameState.PLAYING
+                        if recorder is not None and recorder.replay is None and recorder.path:
+                            recorder.start()
                 elif game_state in (GameState.GAME_OVER, GameState.GAME_WIN):
                     if event.key == pygame.K_r:
                         # 재시작
-                        current_level = 0
-                        score = 0
-                        lives = 3
-                        collected_gems = 0
-                        game_state = GameState.PLAYING
-                        reset_level()
-
-        # 상태별 로직
+                        restart_game()
+
+        # 시뮬레이션 (고정 틱)
+        substeps = 0
+        while accumulator >= SIM_DT and substeps < MAX_SUBSTEPS:
+            recording = recorder is not None and recorder.active
+            if game_state == GameState.PLAYING and not recording and key_source()[REWIND_KEY]:
+                # 되감기: 저장해 둔 상태를 한 틱씩 거꾸로 복원
+                rewind_tick()
+            else:
+                simulate_tick()
+                if recording:
+                    recorder.after_tick()
+                    if game_state != GameState.PLAYING:
+                        recorder.finish()
+                        recorder.path = None  # 한 번만 녹화
+                elif game_state == GameState.PLAYING:
+                    rewind_buffer.push(state_vector())
+            accumulator -= SIM_DT
+            substeps += 1
+        if substeps == MAX_SUBSTEPS and accumulator >= SIM_DT:
+            # 따라잡기 예산 초과: 밀린 시간은 버려서 악순환 방지
+            accumulator = 0.0
+        render_alpha = accumulator / SIM_DT
+
+        # 상태별 그리기
         if game_state == GameState.TITLE:
             draw_title_screen()
 
         elif game_state == GameState.PLAYING:
-            handle_input()
-            update_player()
-            update_enemies()
-            update_boss()
-            update_moving_platforms()
-            update_effects()
-            check_portal_collision()
-
-            # 플레이 화면 그리기
+            # 플레이 화면 그리기 (바뀐 영역만 화면에 반영)
             draw_gameplay()
+            if profiler.enabled:
+                mark(profiler.draw_overlay())
+            compositor.present()
 
             # 플레이어 체력이 0 이하이면 이미 처리됨
             # 레벨 완료/승리는 보스 잡았거나 포털 통과
@@ -1340,12 +4640,1568 @@ def main():
         elif game_state == GameState.GAME_WIN:
             draw_game_win_screen()
 
-        pygame.display.flip()
-
+        if game_state != GameState.PLAYING:
+            # 다른 화면은 전체 갱신, 다시 플레이로 돌아오면 전체부터 그림
+            compositor.invalidate()
+            pygame.display.flip()
+
+        if profiler.enabled:
+            profiler.end_frame(frame_start)
+        if allocation_tracker is not None and allocation_tracker.enabled:
+            allocation_tracker.end_frame(frame_start)
+
+    if recorder is not None and recorder.active:
+        recorder.finish()
+    if trace_path:
+        frames = profiler.export_trace(trace_path)
+        print(f"프로파일 trace 저장: {trace_path} ({frames} frames)")
+    if allocation_tracker is not None and allocation_tracker.enabled:
+        allocation_tracker.disable()
+        finish_alloc_report(allocation_tracker)
     pygame.quit()
     sys.exit()
 
 
+# ===========================
+# 벤치마크
+#  - SDL dummy 비디오 드라이버로 실제 화면 포맷 그대로 측정 (--bench)
+#  - 레벨별로 업데이트/그리기 함수마다 프레임당 시간 (하위 호출 포함)을 측정
+#  - 부하 시나리오: 적 1천, 보스 총알 1만, 배경 파티클 5천
+#  - 결과는 JSON, 기준 결과(--bench-baseline)와 비교해서 느려진 항목을 표시
+# ===========================
+BENCH_FRAMES = 600
+BENCH_WARMUP = 60
+BENCH_TOLERANCE = 0.15   # 기준 대비 이 비율 넘게 느려지면 회귀
+BENCH_NOISE_US = 2.0     # 이보다 작은 차이는 측정 오차로 봄
+BENCH_FORMAT = 1
+
+
+def bench_inputs(frame):
+    """
+    벤치마크 입력: 좌우 왕복 이동 + 주기적 점프 + 계속 사격
+    """
+    keys = {pygame.K_SPACE, pygame.K_RIGHT if frame // 90 % 2 == 0 else pygame.K_LEFT}
+    if frame % 40 < 5:
+        keys.add(pygame.K_UP)
+    return KeyState(keys)
+
+
+def bench_setup_level(level_index):
+    global current_level, game_state
+    seed_rng(0)
+    restart_game()
+    current_level = level_index
+    game_state = GameState.PLAYING
+    reset_level()
+
+
+def bench_add_enemies(count):
+    """
+    부하 시나리오: 정적 플랫폼 위에 적을 count 마리 배치
+    """
+    rng = random.Random(0)
+    platforms = [p for p in active_level.platforms if p is not None and not p.get("moving")]
+    for i in range(count):
+        p = rng.choice(platforms)
+        kind = ENEMY_TYPES[i % len(ENEMY_TYPES)]
+        x = p["x"] + rng.randint(0, max(p["width"] - 30, 0))
+        active_level.enemies.append(Enemy(kind, x, p["y"] - 30, speed=rng.choice((-2, 2)),
+                                          jump_force=10))
+    rebuild_spatial_index()
+
+
+def bench_fill_boss_bullets(count):
+    """
+    부하 시나리오: 보스 총알을 count 발까지 채움 (화면 안에 오래 남도록 느리게)
+    """
+    missing = count - boss_bullets.count
+    if missing <= 0:
+        return
+    rng = np.random.default_rng(boss_bullets.count)
+    angle = rng.uniform(0, 2 * np.pi, missing)
+    speed = rng.uniform(0.2, 1.5, missing)
+    boss_bullets.spawn_many(rng.uniform(50, SCREEN_WIDTH - 50, missing),
+                            rng.uniform(50, SCREEN_HEIGHT - 50, missing),
+                            speed * np.cos(angle), speed * np.sin(angle), 6)
+
+
+def bench_scenarios():
+    """
+    (이름, 레벨 인덱스, 준비 함수, 매 프레임 전 함수) 목록
+    """
+    scenarios = []
+    for i in range(len(level_designs)):
+        name = f"level{i + 1}_{level_designs[i].theme.name.lower()}"
+        scenarios.append((name, i, None, None))
+    scenarios.append(("stress_enemies_1k", 0, lambda: bench_add_enemies(1000), None))
+    scenarios.append(("stress_boss_bullets_10k", 4, None, lambda: bench_fill_boss_bullets(10000)))
+    scenarios.append(("stress_particles_5k_ice", 3, lambda: build_particles(50), None))
+    scenarios.append(("stress_particles_5k_space", 4, lambda: build_particles(50), None))
+    return scenarios
+
+
+def bench_stats(samples_ns):
+    us = np.asarray(samples_ns, dtype=np.float64) / 1000.0
+    return {
+        "mean_us": round(float(us.mean()), 2),
+        "p50_us": round(float(np.percentile(us, 50)), 2),
+        "p95_us": round(float(np.percentile(us, 95)), 2),
+        "max_us": round(float(us.max()), 2),
+    }
+
+
+def run_benchmark_scenario(level_index, setup=None, before_frame=None, frames=BENCH_FRAMES):
+    """
+    시나리오 하나 측정 (main 루프의 PLAYING 한 틱 + 그리기 + 화면 반영 순서 그대로)
+    반환값: 단계 이름 -> 통계
+    """
+    global timer, current_level, game_state
+
+    bench_setup_level(level_index)
+    if setup is not None:
+        setup()
+    player.invincible = True
+    stages = UPDATE_STAGES + DRAW_STAGES
+    totals = dict.fromkeys(stages, 0)
+    samples = {name: [] for name in stages + ("present", "frame")}
+    previous_source = key_source
+    try:
+        with time_stages(stages, totals):
+            for frame in range(BENCH_WARMUP + frames):
+                if before_frame is not None:
+                    before_frame()
+                # 죽거나 레벨을 벗어나지 않도록 (측정 대상 레벨 유지)
+                player.invincible_timer = 2
+                player.health = player.max_health
+                set_key_source(lambda keys=bench_inputs(frame): keys)
+
+                start = time.perf_counter_ns()
+                timer += 1
+                save_previous_positions()
+                update_gameplay()
+                update_background()
+                draw_gameplay()
+                present_start = time.perf_counter_ns()
+                compositor.present()
+                end = time.perf_counter_ns()
+
+                if frame >= BENCH_WARMUP:
+                    for name in stages:
+                        samples[name].append(totals[name])
+                    samples["present"].append(end - present_start)
+                    samples["frame"].append(end - start)
+                for name in stages:
+                    totals[name] = 0
+
+                if game_state != GameState.PLAYING or current_level != level_index:
+                    current_level = level_index
+                    game_state = GameState.PLAYING
+                    reset_level()
+                    player.invincible = True
+    finally:
+        set_key_source(previous_source)
+        build_particles()
+    return {name: bench_stats(values) for name, values in samples.items() if any(values)}
+
+
+def run_benchmarks(frames=BENCH_FRAMES, only=None):
+    """
+    전체 벤치마크 실행, JSON 으로 저장할 결과 dict 반환
+    """
+    results = {}
+    for name, level_index, setup, before_frame in bench_scenarios():
+        if only and name not in only:
+            continue
+        start = time.perf_counter()
+        results[name] = run_benchmark_scenario(level_index, setup, before_frame, frames)
+        print(f"{name:28s} frame mean {results[name]['frame']['mean_us']:9.1f}us "
+              f"p95 {results[name]['frame']['p95_us']:9.1f}us "
+              f"({time.perf_counter() - start:.1f}s)")
+    return {
+        "format": BENCH_FORMAT,
+        "frames": frames,
+        "python": sys.version.split()[0],
+        "pygame": pygame.version.ver,
+        "numpy": np.__version__,
+        "video_driver": pygame.display.get_driver(),
+        "scenarios": results,
+    }
+
+
+def compare_benchmarks(current, baseline, tolerance=BENCH_TOLERANCE):
+    """
+    기준 결과와 비교 (평균 시간 기준)
+    반환값: 회귀 항목 (시나리오, 단계, 기준 us, 현재 us) 목록
+    """
+    regressions = []
+    print(f"{'scenario':28s} {'stage':28s} {'baseline':>10s} {'current':>10s} {'change':>8s}")
+    for scenario, stages in current["scenarios"].items():
+        base_stages = baseline.get("scenarios", {}).get(scenario)
+        if not base_stages:
+            continue
+        for stage, stats in stages.items():
+            base = base_stages.get(stage)
+            if base is None:
+                continue
+            old, new = base["mean_us"], stats["mean_us"]
+            change = (new - old) / old if old else 0.0
+            regressed = change > tolerance and new - old > BENCH_NOISE_US
+            if regressed:
+                regressions.append((scenario, stage, old, new))
+            print(f"{scenario:28s} {stage:28s} {old:10.1f} {new:10.1f} {change * 100:+7.1f}%"
+                  + ("  REGRESSION" if regressed else ""))
+    return regressions
+
+
+# ===========================
+# 배치 실행기 (밸런스 튜닝용)
+#  - 시드 하나 = 에피소드 하나 (전체 레벨 처음부터 게임 종료 또는 프레임 한도까지)
+#  - 입력 정책: random(시드 기반 무작위 입력), scripted(오른쪽으로 달리며 점프/사격)
+#  - ProcessPoolExecutor 로 코어마다 에피소드를 나눠 돌리고, 끝나는 대로 JSONL 로 한 줄씩 기록
+#  - 에피소드 결과: 결과(win/game_over/timeout), 점수, 레벨별 사망 수/보석 수/머문 프레임/통과 여부,
+#    보스 처치까지 걸린 프레임
+# ===========================
+EPISODE_MAX_FRAMES = 60 * 60 * 10  # 10분
+BATCH_OUTPUT = "batch-results.jsonl"
+POLICY_KEYS = (pygame.K_LEFT, pygame.K_RIGHT, pygame.K_UP, pygame.K_LSHIFT, pygame.K_SPACE)
+
+
+def random_policy(seed):
+    """
+    무작위 입력 (한 입력 조합을 5~30 프레임 유지, 오른쪽으로 조금 더 자주 이동)
+    """
+    rng = random.Random(f"{seed}:policy")
+    current = [KeyState(), 0]
+
+    def choose(frame):
+        if current[1] <= 0:
+            keys = set()
+            move = rng.random()
+            if move < 0.5:
+                keys.add(pygame.K_RIGHT)
+            elif move < 0.75:
+                keys.add(pygame.K_LEFT)
+            for key, chance in ((pygame.K_UP, 0.4), (pygame.K_SPACE, 0.5), (pygame.K_LSHIFT, 0.1)):
+                if rng.random() < chance:
+                    keys.add(key)
+            current[0] = KeyState(keys)
+            current[1] = rng.randint(5, 30)
+        current[1] -= 1
+        return current[0]
+
+    return choose
+
+
+def scripted_policy(seed):
+    """
+    고정 입력: 계속 오른쪽 + 사격, 일정 간격으로 점프 (간격은 시드로 조금씩 다르게)
+    """
+    period = 30 + seed % 20
+    run = KeyState({pygame.K_RIGHT, pygame.K_SPACE})
+    jump = KeyState({pygame.K_RIGHT, pygame.K_SPACE, pygame.K_UP})
+    return lambda frame: jump if frame % period < 6 else run
+
+
+POLICIES = {
+    "random": random_policy,
+    "scripted": scripted_policy,
+}
+
+
+def start_episode():
+    """
+    에피소드 시작 상태로 (restart_game 이 넘겨받는 대시/사격 쿨다운 등 플레이어 상태까지 초기화)
+    - 같은 시드의 에피소드가 이전에 무엇을 돌렸는지와 상관없이 똑같이 시작하도록
+    """
+    fresh = Player(0, 0)
+    for name in PLAYER_STATE_FIELDS:
+        setattr(player, name, getattr(fresh, name))
+    restart_game()
+
+
+def episode_outcome():
+    """
+    끝난 에피소드의 결과 이름 ("win", "game_over", 아직 플레이 중이면 프레임 한도에 걸린 "timeout")
+    (run_episode 와 GameBatch 가 같은 값을 씀)
+    """
+    if game_state == GameState.GAME_WIN:
+        return "win"
+    if game_state == GameState.GAME_OVER:
+        return "game_over"
+    return "timeout"
+
+
+def run_episode(seed, policy="random", max_frames=EPISODE_MAX_FRAMES):
+    """
+    에피소드 하나를 헤드리스로 실행하고 결과 dict 반환 (프로세스 풀 작업 단위)
+    """
+    start = time.perf_counter()
+    seed_rng(seed)
+    start_episode()
+    choose = POLICIES[policy](seed)
+    level_count = len(level_designs)
+    levels = [{"level": i + 1, "deaths": 0, "gems": 0, "frames": 0, "cleared": False}
+              for i in range(level_count)]
+    last = {"level": current_level, "lives": lives, "gems": collected_gems}
+    boss_kill = [None]
+
+    def observe():
+        # 직전 프레임에 바뀐 것을 그 프레임이 속한 레벨에 기록
+        stats = levels[last["level"]]
+        if lives < last["lives"]:
+            stats["deaths"] += last["lives"] - lives
+        stats["gems"] += collected_gems - last["gems"]
+        if current_level != last["level"]:
+            stats["cleared"] = True
+        elif game_state == GameState.GAME_WIN:
+            # 포털 없는 마지막 레벨은 보스 처치로 클리어
+            stats["cleared"] = True
+            boss_kill[0] = stats["frames"]
+        last["level"] = min(current_level, level_count - 1)
+        last["lives"] = lives
+        last["gems"] = collected_gems
+
+    def per_frame(frame):
+        if frame:
+            observe()
+        levels[last["level"]]["frames"] += 1
+        return choose(frame)
+
+    frames = step(per_frame, max_frames)
+    if frames:
+        observe()
+
+    return {
+        "seed": seed,
+        "policy": policy,
+        "outcome": episode_outcome(),
+        "frames": frames,
+        "score": score,
+        "gems": collected_gems,
+        "levels_reached": max(s["level"] for s in levels if s["frames"]),
+        "levels": levels,
+        "boss_kill_frames": boss_kill[0],
+        "wall_s": round(time.perf_counter() - start, 3),
+    }
+
+
+def summarize_batch(results):
+    """
+    에피소드 결과 목록 -> 레벨별 평균 (사망 수, 보석 수, 통과율, 통과까지 프레임)
+    """
+    summary = {"episodes": len(results), "outcomes": {}, "levels": []}
+    for r in results:
+        summary["outcomes"][r["outcome"]] = summary["outcomes"].get(r["outcome"], 0) + 1
+    for i in range(len(level_designs)):
+        visits = [r["levels"][i] for r in results if r["levels"][i]["frames"]]
+        cleared = [s for s in visits if s["cleared"]]
+        summary["levels"].append({
+            "level": i + 1,
+            "reached": len(visits),
+            "cleared": len(cleared),
+            "mean_deaths": round(sum(s["deaths"] for s in visits) / len(visits), 3) if visits else None,
+            "mean_gems": round(sum(s["gems"] for s in visits) / len(visits), 3) if visits else None,
+            "mean_frames_to_clear": (round(sum(s["frames"] for s in cleared) / len(cleared), 1)
+                                     if cleared else None),
+        })
+    kills = [r["boss_kill_frames"] for r in results if r["boss_kill_frames"] is not None]
+    summary["mean_boss_kill_frames"] = round(sum(kills) / len(kills), 1) if kills else None
+    return summary
+
+
+def run_batch(episodes, out_path=BATCH_OUTPUT, seed=0, policy="random", workers=None,
+              max_frames=EPISODE_MAX_FRAMES):
+    """
+    episodes 개 에피소드를 프로세스 풀로 실행 (시드 seed, seed+1, ...)
+    끝나는 순서대로 out_path 에 JSONL 로 기록하고 요약 dict 반환
+    """
+    start = time.perf_counter()
+    results = []
+    errors = 0
+    with open(out_path, "w", encoding="utf-8") as f, \
+            concurrent.futures.ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(run_episode, seed + i, policy, max_frames): i
+                   for i in range(episodes)}
+        for future in concurrent.futures.as_completed(futures):
+            episode = futures[future]
+            try:
+                result = future.result()
+            except Exception as exc:
+                result = {"seed": seed + episode, "policy": policy, "error": repr(exc)}
+                errors += 1
+            else:
+                results.append(result)
+            result["episode"] = episode
+            f.write(json.dumps(result) + "\n")
+            f.flush()
+    elapsed = time.perf_counter() - start
+    summary = summarize_batch(results)
+    summary["errors"] = errors
+    summary["wall_s"] = round(elapsed, 2)
+    print(f"{episodes} episodes in {elapsed:.1f}s ({sum(r['frames'] for r in results)} frames), "
+          f"outcomes {summary['outcomes']}, errors {errors} -> {out_path}")
+    for s in summary["levels"]:
+        print(f"  level {s['level']}: reached {s['reached']}, cleared {s['cleared']}, "
+              f"deaths {s['mean_deaths']}, gems {s['mean_gems']}, frames {s['mean_frames_to_clear']}")
+    print(f"  boss kill frames {summary['mean_boss_kill_frames']}")
+    return summary
+
+
+# ===========================
+# 레벨 검증기 (오프라인 솔버)
+#  - handle_input/update_player 규칙을 옮긴 작은 물리 모델로 스폰 지점부터 상태 공간을 탐색해
+#    모든 크리스탈/파워업/포털에 닿는 입력 경로를 찾음
+#  - 탐색 순서는 남은 목표 쪽 우선 (A*: 지난 프레임 + SOLVER_GREED × 가장 가까운 목표까지 어림 프레임)
+#    어림값이 실제보다 클 수 있어서 찾은 경로가 가장 짧다는 보장은 없음
+#  - 상태 수/프레임 한도 안에서 못 찾은 목표는 "판정 불가", 한도 전에 상태 공간이 바닥나면 "도달 불가"
+#  - 입력은 SOLVER_STEP 프레임마다 결정 (좌/우/없음 × 점프 × 대쉬, 점프/대쉬 키는 첫 프레임에만)
+#    쓸 수 없는 점프/대쉬 입력은 건너뜀
+#  - 위치/속도를 격자로 묶은 키로 방문 기록 (같은 키에는 가장 먼저 만든 상태만 남김)
+#    같은 키에 더블 점프/대쉬가 남은 정도까지 같거나 나은 상태가 이미 있으면 버림
+#  - 플랫폼 충돌은 게임과 같은 연속 충돌(sweep_move, 바닥/천장/벽)
+#  - 움직이는 플랫폼은 게임과 같은 닫힌 형태 경로로 틱별 위치를 바로 계산하고, 이동 범위 근처에서만 위상을 키에 넣음
+#  - 찾은 경로는 실제 게임 함수(handle_input/update_player/update_moving_platforms)로 다시 돌려 확인
+#  - 적/보스/용암 데미지와 파워업 효과는 넣지 않음 (기본 능력만으로 닿는지 확인)
+# ===========================
+SOLVER_STEP = 4
+SOLVER_CELL = 8          # 위치 격자 크기 (px)
+SOLVER_MAX_FRAMES = 3600
+SOLVER_MAX_STATES = 300000
+SOLVER_PHASE_BUCKET = 8  # 움직이는 플랫폼 위상 구분 단위 (프레임)
+SOLVER_MOVING_MARGIN = 100
+SOLVER_FIELD_CELL = 32   # 목표까지 어림 프레임 격자 크기 (px)
+SOLVER_GREED = 2.0       # 어림 프레임 가중치 (클수록 목표 쪽으로 곧장, 1 이면 거의 최단 경로)
+SOLVER_TICK_BOXES = 1 << 16  # 틱별 움직이는 플랫폼 상자 캐시 크기 한도
+SOLVER_KEY_NAMES = ((pygame.K_LEFT, "LEFT"), (pygame.K_RIGHT, "RIGHT"),
+                    (pygame.K_UP, "UP"), (pygame.K_LSHIFT, "DASH"))
+
+
+class LevelSolver:
+    """
+    레벨 하나의 도달 가능성 탐색
+    - solve() -> {목표 이름: 프레임별 키 튜플 또는 None}
+      None 인 목표가 있을 때 exhausted 가 True 면 탐색 한도에 걸린 것 (판정 불가), False 면 도달 불가
+    - 상태: (x, y, vx, vy, on_ground, double_jump_used, on_ice, direction, dash_cooldown, 틱)
+    """
+    def __init__(self, design, step=SOLVER_STEP, cell=SOLVER_CELL,
+                 max_frames=SOLVER_MAX_FRAMES, max_states=SOLVER_MAX_STATES):
+        self.design = design
+        self.step = step
+        self.cell = cell
+        self.max_frames = max_frames
+        self.max_states = max_states
+        fresh = Player(0, 0)
+        self.width, self.height = fresh.width, fresh.height
+        self.speed, self.jump_force, self.gravity = fresh.speed, fresh.jump_force, fresh.gravity
+        self.ice = design.theme == LevelTheme.ICE
+        self.world_width, self.world_height = design.width, design.height
+        self.platforms = platforms = design.all_platforms()
+        self.grid = StaticCollisionGrid(platforms)
+        self.cell_size = self.grid.cell_size
+        self.mover_grid = build_mover_grid(design)
+        self.moving = tuple(i for i, p in enumerate(platforms) if p.get("moving"))
+        self.paths = {i: design.platform_paths[i] for i in self.moving}
+        self.sweeps = {}
+        for i, path in self.paths.items():
+            p = platforms[i]
+            self.sweeps[i] = (path.lo - SOLVER_MOVING_MARGIN,
+                              path.lo + path.span + p["width"] + SOLVER_MOVING_MARGIN,
+                              p["y"] - SOLVER_MOVING_MARGIN, p["y"] + SOLVER_MOVING_MARGIN)
+        # 한 프레임 이동량 상한 (대쉬, 점프/낙하 속도, 움직이는 플랫폼에 실려 가는 거리)
+        self.reach = (max(DASH_POWER, self.speed, MAX_FALL_SPEED, self.jump_force)
+                      + max((path.speed for path in self.paths.values()), default=0))
+        self.near = {}          # 플레이어 위치 격자 셀 -> 후보 플랫폼 (boxes)
+        self.phase_cells = {}   # 격자 셀 -> 위상 범위가 그 셀에 걸치는 움직이는 플랫폼 (key)
+        self.tick_boxes = {}    # (움직이는 플랫폼 인덱스, 틱) -> 상자 (SOLVER_TICK_BOXES 를 넘으면 비움)
+        self.climb = self.jump_force / 2  # 점프로 올라가는 평균 속도 (어림 프레임용)
+        self.targets = self.level_targets(design)
+        self.states = 0
+        self.exhausted = False
+
+    @staticmethod
+    def level_targets(design):
+        """
+        확인할 목표 (이름, 사각형): 크리스탈, 파워업, 포털
+        """
+        targets = [(f"crystal {i}", (x, y, ITEM_SIZE, ITEM_SIZE))
+                   for i, (x, y) in enumerate(design.collectibles)]
+        targets.extend((f"powerup {i} ({kind})", (x, y, ITEM_SIZE, ITEM_SIZE))
+                       for i, (x, y, kind) in enumerate(design.power_ups))
+        portal = design.exit_portal
+        if portal:
+            targets.append(("portal", (portal["x"] - 20, portal["y"] - 20, 40, 40)))
+        return targets
+
+    def advance(self, state, left, right, up, dash):
+        """
+        한 프레임 진행 (handle_input -> update_player -> update_moving_platforms 순서), 떨어져 죽으면 None
+        """
+        x, y, vx, vy, ground, double_used, on_ice, direction, cooldown, tick = state
+        # handle_input
+        if left:
+            vx = -self.speed
+            direction = -1
+        elif right:
+            vx = self.speed
+            direction = 1
+        else:
+            friction = ICE_FRICTION if on_ice else GROUND_FRICTION
+            if abs(vx) < friction:
+                vx = 0
+            elif vx > 0:
+                vx -= friction
+            else:
+                vx += friction
+        if up:
+            if ground:
+                vy = -self.jump_force
+                ground = False
+                double_used = False
+            elif not double_used:
+                vy = -self.jump_force
+                double_used = True
+        if dash and cooldown <= 0:
+            vx = DASH_POWER * direction
+            cooldown = DASH_COOLDOWN
+
+        # update_player
+        vy += self.gravity
+        if vy > MAX_FALL_SPEED:
+            vy = MAX_FALL_SPEED
+        # check_platform_collisions (연속 충돌)
+        # 셀의 여유 거리보다 덜 움직이거나, 이동 경로 사각형에 (맞닿는 것까지) 걸치는 상자가 없으면 그대로 이동
+        w, h = self.width, self.height
+        cs = self.cell_size
+        boxes, paths, movers, clear = self.near.get((int(x // cs), int(y // cs))) or self.cell_boxes(x, y)
+        wall = floor = None
+        if -clear < vx < clear and -clear < vy < clear:
+            x += vx
+            y += vy
+        else:
+            if movers:
+                boxes = self.place_movers(boxes, movers, tick)
+            x0, x1 = (x + vx, x + w) if vx < 0 else (x, x + w + vx)
+            y0, y1 = (y + vy, y + h) if vy < 0 else (y, y + h + vy)
+            for box in boxes:
+                if box[0] <= x1 and box[2] >= x0 and box[1] <= y1 and box[3] >= y0:
+                    x, y, wall, floor = sweep_move(x, y, w, h, vx, vy, boxes)
+                    break
+            else:
+                x += vx
+                y += vy
+        ground = False
+        if wall is not None:
+            vx = 0
+        if floor is not None:
+            landed = vy > 0
+            vy = 0
+            if landed:
+                ground = True
+                on_ice = self.ice
+                path = paths[floor]
+                if path is not None:
+                    dx = path.at(tick + 1) - path.at(tick)
+                    carry_boxes = self.boxes(tick, x, y)[0]
+                    x = sweep_move(x, y, w, h, dx, 0, carry_boxes)[0]
+        if x < 0:
+            x = 0
+        if x + w > self.world_width:
+            x = self.world_width - w
+        if y < 0:
+            y = 0
+            vy = 0
+        if y > self.world_height:
+            return None
+        if cooldown > 0:
+            cooldown -= 1
+        return (x, y, vx, vy, ground, double_used, on_ice, direction, cooldown, tick + 1)
+
+    def boxes(self, tick, x, y):
+        """
+        (x, y) 에 있는 플레이어가 한 프레임 안에 닿을 수 있는 플랫폼의 tick 때 상자와 경로, 여유 거리
+        (platforms_near 와 같은 순서, 정적 플랫폼 경로는 None)
+        """
+        cs = self.cell_size
+        near = self.near.get((int(x // cs), int(y // cs))) or self.cell_boxes(x, y)
+        boxes, paths, movers, clear = near
+        if movers:
+            boxes = self.place_movers(boxes, movers, tick)
+        return boxes, paths, clear
+
+    def cell_boxes(self, x, y):
+        """
+        (x, y) 가 든 격자 셀의 후보 (정적 상자, 경로, 움직이는 플랫폼 (자리, 인덱스), 여유 거리)
+        - 셀 + 한 프레임 이동량 범위의 플랫폼, 셀마다 캐시
+        - 여유 거리: 셀 안 어디서든 가로/세로로 이만큼 미만 움직이면 어느 플랫폼에도 닿지 않음
+          (움직이는 플랫폼은 경로 전체 영역 기준)
+        """
+        cs = self.cell_size
+        cell = (int(x // cs), int(y // cs))
+        reach = self.reach
+        left, top = cell[0] * cs, cell[1] * cs
+        right, bottom = left + cs + self.width, top + cs + self.height
+        x, y = left - reach, top - reach
+        w, h = right - left + 2 * reach, bottom - top + 2 * reach
+        indices = self.grid.query(x, y, w, h)
+        movers = self.mover_grid.query(x, y, w, h)
+        if movers:
+            indices = sorted(set(indices).union(movers))
+        paths = [self.paths.get(i) for i in indices]
+        boxes = [platform_box(self.platforms[i]) for i in indices]
+        clear = reach
+        for i, box, path in zip(indices, boxes, paths):
+            if path is not None:
+                box = platform_box(mover_sweep_box(self.platforms[i], path))
+            clear = min(clear, max(box[0] - right, left - box[2], box[1] - bottom, top - box[3]))
+        movers = tuple((n, i) for n, (i, path) in enumerate(zip(indices, paths)) if path is not None)
+        near = self.near[cell] = (boxes, paths, movers, clear)
+        return near
+
+    def place_movers(self, boxes, movers, tick):
+        """
+        정적 플랫폼 상자는 캐시 그대로 두고 움직이는 플랫폼만 tick 위치로 바꾼 상자 목록
+        (틱별로 캐시)
+        """
+        boxes = list(boxes)
+        tick_boxes = self.tick_boxes
+        for n, i in movers:
+            box = tick_boxes.get((i, tick))
+            if box is None:
+                box = tick_boxes[i, tick] = platform_box(self.platforms[i], self.paths[i].at(tick))
+            boxes[n] = box
+        return boxes
+
+    def key(self, state):
+        """
+        방문 기록 키 (격자로 묶은 상태, 움직이는 플랫폼 근처면 위상 포함)
+        """
+        x, y, vx, vy, ground, double_used, on_ice, direction, cooldown, tick = state
+        phase = ()
+        if self.sweeps:
+            cs = self.grid.cell_size
+            at = (int(x // cs), int(y // cs))
+            movers = self.phase_cells.get(at)
+            if movers is None:
+                left, top = at[0] * cs, at[1] * cs
+                movers = self.phase_cells[at] = tuple(
+                    (i, sweep) for i, sweep in self.sweeps.items()
+                    if sweep[0] <= left + cs and sweep[1] >= left and sweep[2] <= top + cs and sweep[3] >= top)
+            for i, (x0, x1, y0, y1) in movers:
+                if x0 <= x <= x1 and y0 <= y <= y1:
+                    period = self.paths[i].period
+                    phase += (i, int(tick % period) // SOLVER_PHASE_BUCKET if period else 0)
+        cell = self.cell
+        return (int(x) // cell, int(y) // cell, round(vx / 2), 0 if ground else int(vy),
+                ground, on_ice, direction, phase)
+
+    @staticmethod
+    def resources(state):
+        """
+        남은 능력 (작을수록 좋음): (더블 점프 썼는지, 대쉬 쿨타임 구간)
+        """
+        return state[5], min(state[8], DASH_COOLDOWN) // 10
+
+    def visit(self, best, state):
+        """
+        처음 보는 상태면 기록하고 True (같은 키에 능력이 같거나 더 남은 상태가 있으면 False)
+        """
+        key = self.key(state)
+        double_used, cooldown = self.resources(state)
+        seen = best.get(key)
+        if seen is None:
+            best[key] = [(double_used, cooldown)]
+            return True
+        for d, c in seen:
+            if d <= double_used and c <= cooldown:
+                return False
+        seen.append((double_used, cooldown))
+        return True
+
+    def actions(self, state):
+        """
+        이 상태에서 의미 있는 입력 (왼쪽, 오른쪽, 점프, 대쉬)
+        """
+        can_jump = state[4] or not state[5]
+        can_dash = state[8] <= 0
+        for left, right in ((False, True), (True, False), (False, False)):
+            for up in ((False, True) if can_jump else (False,)):
+                for dash in ((False, True) if can_dash else (False,)):
+                    yield left, right, up, dash
+
+    def target_cells(self, remaining):
+        """
+        남은 목표를 플레이어 왼쪽 위 좌표 격자에 펼친 표 (셀 -> 그 셀에서 닿을 수 있는 목표)
+        - 대부분의 프레임은 셀 하나만 찾아보고 끝남
+        """
+        cs = STATIC_CELL_SIZE
+        w, h = self.width, self.height
+        cells = {}
+        for target in remaining:
+            tx, ty, tw, th = target[1]
+            for cx in range((tx - w) // cs, (tx + tw) // cs + 1):
+                for cy in range((ty - h) // cs, (ty + th) // cs + 1):
+                    cells.setdefault((cx, cy), []).append(target)
+        return cells
+
+    def hits(self, state, near):
+        """
+        target_cells 에서 찾은 근처 목표 중 state 의 플레이어와 겹치는 목표 이름
+        """
+        rx, ry = int(state[0]), int(state[1])
+        w, h = self.width, self.height
+        return [name for name, (tx, ty, tw, th) in near
+                if rx < tx + tw and rx + w > tx and ry < ty + th and ry + h > ty]
+
+    def target_field(self, remaining):
+        """
+        플레이어 위치 (SOLVER_FIELD_CELL 칸) -> 남은 목표 중 가장 가까운 것까지 어림 프레임 수 (행, 열 리스트)
+        - 가로 거리는 달리기 속도, 위로는 점프 평균 속도, 아래로는 최대 낙하 속도로 나눈 값의 합
+        """
+        cs = SOLVER_FIELD_CELL
+        xs = np.arange(self.world_width // cs + 2) * cs + cs / 2
+        ys = np.arange(self.world_height // cs + 2) * cs + cs / 2
+        field = np.full((len(ys), len(xs)), np.inf)
+        w, h = self.width, self.height
+        for _, (tx, ty, tw, th) in remaining:
+            gx = np.maximum(np.maximum(tx - xs - w, xs - tx - tw), 0) / self.speed
+            gy = (np.maximum(ys - ty - th, 0) / self.climb
+                  + np.maximum(ty - ys - h, 0) / MAX_FALL_SPEED)
+            np.minimum(field, gy[:, None] + gx[None, :], out=field)
+        return field.tolist()
+
+    @staticmethod
+    def priority(field, state):
+        """
+        탐색 우선순위 (작을수록 먼저): 지난 프레임 + SOLVER_GREED × 목표까지 어림 프레임
+        """
+        cs = SOLVER_FIELD_CELL
+        return state[9] + SOLVER_GREED * field[int(state[1]) // cs][int(state[0]) // cs]
+
+    def solve(self):
+        """
+        목표 쪽 우선 탐색으로 목표마다 입력 경로 (못 찾으면 None, 한도에 걸렸는지는 exhausted)
+        """
+        spawn = self.design.spawn_point
+        start = (spawn["x"], spawn["y"], 0, 0, False, False, False, 1, 0, 0)
+        best = {}
+        self.visit(best, start)
+        # 경로 복원용: 상태 번호 -> (부모 번호, 입력), heap 에는 (우선순위, 번호, 상태)
+        parents = [None]
+        remaining = list(self.targets)
+        cells = self.target_cells(remaining)
+        field = self.target_field(remaining)
+        found = {}
+        heap = [(0, 0, start)]
+        truncated = False
+        while heap and remaining and len(parents) < self.max_states:
+            _, index, state = heapq.heappop(heap)
+            if state[9] >= self.max_frames:
+                truncated = True
+                continue
+            reached = False
+            for action in self.actions(state):
+                left, right, up, dash = action
+                current = state
+                for j in range(self.step):
+                    current = self.advance(current, left, right, up and j == 0, dash and j == 0)
+                    if current is None:
+                        break
+                    near = cells.get((int(current[0]) // STATIC_CELL_SIZE, int(current[1]) // STATIC_CELL_SIZE))
+                    if not near:
+                        continue
+                    for name in self.hits(current, near):
+                        found[name] = self.route(parents, index, action, j + 1)
+                        remaining = [t for t in remaining if t[0] != name]
+                        cells = self.target_cells(remaining)
+                        reached = True
+                if current is not None and self.visit(best, current):
+                    parents.append((index, action))
+                    heapq.heappush(heap, (self.priority(field, current), len(parents) - 1, current))
+            if reached and remaining:
+                # 남은 목표 기준으로 어림값과 대기열 우선순위를 다시 계산
+                field = self.target_field(remaining)
+                heap = [(self.priority(field, s), n, s) for _, n, s in heap]
+                heapq.heapify(heap)
+            if len(self.tick_boxes) > SOLVER_TICK_BOXES:
+                self.tick_boxes.clear()
+        self.states = len(parents)
+        self.exhausted = bool(remaining) and (bool(heap) or truncated)
+        for name, _ in remaining:
+            found[name] = None
+        return found
+
+    def route(self, parents, index, action, frames):
+        """
+        시작부터 index 번 상태까지의 입력 + 마지막 입력 action 의 앞 frames 프레임 -> 프레임별 키 튜플
+        """
+        steps = [(action, frames)]
+        while parents[index] is not None:
+            index, previous = parents[index]
+            steps.append((previous, self.step))
+        keys = []
+        for (left, right, up, dash), count in reversed(steps):
+            held = tuple(k for k, on in ((pygame.K_LEFT, left), (pygame.K_RIGHT, right)) if on)
+            first = held + tuple(k for k, on in ((pygame.K_UP, up), (pygame.K_LSHIFT, dash)) if on)
+            keys.append(first)
+            keys.extend([held] * (count - 1))
+        return keys
+
+
+def describe_route(keys):
+    """
+    프레임별 키 튜플 -> "RIGHT x12, RIGHT+UP x1, ..." (같은 입력이 이어지면 묶음)
+    """
+    parts = []
+    for pressed, run in itertools.groupby(keys):
+        name = "+".join(label for key, label in SOLVER_KEY_NAMES if key in pressed) or "-"
+        parts.append(f"{name} x{len(list(run))}")
+    return ", ".join(parts)
+
+
+def verify_route(design, keys, target):
+    """
+    실제 게임 함수로 경로를 재생해서 목표 사각형에 닿는지 확인 (적/보스/파워업 없이, 무적 상태로)
+    - 현재 게임 상태는 끝난 뒤 되돌림
+    """
+    global active_level, boss, static_grid, mover_grid, moving_platform_indices, resident_movers, level_tick
+    saved = snapshot()
+    saved_source = key_source
+    try:
+        instance = design.instantiate()
+        instance.enemies = []
+        instance.power_ups = []
+        instance.boss = None
+        active_level = instance
+        boss = None
+        boss_bullets.clear()
+        platforms = design.all_platforms()
+        instance.platforms = [dict(p) if p.get("moving") else p for p in platforms]
+        static_grid = StaticCollisionGrid(platforms)
+        mover_grid = build_mover_grid(design)
+        moving_platform_indices = tuple(i for i, p in enumerate(platforms) if p.get("moving"))
+        resident_movers = ()
+        seek_movers(0)
+        rebuild_spatial_index()
+        fresh = Player(0, 0)
+        for name in PLAYER_STATE_FIELDS:
+            setattr(player, name, getattr(fresh, name))
+        player.bullets.clear()
+        player.x = design.spawn_point["x"]
+        player.y = design.spawn_point["y"]
+        player.invincible = True
+        player.invincible_timer = len(keys) + 1
+        player.sync_rect()
+        target_rect = pygame.Rect(target)
+        current = [KeyState()]
+        set_key_source(lambda: current[0])
+        for pressed in keys:
+            current[0] = KeyState(pressed)
+            level_tick += 1
+            handle_input()
+            update_player()
+            update_moving_platforms()
+        return player.rect.colliderect(target_rect)
+    finally:
+        set_key_source(saved_source)
+        # 스냅샷 배열 구성이 현재 레벨 기준이므로 레벨 상태를 다시 만든 뒤 복원
+        active_level = level_designs[current_level].instantiate()
+        load_level_collision()
+        restore(saved)
+
+
+def validate_level(directory, index, seed, max_frames=SOLVER_MAX_FRAMES, max_states=SOLVER_MAX_STATES):
+    """
+    레벨 폴더의 index 번 레벨을 검증해서 결과 dict 반환 (프로세스 풀 작업 단위)
+    - seed: 파워업 랜덤 배치 시드 (작업 프로세스마다 같은 레벨을 보도록)
+    - status: "ok", "fail" (도달 불가 또는 경로 재생 실패), "inconclusive" (탐색 한도에 걸려 판정 불가)
+    """
+    start = time.perf_counter()
+    design = LevelLibrary(directory, seed)[index]
+    solver = LevelSolver(design, max_frames=max_frames, max_states=max_states)
+    routes = solver.solve()
+    targets = dict(solver.targets)
+    results = []
+    for name, _ in solver.targets:
+        keys = routes[name]
+        if keys is None:
+            results.append({"target": name, "reachable": False, "inconclusive": solver.exhausted})
+        else:
+            results.append({"target": name, "reachable": True, "frames": len(keys),
+                            "verified": verify_route(design, keys, targets[name]),
+                            "route": describe_route(keys)})
+    if any(not r["reachable"] and not r["inconclusive"] or r["reachable"] and not r["verified"]
+           for r in results):
+        status = "fail"
+    elif any(not r["reachable"] for r in results):
+        status = "inconclusive"
+    else:
+        status = "ok"
+    return {"level": index + 1, "name": design.name, "states": solver.states,
+            "status": status, "ok": status == "ok",
+            "targets": results, "wall_s": round(time.perf_counter() - start, 3)}
+
+
+def validate_levels(directory=LEVEL_DIR, workers=None, max_frames=SOLVER_MAX_FRAMES,
+                    max_states=SOLVER_MAX_STATES, show_routes=False, seed=None):
+    """
+    레벨 폴더 전체 검증 (workers 가 1 이면 현재 프로세스, 아니면 레벨별로 프로세스 풀)
+    - seed: 파워업 랜덤 배치 시드 (없으면 현재 rng_seed, 모든 작업 프로세스에 같은 값을 넘김)
+    반환값: "fail" (실패한 레벨이 하나라도 있으면), "inconclusive" (판정 불가 레벨만 있으면), "ok"
+    """
+    seed = rng_seed if seed is None else seed
+    count = len(LevelLibrary(directory))
+    if workers == 1:
+        reports = [validate_level(directory, i, seed, max_frames, max_states) for i in range(count)]
+    else:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as pool:
+            reports = list(pool.map(validate_level, [directory] * count, range(count), [seed] * count,
+                                    [max_frames] * count, [max_states] * count))
+    print(f"seed {seed}")
+    for report in reports:
+        status = "ok" if report["ok"] else report["status"].upper()
+        print(f"level {report['level']} ({report['name']}): {status}, "
+              f"{report['states']} states, {report['wall_s']}s")
+        for r in report["targets"]:
+            if not r["reachable"]:
+                if r["inconclusive"]:
+                    print(f"  {r['target']}: 탐색 한도 안에서 못 찾음 (판정 불가)")
+                else:
+                    print(f"  {r['target']}: 도달 경로 없음")
+            elif not r["verified"]:
+                print(f"  {r['target']}: 경로 재생 확인 실패 ({r['frames']} frames)")
+            elif show_routes:
+                print(f"  {r['target']}: {r['frames']} frames - {r['route']}")
+    statuses = {report["status"] for report in reports}
+    return "fail" if "fail" in statuses else "inconclusive" if "inconclusive" in statuses else "ok"
+
+
+# ===========================
+# 절차적 레벨 생성기 (규모 한계/장시간 테스트용)
+#  - 같은 시드면 같은 레벨, 레벨 파일과 같은 형식(format 1 + world)의 dict 를 만듦
+#  - 월드를 GEN_CELL_WIDTH × GEN_TIER 칸으로 나누고 맨 아래는 월드 전체 너비의 바닥(0번 플랫폼)
+#    줄마다 한 칸씩 어긋나게 (줄 + 칸) 이 짝수인 칸만 쓰고, 윗줄 칸에는 바로 아랫줄의 왼쪽/오른쪽 칸에
+#    플랫폼이 있을 때만 플랫폼을 놓음
+#    -> 받쳐 주는 플랫폼 바로 위 칸은 늘 비어 있으므로, 플랫폼을 아래에서 통과하지 못하더라도
+#       모든 정적 플랫폼이 바닥에서 한 번 점프씩(옆 칸으로 뛰어오름) 이어져 닿음
+#       (두 줄 위 플랫폼에 머리가 닿아도 윗줄 높이를 넘어 옆 칸까지 갈 만큼 GEN_TIER/GEN_CELL_WIDTH 를 잡음)
+#  - 크리스탈/파워업/포털/적은 정적 플랫폼 위에만, 움직이는 플랫폼은 (줄 + 칸) 이 짝수인 빈 칸에 덤으로
+#    (경로에 쓰지 않음)
+#    움직이는 플랫폼이 점프를 막더라도 지나가는 동안뿐 (기다리면 비킴)
+#  - 한 줄씩 numpy 로 뽑다가 플랫폼 수를 채우면 멈춤 (플랫폼 10만 개도 1초 안쪽)
+#  - 기본값은 플레이/검증 비용을 묶어 둠
+#    움직이는 플랫폼: 전체의 GEN_MOVING_RATIO 이되 GEN_MAX_MOVING 개까지 (매 틱 경로 계산, 검증기 상태 키에 위상)
+#    jumper 점프 힘: GEN_JUMP_FORCES 하나 (적 길찾기 그래프가 레벨 로드 때 점프 힘마다 점프 간선을 따로 만듦)
+#    더 무거운 레벨은 moving_ratio/max_moving/jump_forces 인자로 직접 지정
+#  - --generate 로 파일을 만들어 CCC_LEVEL_DIR 폴더에 넣으면 벤치마크/배치 실행 입력으로 쓸 수 있음
+#    (큰 레벨은 --pack-level 로 청크 파일 레벨로 변환)
+# ===========================
+GEN_CELL_WIDTH = 130     # 옆 칸 플랫폼 사이 거리가 한 번 점프로 건널 수 있을 만큼
+GEN_TIER = 100           # 줄 간격 (한 번 점프 높이 약 144px 보다 낮고, 두 줄 위 플랫폼 아래로 머리 여유 50px)
+GEN_PLATFORM_WIDTH = (70, 130)
+GEN_PLATFORM_HEIGHT = 20
+GEN_FLOOR_HEIGHT = 50
+GEN_DENSITY = 0.8        # 받쳐 주는 칸이 있을 때 플랫폼을 놓을 확률
+GEN_ASPECT = 4           # 가로 칸 수 : 세로 줄 수 (대략)
+GEN_MIN_COLUMNS = 6
+GEN_MOVING_RATIO = 0.05
+GEN_MAX_MOVING = 64
+GEN_JUMP_FORCES = (12,)
+GEN_SAFE_DISTANCE = 300  # 스폰 지점에서 이 거리 안의 플랫폼에는 적을 두지 않음
+
+
+def generate_level(seed, platforms=200, enemies=20, collectibles=None, power_ups=None,
+                   theme=None, boss=False, columns=None, moving_ratio=GEN_MOVING_RATIO,
+                   max_moving=GEN_MAX_MOVING, jump_forces=GEN_JUMP_FORCES):
+    """
+    시드로 레벨 데이터 생성
+    - platforms: 바닥/움직이는 플랫폼을 포함한 전체 플랫폼 수
+    - moving_ratio/max_moving: 움직이는 플랫폼 비율과 최대 개수 (max_moving 이 None 이면 비율만)
+    - jump_forces: jumper 적이 고르는 점프 힘 (종류가 늘수록 길찾기 그래프 생성이 비례해서 느려짐)
+    - collectibles/power_ups: 없으면 정적 플랫폼 10개당 1개 / 1000개당 1개 (+2)
+    - columns: 가로 칸 수 (없으면 플랫폼 수에 맞춰 가로로 긴 월드)
+    """
+    rng = np.random.default_rng(seed)
+    moving = int(platforms * moving_ratio)
+    if max_moving is not None:
+        moving = min(moving, max_moving)
+    static = max(platforms - 1 - moving, 1)
+    if columns is None:
+        # 줄마다 칸의 절반만 쓰므로 2 배
+        columns = math.ceil(math.sqrt(2 * static * GEN_ASPECT / GEN_DENSITY))
+    columns = max(columns, GEN_MIN_COLUMNS)
+
+    # 줄마다 아랫줄 플랫폼의 왼쪽/오른쪽 칸 중 일부에 플랫폼 (아랫줄과 한 칸씩 어긋남)
+    rows = []
+    below = np.arange(columns) % 2 == 1  # 바닥에서는 0번 줄의 짝수 칸에 닿음
+    count = 0
+    while count < static:
+        reach = np.zeros(columns, dtype=bool)
+        reach[1:] |= below[:-1]
+        reach[:-1] |= below[1:]
+        row = reach & (rng.random(columns) < GEN_DENSITY)
+        if not row.any():
+            row[rng.choice(np.flatnonzero(reach))] = True
+        rows.append(row)
+        count += int(row.sum())
+        below = row
+    # 넘친 만큼 맨 윗줄에서 덜어냄 (맨 윗줄은 다른 플랫폼을 받치지 않음)
+    extra = count - static
+    if extra:
+        rows[-1][rng.choice(np.flatnonzero(rows[-1]), extra, replace=False)] = False
+    cells = np.array(rows)
+
+    width = columns * GEN_CELL_WIDTH
+    height = max(GEN_FLOOR_HEIGHT + (len(rows) + 2) * GEN_TIER, SCREEN_HEIGHT)
+    floor_y = height - GEN_FLOOR_HEIGHT
+    row_index, col_index = np.nonzero(cells)  # 아랫줄부터, 줄 안에서는 왼쪽부터
+    widths = rng.integers(GEN_PLATFORM_WIDTH[0], GEN_PLATFORM_WIDTH[1] + 1, static)
+    xs = col_index * GEN_CELL_WIDTH + rng.integers(0, GEN_CELL_WIDTH - widths + 1)
+    ys = floor_y - (row_index + 1) * GEN_TIER
+
+    level_platforms = [{"x": 0, "y": floor_y, "width": width, "height": GEN_FLOOR_HEIGHT}]
+    level_platforms.extend({"x": x, "y": y, "width": w, "height": GEN_PLATFORM_HEIGHT}
+                           for x, y, w in zip(xs.tolist(), ys.tolist(), widths.tolist()))
+    # 움직이는 플랫폼은 (줄 + 칸) 이 짝수인 빈 칸에서 출발 (받쳐 주는 플랫폼 바로 위 칸은 비워 둠)
+    slots = (np.arange(len(rows))[:, None] + np.arange(columns)) % 2 == 0
+    empty_rows, empty_cols = np.nonzero(slots & ~cells)
+    if moving and len(empty_rows):
+        pick = rng.choice(len(empty_rows), min(moving, len(empty_rows)), replace=False)
+        for r, c, direction, speed, span in zip(
+                empty_rows[pick].tolist(), empty_cols[pick].tolist(),
+                rng.choice((-1, 1), len(pick)).tolist(), rng.integers(1, 3, len(pick)).tolist(),
+                rng.integers(100, 201, len(pick)).tolist()):
+            level_platforms.append({"x": c * GEN_CELL_WIDTH + 35, "y": floor_y - (r + 1) * GEN_TIER,
+                                    "width": 80, "height": GEN_PLATFORM_HEIGHT, "moving": True,
+                                    "direction": direction, "speed": speed, "range": span})
+
+    def on_platforms(index, size):
+        # 고른 플랫폼 위의 (x, y), 물체 너비 size
+        w = widths[index]
+        x = xs[index] + rng.integers(0, np.maximum(w - size, 0) + 1)
+        return x.tolist(), (ys[index] - size).tolist()
+
+    if collectibles is None:
+        collectibles = max(static // 10, 1)
+    gem_x, gem_y = on_platforms(rng.integers(0, static, collectibles), ITEM_SIZE)
+    if power_ups is None:
+        power_ups = 2 + static // 1000
+    item_x, item_y = on_platforms(rng.integers(0, static, power_ups), ITEM_SIZE)
+    item_types = rng.choice(len(POWERUP_TYPES), power_ups).tolist()
+
+    spawn = {"x": 50, "y": floor_y - 70}
+    far = np.flatnonzero(xs > spawn["x"] + GEN_SAFE_DISTANCE)
+    if not len(far):
+        far = np.arange(static)
+    enemy_index = far[rng.integers(0, len(far), enemies)]
+    enemy_x, enemy_y = on_platforms(enemy_index, NAV_ENEMY_SIZE)
+    kinds = rng.integers(0, len(ENEMY_TYPES), enemies).tolist()
+    speeds = (rng.choice((-1, 1), enemies) * rng.integers(2, 4, enemies)).tolist()
+    jumps = rng.choice(jump_forces, enemies).tolist()
+    level_enemies = []
+    for x, y, kind, speed, jump in zip(enemy_x, enemy_y, kinds, speeds, jumps):
+        kind = ENEMY_TYPES[kind]
+        e = {"type": kind, "x": x, "y": y, "width": NAV_ENEMY_SIZE, "height": NAV_ENEMY_SIZE}
+        if kind == "jumper":
+            e["jump_force"] = jump
+        elif kind == "flyer":
+            # 플랫폼 위 공중에서 위아래로 떠다님
+            e["y"] = y - GEN_TIER // 2
+            e["speed"] = abs(speed)
+        else:
+            e["speed"] = speed
+        level_enemies.append(e)
+
+    # 포털은 가장 높은 줄의 가장 오른쪽 플랫폼 위
+    top = static - 1
+    portal = {"x": int(xs[top] + widths[top] // 2), "y": int(ys[top]) - 50}
+    data = {
+        "format": LEVEL_FORMAT,
+        "name": f"Generated {seed}",
+        "theme": theme or LevelTheme(int(rng.integers(0, len(LevelTheme)))).name,
+        "world": {"width": width, "height": height},
+        "spawn_point": spawn,
+        "exit_portal": portal,
+        "platforms": level_platforms,
+        "enemies": level_enemies,
+        "collectibles": [{"x": x, "y": y} for x, y in zip(gem_x, gem_y)],
+        "power_ups": [{"x": x, "y": y, "type": POWERUP_TYPES[t]}
+                      for x, y, t in zip(item_x, item_y, item_types)],
+    }
+    if boss:
+        data["boss"] = {"x": max(portal["x"] - 40, 0), "y": max(portal["y"] - 250, 0),
+                        "width": 80, "height": 80, "health": 100, "speed": 3, "attack_cooldown": 60,
+                        "attack_pattern": "spiral", "bullet_speed": 5}
+    return data
+
+
+# ===========================
+# 강화학습 환경 (Gym 스타일)
+#  - reset() -> (관측, info), step(행동) -> (관측, 보상, 종료, 잘림, info)
+#  - 행동: POLICY_KEYS(←, →, ↑, Shift, Space) 누름 여부 5비트 정수 (0~31)
+#  - 관측: 플레이어 상태 + 가까운 적/보스 총알/플랫폼의 상대 위치 + 보스 + 포털 (float32 고정 길이)
+#  - 보상: 점수 증가/100 + 레벨 통과 5 + 승리 10 - 목숨 잃음 5
+#  - 게임 상태가 모듈 전역이므로 여러 게임은 상태 배열을 바꿔 끼우며 돌림 (GameBatch)
+#    VectorEnv 는 GameBatch 를 작업 프로세스 여러 개에 나눠 lockstep 으로 진행, 결과는 묶음 배열
+#  - 한 GameBatch 의 게임들은 레벨 배치 시드를 공유하고, 적 AI 난수는 게임마다 따로 시드
+#  - 그리기는 기본 꺼짐 (render=True 일 때만 render() 가 RGB 배열을 돌려줌)
+# ===========================
+ENV_ACTIONS = 1 << len(POLICY_KEYS)
+ACTION_KEY_STATES = [KeyState(k for i, k in enumerate(POLICY_KEYS) if action >> i & 1)
+                     for action in range(ENV_ACTIONS)]
+OBS_NEAREST_ENEMIES = 8
+OBS_NEAREST_BULLETS = 16
+OBS_NEAREST_PLATFORMS = 8
+OBS_SIZE = (13 + 4 * OBS_NEAREST_ENEMIES + 4 + 4 * OBS_NEAREST_BULLETS
+            + 4 * OBS_NEAREST_PLATFORMS + 3)
+ENV_FRAME_SKIP = 4
+REWARD_SCORE_SCALE = 0.01
+REWARD_LEVEL = 5.0
+REWARD_WIN = 10.0
+REWARD_LIFE = -5.0
+
+
+def nearest_rows(dx, dy, k, columns):
+    """
+    (dx, dy) 거리 순으로 가까운 k 개의 행 [있음, columns...] (모자라면 0 으로 채움)
+    """
+    out = np.zeros((k, 1 + len(columns)), dtype=np.float32)
+    n = len(dx)
+    if n:
+        order = np.argsort(dx * dx + dy * dy)[:k] if n > k else np.argsort(dx * dx + dy * dy)
+        out[:len(order), 0] = 1.0
+        for j, column in enumerate(columns, 1):
+            out[:len(order), j] = column[order]
+    return out.ravel()
+
+
+def observe():
+    """
+    현재 게임 상태의 관측 벡터 (float32, 길이 OBS_SIZE)
+    """
+    cx = player.x + player.width / 2
+    cy = player.y + player.height / 2
+    head = np.array([
+        player.x / active_level.width, player.y / active_level.height,
+        player.velocity_x / 10, player.velocity_y / 10,
+        player.on_ground, player.double_jump_used,
+        player.health / player.max_health, player.invincible,
+        player.dash_cooldown / DASH_COOLDOWN, player.shooting_cooldown / 15, player.direction,
+        lives / 3, current_level / max(len(level_designs) - 1, 1),
+    ], dtype=np.float32)
+
+    enemies = active_level.enemies
+    ex = np.array([e.x + e.width / 2 - cx for e in enemies], dtype=np.float64)
+    ey = np.array([e.y + e.height / 2 - cy for e in enemies], dtype=np.float64)
+    et = np.array([ENEMY_TYPES.index(e.type) / 2 for e in enemies], dtype=np.float64)
+    enemy_part = nearest_rows(ex, ey, OBS_NEAREST_ENEMIES, (ex / SCREEN_WIDTH, ey / SCREEN_HEIGHT, et))
+
+    if boss and boss.get("active", False):
+        boss_part = np.array([1.0, (boss["x"] + boss["width"] / 2 - cx) / SCREEN_WIDTH,
+                              (boss["y"] + boss["height"] / 2 - cy) / SCREEN_HEIGHT,
+                              boss["health"] / 100], dtype=np.float32)
+    else:
+        boss_part = np.zeros(4, dtype=np.float32)
+
+    n = boss_bullets.count
+    bx = boss_bullets.x[:n] - cx
+    by = boss_bullets.y[:n] - cy
+    bullet_part = nearest_rows(bx, by, OBS_NEAREST_BULLETS,
+                               (bx / SCREEN_WIDTH, by / SCREEN_HEIGHT, boss_bullets.vx[:n] / 5))
+
+    sync_movers(moving_platform_indices)
+    platforms = [p for p in active_level.platforms if p is not None]
+    px = np.array([p["x"] + p["width"] / 2 - cx for p in platforms], dtype=np.float64)
+    py = np.array([p["y"] - cy for p in platforms], dtype=np.float64)
+    pw = np.array([p["width"] / SCREEN_WIDTH for p in platforms], dtype=np.float64)
+    platform_part = nearest_rows(px, py, OBS_NEAREST_PLATFORMS,
+                                 (px / SCREEN_WIDTH, py / SCREEN_HEIGHT, pw))
+
+    portal = active_level.exit_portal
+    if portal:
+        portal_part = np.array([1.0, (portal["x"] - cx) / SCREEN_WIDTH, (portal["y"] - cy) / SCREEN_HEIGHT],
+                               dtype=np.float32)
+    else:
+        portal_part = np.zeros(3, dtype=np.float32)
+
+    return np.concatenate((head, enemy_part, boss_part, bullet_part, platform_part, portal_part))
+
+
+class GameBatch:
+    """
+    한 프로세스 안의 게임 여러 개 (상태 배열을 바꿔 끼우며 차례로 진행)
+    - i 번 게임의 에피소드 시드는 seed + offset + i 에서 시작해 끝날 때마다 stride 씩 증가
+    - 게임이 끝나면(종료/잘림) 다음 시드로 바로 다시 시작하고, 끝난 에피소드 정보는 info 로 돌려줌
+    """
+    def __init__(self, num_envs, seed=0, frame_skip=ENV_FRAME_SKIP,
+                 max_frames=EPISODE_MAX_FRAMES, render=False, offset=0, stride=None):
+        self.num_envs = num_envs
+        self.seed = seed
+        self.offset = offset
+        self.stride = num_envs if stride is None else stride
+        self.frame_skip = frame_skip
+        self.max_frames = max_frames
+        self.render_enabled = render
+        self.states = [None] * num_envs
+        self.episode_seeds = [seed + offset + i for i in range(num_envs)]
+        self.episode_frames = [0] * num_envs
+        self.episode_returns = [0.0] * num_envs
+        self.live = None  # 지금 전역 상태에 올라와 있는 게임 번호
+        seed_rng(seed)
+
+    def _load(self, i):
+        if self.live != i:
+            restore(self.states[i])
+            self.live = i
+
+    def _save(self, i):
+        self.states[i] = snapshot()
+        self.live = i
+
+    def _start(self, i, seed):
+        enemy_rng.seed(f"{seed}:enemies")
+        start_episode()
+        self.episode_seeds[i] = seed
+        self.episode_frames[i] = 0
+        self.episode_returns[i] = 0.0
+        self._save(i)
+        return observe()
+
+    def reset(self, seed=None):
+        if seed is not None and seed != self.seed:
+            self.seed = seed
+            seed_rng(seed)
+        obs = np.empty((self.num_envs, OBS_SIZE), dtype=np.float32)
+        for i in range(self.num_envs):
+            obs[i] = self._start(i, self.seed + self.offset + i)
+        return obs
+
+    def step(self, actions):
+        n = self.num_envs
+        obs = np.empty((n, OBS_SIZE), dtype=np.float32)
+        rewards = np.zeros(n, dtype=np.float32)
+        terminated = np.zeros(n, dtype=bool)
+        truncated = np.zeros(n, dtype=bool)
+        infos = [{} for _ in range(n)]
+        for i in range(n):
+            self._load(i)
+            before_score, before_level, before_lives = score, current_level, lives
+            frames = step(ACTION_KEY_STATES[int(actions[i])], self.frame_skip)
+            self.episode_frames[i] += frames
+            reward = (score - before_score) * REWARD_SCORE_SCALE
+            reward += (current_level - before_level) * REWARD_LEVEL
+            reward += (before_lives - lives) * REWARD_LIFE
+            if game_state == GameState.GAME_WIN:
+                reward += REWARD_WIN
+            rewards[i] = reward
+            self.episode_returns[i] += reward
+            terminated[i] = game_state != GameState.PLAYING
+            truncated[i] = not terminated[i] and self.episode_frames[i] >= self.max_frames
+            if terminated[i] or truncated[i]:
+                infos[i] = {
+                    "final_observation": observe(),
+                    "episode": {"seed": self.episode_seeds[i], "return": self.episode_returns[i],
+                                "frames": self.episode_frames[i], "score": score,
+                                "level": min(current_level, len(level_designs) - 1) + 1,
+                                "outcome": episode_outcome()},
+                }
+                obs[i] = self._start(i, self.episode_seeds[i] + self.stride)
+            else:
+                obs[i] = observe()
+                self._save(i)
+        return obs, rewards, terminated, truncated, infos
+
+    def render(self, i=0):
+        """
+        i 번 게임 화면을 RGB 배열 (높이, 너비, 3) 로 (render=True 일 때만)
+        """
+        if not self.render_enabled:
+            return None
+        self._load(i)
+        compositor.invalidate()
+        draw_gameplay()
+        return pygame.surfarray.array3d(screen).transpose(1, 0, 2)
+
+
+class GameEnv:
+    """
+    게임 하나짜리 환경 (reset(seed) 는 레벨 배치 시드까지 새로 맞춤)
+    """
+    def __init__(self, frame_skip=ENV_FRAME_SKIP, max_frames=EPISODE_MAX_FRAMES, render=False):
+        self.batch = GameBatch(1, rng_seed, frame_skip, max_frames, render)
+        self.action_space_n = ENV_ACTIONS
+        self.observation_shape = (OBS_SIZE,)
+
+    def reset(self, seed=None):
+        obs = self.batch.reset(seed)
+        return obs[0], {}
+
+    def step(self, action):
+        obs, rewards, terminated, truncated, infos = self.batch.step((action,))
+        return obs[0], float(rewards[0]), bool(terminated[0]), bool(truncated[0]), infos[0]
+
+    def render(self):
+        return self.batch.render(0)
+
+    def close(self):
+        pass
+
+
+def vector_env_worker(conn, num_envs, seed, options):
+    """
+    VectorEnv 작업 프로세스: GameBatch 하나를 들고 명령을 받아 처리
+    """
+    batch = GameBatch(num_envs, seed, **options)
+    try:
+        while True:
+            command, data = conn.recv()
+            if command == "step":
+                conn.send(batch.step(data))
+            elif command == "reset":
+                conn.send(batch.reset(data))
+            elif command == "render":
+                conn.send(batch.render(data))
+            elif command == "close":
+                break
+    finally:
+        conn.close()
+
+
+class VectorEnv:
+    """
+    게임 num_envs 개를 lockstep 으로 진행하는 환경
+    - num_workers=0: 현재 프로세스에서 GameBatch 하나로
+    - num_workers>0: 작업 프로세스마다 게임을 나눠 들고 병렬로 (기본: CPU 코어 수, 게임 수 이하)
+    - step(actions) -> (obs[N, OBS_SIZE], reward[N], terminated[N], truncated[N], infos)
+      끝난 게임은 자동으로 다시 시작 (끝난 에피소드 정보는 infos[i]["episode"])
+    """
+    def __init__(self, num_envs, seed=0, num_workers=None, frame_skip=ENV_FRAME_SKIP,
+                 max_frames=EPISODE_MAX_FRAMES, render=False):
+        self.num_envs = num_envs
+        self.seed = seed
+        self.action_space_n = ENV_ACTIONS
+        self.observation_shape = (num_envs, OBS_SIZE)
+        options = {"frame_skip": frame_skip, "max_frames": max_frames, "render": render}
+        if num_workers is None:
+            num_workers = min(os.cpu_count() or 1, num_envs)
+        self.local = None
+        self.workers = []
+        self.slices = []
+        if num_workers <= 0:
+            self.local = GameBatch(num_envs, seed, **options)
+            return
+        methods = multiprocessing.get_all_start_methods()
+        context = multiprocessing.get_context("fork" if "fork" in methods else "spawn")
+        start = 0
+        for w in range(num_workers):
+            count = num_envs // num_workers + (1 if w < num_envs % num_workers else 0)
+            parent, child = context.Pipe()
+            process = context.Process(target=vector_env_worker,
+                                      args=(child, count, seed, dict(options, offset=start, stride=num_envs)),
+                                      daemon=True)
+            process.start()
+            child.close()
+            self.workers.append((parent, process))
+            self.slices.append((start, start + count))
+            start += count
+
+    def reset(self, seed=None):
+        if seed is not None:
+            self.seed = seed
+        if self.local is not None:
+            return self.local.reset(seed)
+        for conn, _ in self.workers:
+            conn.send(("reset", seed))
+        return np.concatenate([conn.recv() for conn, _ in self.workers])
+
+    def step(self, actions):
+        actions = np.asarray(actions)
+        if self.local is not None:
+            return self.local.step(actions)
+        for (conn, _), (start, end) in zip(self.workers, self.slices):
+            conn.send(("step", actions[start:end]))
+        results = [conn.recv() for conn, _ in self.workers]
+        obs = np.concatenate([r[0] for r in results])
+        rewards = np.concatenate([r[1] for r in results])
+        terminated = np.concatenate([r[2] for r in results])
+        truncated = np.concatenate([r[3] for r in results])
+        infos = [info for r in results for info in r[4]]
+        return obs, rewards, terminated, truncated, infos
+
+    def render(self, i=0):
+        if self.local is not None:
+            return self.local.render(i)
+        for (conn, _), (start, end) in zip(self.workers, self.slices):
+            if start <= i < end:
+                conn.send(("render", i - start))
+                return conn.recv()
+        return None
+
+    def close(self):
+        for conn, process in self.workers:
+            try:
+                conn.send(("close", None))
+            except (BrokenPipeError, OSError):
+                pass
+            conn.close()
+            process.join(timeout=5)
+        self.workers = []
+
+
 # 실제 게임 실행
 if __name__ == "__main__":
-    main()
+    import argparse
+
+    def seed_arg(text):
+        # 0 이상 2^64 미만 (numpy 시드, 리플레이 헤더의 부호 없는 64비트)
+        try:
+            seed = int(text)
+        except ValueError:
+            raise argparse.ArgumentTypeError(f"정수가 아님: {text!r}") from None
+        if not 0 <= seed < 2 ** 64:
+            raise argparse.ArgumentTypeError(f"0 이상 2^64 미만이어야 함: {seed}")
+        return seed
+
+    parser = argparse.ArgumentParser(description="Crystal Cavern Chronicles")
+    parser.add_argument("--headless", action="store_true",
+                        help="창 없이 시뮬레이션만 실행")
+    parser.add_argument("--frames", type=int, default=3600,
+                        help="헤드리스 실행 시 진행할 프레임 수")
+    parser.add_argument("--seed", type=seed_arg,
+                        help="난수 시드 (0 이상, 없으면 임의)")
+    parser.add_argument("--record", metavar="FILE",
+                        help="첫 플레이를 리플레이 파일로 녹화")
+    parser.add_argument("--replay", metavar="FILE",
+                        help="리플레이 파일을 헤드리스로 최대 속도 재생하고 체크섬 검증")
+    parser.add_argument("--bench", nargs="?", const="bench-results.json", metavar="OUT",
+                        help="벤치마크 실행 후 결과 JSON 저장 (기본 bench-results.json)")
+    parser.add_argument("--bench-frames", type=int, default=BENCH_FRAMES,
+                        help="벤치마크 시나리오별 측정 프레임 수")
+    parser.add_argument("--bench-only", nargs="+", metavar="SCENARIO",
+                        help="지정한 벤치마크 시나리오만 실행")
+    parser.add_argument("--bench-baseline", metavar="FILE",
+                        help="기준 벤치마크 결과와 비교 (느려진 항목이 있으면 종료 코드 1)")
+    parser.add_argument("--bench-tolerance", type=float, default=BENCH_TOLERANCE,
+                        help="회귀로 볼 평균 시간 증가 비율")
+    parser.add_argument("--profile", action="store_true",
+                        help="프레임 프로파일러를 켠 채로 시작 (F3 으로 켜고 끄기)")
+    parser.add_argument("--profile-trace", metavar="FILE",
+                        help="종료 시 프로파일러 기록을 Chrome trace JSON 으로 저장")
+    parser.add_argument("--alloc", action="store_true",
+                        help="프레임/단계별 할당량과 GC 멈춤 계측 (종료 시 요약)")
+    parser.add_argument("--alloc-tracemalloc", action="store_true",
+                        help="할당량을 tracemalloc 바이트로 측정하고 할당 위치 상위 항목 출력")
+    parser.add_argument("--gc-threshold", type=float, default=GC_PAUSE_THRESHOLD_MS, metavar="MS",
+                        help="이 시간(ms)을 넘는 GC 멈춤이 있었던 프레임을 표시")
+    parser.add_argument("--alloc-report", metavar="FILE",
+                        help="할당/GC 요약을 JSON 으로 저장")
+    parser.add_argument("--batch", type=int, metavar="N",
+                        help="에피소드 N 개를 프로세스 풀로 헤드리스 실행 (시드 --seed 부터 1씩)")
+    parser.add_argument("--batch-out", default=BATCH_OUTPUT, metavar="FILE",
+                        help="에피소드 결과 JSONL 경로")
+    parser.add_argument("--policy", choices=sorted(POLICIES), default="random",
+                        help="배치 에피소드 입력 정책")
+    parser.add_argument("--workers", type=int,
+                        help="배치/레벨 검증 작업 프로세스 수 (기본: CPU 코어 수, 1 이면 프로세스 풀 없이)")
+    parser.add_argument("--max-frames", type=int, default=EPISODE_MAX_FRAMES,
+                        help="에피소드당 최대 프레임 수")
+    parser.add_argument("--validate", nargs="?", const=LEVEL_DIR, metavar="DIR",
+                        help="레벨 폴더의 모든 크리스탈/파워업/포털 도달 가능 여부 검증 "
+                             "(실패 시 종료 코드 1, 탐색 한도에 걸려 판정 불가면 2)")
+    parser.add_argument("--validate-routes", action="store_true",
+                        help="검증 시 목표마다 찾은 입력 경로 출력")
+    parser.add_argument("--pack-level", nargs=2, metavar=("SRC", "DST"),
+                        help="레벨 파일을 청크 파일 레벨(DST + .chunks)로 변환")
+    parser.add_argument("--chunk-size", nargs=2, type=int, metavar=("W", "H"),
+                        help="--pack-level 청크 크기 (기본: 레벨 파일의 world.chunk_size, 없으면 화면 크기)")
+    parser.add_argument("--generate", metavar="OUT",
+                        help="시드(--seed)로 레벨 파일 생성 (기본 크기는 --generate-platforms/--generate-enemies)")
+    parser.add_argument("--generate-platforms", type=int, default=200, metavar="N",
+                        help="생성할 레벨의 플랫폼 수")
+    parser.add_argument("--generate-enemies", type=int, default=20, metavar="N",
+                        help="생성할 레벨의 적 수")
+    parser.add_argument("--generate-theme", choices=[t.name for t in LevelTheme],
+                        help="생성할 레벨의 테마 (없으면 시드로 고름)")
+    parser.add_argument("--generate-boss", action="store_true",
+                        help="생성할 레벨에 보스 추가")
+    args = parser.parse_args()
+
+    if args.seed is not None:
+        seed_rng(args.seed)
+
+    if args.generate:
+        seed = args.seed if args.seed is not None else rng_seed
+        start = time.perf_counter()
+        data = generate_level(seed, args.generate_platforms, args.generate_enemies,
+                              theme=args.generate_theme, boss=args.generate_boss)
+        elapsed = time.perf_counter() - start
+        with open(args.generate, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, separators=(",", ":"))
+        pygame.quit()
+        print(f"{args.generate}: seed {seed}, {data['world']['width']}x{data['world']['height']}, "
+              f"플랫폼 {len(data['platforms'])}개, 적 {len(data['enemies'])}개 ({elapsed:.3f}s)")
+    elif args.pack_level:
+        count = pack_level(*args.pack_level, chunk_size=args.chunk_size)
+        print(f"{args.pack_level[1]}: 청크 {count}개")
+        pygame.quit()
+    elif args.validate:
+        status = validate_levels(args.validate, args.workers, show_routes=args.validate_routes,
+                                 seed=args.seed)
+        pygame.quit()
+        if status != "ok":
+            # 실패 1, 탐색 한도에 걸려 판정 불가 2
+            sys.exit(1 if status == "fail" else 2)
+    elif args.batch:
+        run_batch(args.batch, args.batch_out, args.seed if args.seed is not None else rng_seed,
+                  args.policy, args.workers, args.max_frames)
+        pygame.quit()
+    elif args.replay:
+        try:
+            replay = Replay.load(args.replay)
+        except (OSError, ValueError) as exc:
+            pygame.quit()
+            print(f"{args.replay}: 리플레이를 읽을 수 없음 ({exc})")
+            sys.exit(1)
+        start = time.perf_counter()
+        frames, mismatch = play_replay(replay)
+        elapsed = time.perf_counter() - start
+        pygame.quit()
+        rate = frames / elapsed if elapsed > 0 else float("inf")
+        print(f"{frames}/{len(replay)} frames in {elapsed:.3f}s ({rate:.0f} ticks/s), "
+              f"seed={replay.seed}, state={game_state.name}, score={score}")
+        if mismatch is not None:
+            print(f"체크섬 불일치: {mismatch} 프레임")
+            sys.exit(1)
+        print(f"체크섬 {len(replay.checksums)}개 일치")
+    elif args.bench:
+        results = run_benchmarks(args.bench_frames, args.bench_only)
+        with open(args.bench, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"벤치마크 결과 저장: {args.bench}")
+        regressions = []
+        if args.bench_baseline:
+            with open(args.bench_baseline, encoding="utf-8") as f:
+                baseline = json.load(f)
+            regressions = compare_benchmarks(results, baseline, args.bench_tolerance)
+            print(f"회귀 {len(regressions)}건")
+        pygame.quit()
+        if regressions:
+            sys.exit(1)
+    elif args.headless and (args.alloc or args.alloc_tracemalloc):
+        allocation_tracker = AllocationTracker(gc_threshold_ms=args.gc_threshold,
+                                               use_tracemalloc=args.alloc_tracemalloc)
+        alloc_report_path = args.alloc_report
+        run_alloc_headless(args.frames, allocation_tracker)
+        finish_alloc_report(allocation_tracker)
+        pygame.quit()
+    elif args.headless:
+        run_headless(args.frames)
+        pygame.quit()
+    else:
+        if args.profile or args.profile_trace:
+            profiler.enable()
+        if args.alloc or args.alloc_tracemalloc:
+            allocation_tracker = AllocationTracker(gc_threshold_ms=args.gc_threshold,
+                                                   use_tracemalloc=args.alloc_tracemalloc)
+            alloc_report_path = args.alloc_report
+            allocation_tracker.enable()
+        main(ReplayRecorder(args.record, args.seed) if args.record else None, args.profile_trace)